@@ -1,16 +1,29 @@
 import logging
 import os
+import threading
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.routers.analyze import router as analyze_router
+from app.services import segmenter
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
 )
 
-app = FastAPI(title="CupidNow API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the dictionaries (and fork the jieba workers when SEGMENT_WORKERS > 1)
+    # while already serving; /api/ready tells when done
+    threading.Thread(target=segmenter.warm_up, name="jieba-warm-up", daemon=True).start()
+    yield
+
+
+app = FastAPI(title="CupidNow API", version="0.1.0", lifespan=lifespan)
 
 allowed_origins = ["http://localhost:5173"]
 extra_origin = os.environ.get("CORS_ORIGIN")
@@ -30,3 +43,11 @@ app.include_router(analyze_router)
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/api/ready")
+async def ready():
+    """200 once jieba's dictionaries are loaded; 503 while still warming up."""
+    if not segmenter.is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
@@ -2,32 +2,47 @@ import asyncio
 import gc
 import json
 import logging
+import os
+import secrets
 import time
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from datetime import date
 from typing import AsyncGenerator
 
-from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
 from fastapi.responses import StreamingResponse
 
-from app.services.cold_war import detect_cold_wars
-from app.services.first_conversation import extract_first_conversation
-from app.services.parser import parse_line_chat
-from app.services.reply_analysis import compute_reply_behavior
-from app.services.stats import compute_basic_stats
+from app.services.compare import compare_periods
+from app.services.count_cube import CubeAccumulator, Cubes, query_cube
+from app.services.date_range import parse_date_range, select_dates
+from app.services.downsample import downsample_trend
+from app.services.engine import COLD_WAR_ENGINES, run_analyzers, sections_for
+from app.services.message_table import MessageTable
+from app.services.parallel_parse import parse_line_chat_parallel
+from app.services.parser import ChatStreamParser, NotLineChatError, collect_records
 from app.services.text_analysis import compute_text_analysis
-from app.services.time_patterns import compute_time_patterns
-from app.services.transfer_analysis import compute_transfer_analysis
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# >1 parses large uploads across a process pool instead of streaming
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "1"))
 
 _rate_store: dict[str, list[float]] = defaultdict(list)
 RATE_LIMIT = 10
 RATE_WINDOW = 60
 
+# Count cubes of recent analyses for /api/cube, by random id. They hold
+# counts per hour, sender and type only (no message content), stay in
+# memory and are dropped after CUBE_TTL seconds or when MAX_CUBES is exceeded.
+# The store is per process: the app must run as a single uvicorn worker.
+_cube_store: OrderedDict[str, tuple[float, Cubes]] = OrderedDict()
+CUBE_TTL = 30 * 60
+MAX_CUBES = 16
+
 
 def _check_rate_limit(ip: str) -> None:
     now = time.time()
@@ -43,6 +58,98 @@ def _check_rate_limit(ip: str) -> None:
             del _rate_store[k]
 
 
+def _store_cubes(cubes: Cubes) -> str:
+    now = time.time()
+    for cube_id in [k for k, (expires, _) in _cube_store.items() if expires <= now]:
+        del _cube_store[cube_id]
+    cube_id = secrets.token_urlsafe(16)
+    _cube_store[cube_id] = (now + CUBE_TTL, cubes)
+    while len(_cube_store) > MAX_CUBES:
+        _cube_store.popitem(last=False)
+    return cube_id
+
+
+def _date_range(start: str | None, end: str | None) -> tuple[date | None, date | None]:
+    try:
+        return parse_date_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _check_file_size(file: UploadFile) -> None:
+    """Reject uploads whose declared size is already over the limit."""
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File too large (max 20MB)")
+
+
+async def _read_and_parse(file: UploadFile, start: date | None = None, end: date | None = None) -> dict:
+    """Read the upload chunk by chunk, feeding the incremental parser as we go.
+
+    Never holds the whole file (or its decoded text) in memory at once. Each
+    chunk is parsed in the default executor, so the event loop keeps serving
+    other requests (and the health probes) during a large upload.
+    With *start*/*end*, reading stops after the last day of the window and
+    only the window is returned (see ``date_range.select_dates``).
+    """
+    _check_file_size(file)
+
+    if PARSE_WORKERS > 1:
+        return select_dates(await _read_and_parse_parallel(file), start, end)
+
+    table = MessageTable()
+    parser = ChatStreamParser(
+        table, since=start.toordinal() if start else None, until=end.toordinal() if end else None,
+    )
+    loop = asyncio.get_running_loop()
+    records = []
+    size = 0
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise HTTPException(status_code=413, detail="File too large (max 20MB)")
+            records.extend(await loop.run_in_executor(None, parser.feed, chunk))
+            if parser.done:
+                break
+        records.extend(await loop.run_in_executor(None, parser.close))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid file encoding")
+    except NotLineChatError:
+        raise HTTPException(status_code=400, detail="Not a LINE chat export")
+    return select_dates(collect_records(records, parser.persons, table), start, end)
+
+
+async def _read_and_parse_parallel(file: UploadFile) -> dict:
+    """Read the whole upload and parse it across PARSE_WORKERS processes."""
+    raw_data = await file.read(MAX_FILE_SIZE + 1)
+    if len(raw_data) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail="File too large (max 20MB)")
+    try:
+        text = raw_data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid file encoding")
+    finally:
+        raw_data = b""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, parse_line_chat_parallel, text, PARSE_WORKERS,
+        )
+    except NotLineChatError:
+        raise HTTPException(status_code=400, detail="Not a LINE chat export")
+
+
+def _check_trend_points(trend_points: int | None) -> None:
+    if trend_points is not None and trend_points < 3:
+        raise HTTPException(status_code=400, detail="trend_points must be at least 3")
+
+
+def _sections(cold_war_engine: str, cold_war_sweep: bool) -> dict:
+    if cold_war_engine not in COLD_WAR_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown cold_war_engine (use {' or '.join(COLD_WAR_ENGINES)})")
+    # Plus the count cube, kept for /api/cube
+    return {**sections_for(cold_war_engine, cold_war_sweep), "countCube": CubeAccumulator}
+
+
 def _sse_event(data: dict) -> str:
     return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
@@ -52,36 +159,38 @@ async def analyze(
     request: Request,
     file: UploadFile = File(...),
     skip_ai: bool = Form(default=False),
+    cold_war_engine: str = Form(default="rolling"),
+    cold_war_sweep: bool = Form(default=False),
+    start: str | None = Form(default=None),
+    end: str | None = Form(default=None),
+    trend_points: int | None = Form(default=None),
 ):
     client_ip = request.client.host if request.client else "unknown"
     _check_rate_limit(client_ip)
+    analyzer_sections = _sections(cold_war_engine, cold_war_sweep)
+    _check_trend_points(trend_points)
+    first_day, last_day = _date_range(start, end)
 
-    raw_data = await file.read()
-    if len(raw_data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large (max 20MB)")
-
-    try:
-        text = raw_data.decode("utf-8")
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid file encoding")
-    finally:
-        raw_data = b""
-
-    parsed = parse_line_chat(text)
-    del text
+    parsed = await _read_and_parse(file, first_day, last_day)
 
     if not parsed["messages"]:
-        raise HTTPException(status_code=400, detail="No messages found in file")
+        detail = "No messages found in the selected dates" if start or end else "No messages found in file"
+        raise HTTPException(status_code=400, detail=detail)
 
     persons = parsed["persons"]
 
-    basic_stats = compute_basic_stats(parsed)
-    reply_behavior = compute_reply_behavior(parsed)
-    time_patterns = compute_time_patterns(parsed)
-    cold_wars = detect_cold_wars(parsed)
-    text_analysis, interest_context = compute_text_analysis(parsed)
-    transfer_analysis = compute_transfer_analysis(parsed)
-    first_conversation = extract_first_conversation(parsed)
+    # CPU-bound work runs in the executor so the event loop stays responsive
+    loop = asyncio.get_running_loop()
+    sections = await loop.run_in_executor(None, run_analyzers, parsed, analyzer_sections)
+    basic_stats = sections["basicStats"]
+    reply_behavior = sections["replyBehavior"]
+    time_patterns = sections["timePatterns"]
+    if trend_points:
+        time_patterns["trend"] = downsample_trend(time_patterns["trend"], trend_points)
+    cold_wars = sections["coldWars"]
+    transfer_analysis = sections["transferAnalysis"]
+    first_conversation = sections["firstConversation"]
+    text_analysis, interest_context = await loop.run_in_executor(None, compute_text_analysis, parsed)
 
     # Extract internal data for AI sampling, then clean up
     word_idf = text_analysis.pop("_word_idf", None)
@@ -128,6 +237,7 @@ async def analyze(
         "replyBehavior": reply_behavior,
         "timePatterns": time_patterns,
         "coldWars": cold_wars,
+        "sessions": sections["sessions"],
         "textAnalysis": text_analysis,
     }
 
@@ -137,6 +247,12 @@ async def analyze(
     if first_conversation:
         result["firstConversation"] = first_conversation
 
+    for name in ("coldWarSweep", "regimeShifts"):
+        if name in sections:
+            result[name] = sections[name]
+
+    result["cubeId"] = _store_cubes(sections["countCube"])
+
     if ai_result:
         result["aiAnalysis"] = ai_result
 
@@ -148,48 +264,49 @@ async def analyze_stream(
     request: Request,
     file: UploadFile = File(...),
     skip_ai: bool = Form(default=False),
+    cold_war_engine: str = Form(default="rolling"),
+    cold_war_sweep: bool = Form(default=False),
+    start: str | None = Form(default=None),
+    end: str | None = Form(default=None),
+    trend_points: int | None = Form(default=None),
 ):
     client_ip = request.client.host if request.client else "unknown"
     _check_rate_limit(client_ip)
-
-    raw_data = await file.read()
-    if len(raw_data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large (max 20MB)")
-
-    try:
-        text = raw_data.decode("utf-8")
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid file encoding")
-    finally:
-        raw_data = b""
+    analyzer_sections = _sections(cold_war_engine, cold_war_sweep)
+    _check_trend_points(trend_points)
+    first_day, last_day = _date_range(start, end)
+    _check_file_size(file)
 
     async def event_stream() -> AsyncGenerator[str, None]:
         yield _sse_event({"progress": 5, "stage": "解析對話記錄中..."})
         await asyncio.sleep(0)
 
-        parsed = parse_line_chat(text)
+        # Parse inside the stream so the first event goes out before parsing;
+        # the upload stays open until the response is finished
+        try:
+            parsed = await _read_and_parse(file, first_day, last_day)
+        except HTTPException as e:
+            yield _sse_event({"error": e.detail})
+            return
         if not parsed["messages"]:
-            yield _sse_event({"error": "找不到任何訊息"})
+            yield _sse_event({"error": "所選日期內找不到任何訊息" if start or end else "找不到任何訊息"})
             return
 
         total = len(parsed["messages"])
         persons = parsed["persons"]
-        yield _sse_event({"progress": 15, "stage": f"已解析 {total:,} 則訊息，計算基礎統計..."})
-        await asyncio.sleep(0)
-
-        basic_stats = compute_basic_stats(parsed)
-        yield _sse_event({"progress": 30, "stage": "分析回覆行為..."})
-        await asyncio.sleep(0)
-
-        reply_behavior = compute_reply_behavior(parsed)
-        yield _sse_event({"progress": 45, "stage": "分析時間模式..."})
-        await asyncio.sleep(0)
-
-        time_patterns = compute_time_patterns(parsed)
-        yield _sse_event({"progress": 55, "stage": "偵測冷戰期間..."})
+        yield _sse_event({"progress": 15, "stage": f"已解析 {total:,} 則訊息，計算統計、回覆行為、時間模式與冷戰期間..."})
         await asyncio.sleep(0)
 
-        cold_wars = detect_cold_wars(parsed)
+        # All message-level sections in one pass over the table, off the event loop
+        sections = await asyncio.get_running_loop().run_in_executor(
+            None, run_analyzers, parsed, analyzer_sections,
+        )
+        basic_stats = sections["basicStats"]
+        reply_behavior = sections["replyBehavior"]
+        time_patterns = sections["timePatterns"]
+        if trend_points:
+            time_patterns["trend"] = downsample_trend(time_patterns["trend"], trend_points)
+        cold_wars = sections["coldWars"]
         yield _sse_event({"progress": 65, "stage": "分析文字內容與文字雲..."})
         await asyncio.sleep(0)
 
@@ -202,8 +319,8 @@ async def analyze_stream(
         word_idf = text_analysis.pop("_word_idf", None)
         msg_words = text_analysis.pop("_msg_words", None)
 
-        transfer_analysis = compute_transfer_analysis(parsed)
-        first_conversation = extract_first_conversation(parsed)
+        transfer_analysis = sections["transferAnalysis"]
+        first_conversation = sections["firstConversation"]
 
         result = {
             "persons": persons,
@@ -211,6 +328,7 @@ async def analyze_stream(
             "replyBehavior": reply_behavior,
             "timePatterns": time_patterns,
             "coldWars": cold_wars,
+            "sessions": sections["sessions"],
             "textAnalysis": text_analysis,
         }
 
@@ -220,6 +338,12 @@ async def analyze_stream(
         if first_conversation:
             result["firstConversation"] = first_conversation
 
+        for name in ("coldWarSweep", "regimeShifts"):
+            if name in sections:
+                result[name] = sections[name]
+
+        result["cubeId"] = _store_cubes(sections["countCube"])
+
         ai_result = None
         ai_warning = None
         if not skip_ai:
@@ -275,3 +399,63 @@ async def analyze_stream(
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.post("/compare")
+async def compare(
+    request: Request,
+    file: UploadFile = File(...),
+    first_start: str | None = Form(default=None),
+    first_end: str | None = Form(default=None),
+    second_start: str | None = Form(default=None),
+    second_end: str | None = Form(default=None),
+):
+    """Basic stats, reply behavior, time patterns and word cloud for two date
+    ranges of one upload, plus their ``delta`` (see ``compare.compare_periods``)."""
+    client_ip = request.client.host if request.client else "unknown"
+    _check_rate_limit(client_ip)
+    first = _date_range(first_start, first_end)
+    second = _date_range(second_start, second_end)
+
+    # Parse only the span covering both periods
+    starts = [first[0], second[0]]
+    ends = [first[1], second[1]]
+    span_start = None if None in starts else min(starts)
+    span_end = None if None in ends else max(ends)
+    parsed = await _read_and_parse(file, span_start, span_end)
+
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, compare_periods, parsed, first, second,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    del parsed
+    gc.collect()
+    return result
+
+
+@router.get("/cube/{cube_id}")
+async def cube_query(
+    cube_id: str,
+    measure: str = "messages",
+    by: list[str] = Query(default=[]),
+    start: str | None = None,
+    end: str | None = None,
+    weekday: list[int] = Query(default=[]),
+    hour: list[int] = Query(default=[]),
+    sender: list[str] = Query(default=[]),
+    msg_type: list[str] = Query(default=[], alias="type"),
+):
+    """Slice of an analysis' count cube (see ``count_cube.query_cube``); repeat a
+    parameter for several values, e.g. ``?by=weekday&by=hour&sender=小美``."""
+    entry = _cube_store.get(cube_id)
+    if entry is None or entry[0] <= time.time():
+        raise HTTPException(status_code=404, detail="Cube not found or expired")
+    filters = {"weekday": weekday, "hour": hour, "sender": sender, "type": msg_type}
+    where = {"start": start, "end": end, **{dim: values for dim, values in filters.items() if values}}
+    try:
+        rows = await asyncio.get_running_loop().run_in_executor(None, query_cube, entry[1], measure, by, where)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"measure": measure, "groupBy": by, "rows": rows}
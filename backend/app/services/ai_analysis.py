@@ -13,6 +13,9 @@ from app.services.text_analysis import STOP_WORDS
 _groq_client = None
 _gemini_client = None
 
+# Per-person lines in the stats block are limited to the most active senders
+PROMPT_MAX_PERSONS = 10
+
 _NOISE_RE = re.compile(r"^[\d\W\s]+$|^(.)\1+$")
 
 
@@ -127,12 +130,14 @@ def _compute_base_score(
     return base, dimensions
 
 
-def _is_meaningful(content: str) -> bool:
+def _is_meaningful(content: str, words: list[str] | None = None) -> bool:
     """Check if a message has real content worth sending to AI.
 
     Uses text length and word-level filtering. Messages with ≥3 Chinese
     characters that aren't pure noise are considered meaningful, even if
     individual words are common (e.g. "我好想你喔" is meaningful).
+    *words* is the message's entry in the token column, if there is one;
+    otherwise short messages are segmented here.
     """
     text = content.strip()
     if len(text) <= 1:
@@ -146,8 +151,9 @@ def _is_meaningful(content: str) -> bool:
         return True
 
     # For short/mixed messages, check for substantive words
-    from app.services.segmenter import cut
-    words = cut(text)
+    if words is None:
+        from app.services.segmenter import cut
+        words = cut(text)
     substantive = [
         w for w in words
         if len(w) >= 2
@@ -219,7 +225,7 @@ def sample_messages(
     if msg_words and len(msg_words) == len(messages):
         meaningful = [
             (m, words) for m, words in zip(messages, msg_words)
-            if m.msg_type == "text" and _is_meaningful(m.content)
+            if m.msg_type == "text" and _is_meaningful(m.content, words)
         ]
     else:
         meaningful = [
@@ -254,17 +260,27 @@ def sample_messages(
 
 
 def _format_stats_block(stats: dict | None) -> str:
-    """Format quantitative stats into a concise block for the AI prompt."""
+    """Format quantitative stats into a concise block for the AI prompt.
+
+    Per-person lines cover at most PROMPT_MAX_PERSONS of the most active
+    senders, so group chats do not blow up the prompt.
+    """
     if not stats:
         return ""
 
     lines = ["── 量化數據（供評分參考）──"]
 
+    mc = stats.get("basicStats", {}).get("messageCount", {})
+    ranked = sorted((k for k in mc if k != "total"), key=lambda k: mc[k], reverse=True)
+    shown = set(ranked[:PROMPT_MAX_PERSONS]) if ranked else None
+
+    def _shown(items):
+        return [(p, v) for p, v in items if shown is None or p in shown]
+
     if "basicStats" in stats:
         bs = stats["basicStats"]
-        mc = bs.get("messageCount", {})
         lines.append(f"總訊息數：{mc.get('total', 0):,}")
-        persons = [k for k in mc if k != "total"]
+        persons = [k for k in mc if k != "total" and k in shown]
         for p in persons:
             lines.append(f"  {p}：{mc.get(p, 0):,} 則")
         dr = bs.get("dateRange", {})
@@ -277,13 +293,13 @@ def _format_stats_block(stats: dict | None) -> str:
     if "replyBehavior" in stats:
         rb = stats["replyBehavior"]
         irr = rb.get("instantReplyRate", {})
-        for p, rate in irr.items():
+        for p, rate in _shown(irr.items()):
             lines.append(f"{p} 秒回率：{round(rate * 100)}%")
         art = rb.get("avgReplyTime", {})
-        for p, sec in art.items():
+        for p, sec in _shown(art.items()):
             lines.append(f"{p} 平均回覆時間：{round(sec / 60, 1)} 分鐘")
         lor = rb.get("leftOnRead", {})
-        for p, cnt in lor.items():
+        for p, cnt in _shown(lor.items()):
             lines.append(f"{p} 已讀不回次數：{cnt}")
 
     if "coldWars" in stats:
@@ -299,7 +315,7 @@ def _format_stats_block(stats: dict | None) -> str:
         if wc:
             lines.append("")
             lines.append("── 雙方高頻詞（已去除停用詞，含出現次數）──")
-            for person, words in wc.items():
+            for person, words in _shown(wc.items()):
                 top = words[:30]
                 if top:
                     items = ", ".join(f"{w['word']}({w['count']})" for w in top)
@@ -323,7 +339,8 @@ def build_prompt(
         line = f"[{m.timestamp.strftime('%m/%d %H:%M')}] {content}"
         if m.sender == p1:
             p1_lines.append(line)
-        else:
+        elif m.sender == p2:
+            # Group chats: other members only appear in the shared timeline
             p2_lines.append(line)
 
     # Also build interleaved timeline for context
@@ -0,0 +1,196 @@
+"""Online change-point detection on daily message volume (CUSUM).
+
+An alternative cold-war engine to the rolling-average detector in
+``cold_war.py``. Each calendar day is one O(1) step of a two-sided CUSUM on
+``log1p(count)``: the low side accumulates evidence that volume dropped
+below the current baseline (cooling), the high side that it rose above it
+(warming). Days are fed as soon as they are complete while the message
+table is scanned, so detection needs no full daily series. The parser
+does not feed it: the scan starts once parsing is done.
+
+When a side crosses ``THRESHOLD`` a regime shift is recorded, starting the
+day after that side's sum was last zero, and the baseline is reset to the
+new regime. Confidence is the two-sided normal confidence that the mean of
+the days since the shift differs from the old baseline.
+"""
+import math
+from datetime import date
+
+from app.services.day_index import DayIndex
+from app.services.message_table import IndexConsumer, MessageTable, RowBlock, as_table, scan
+
+# Days used to estimate the first baseline before any detection
+WARMUP_DAYS = 14
+# Allowed slack per day and decision threshold, in baseline standard deviations
+DRIFT = 0.75
+THRESHOLD = 6.0
+# Per-day deviations are clipped to this many standard deviations, so one
+# silent (or very busy) day cannot trigger a shift on its own
+CLIP = 2.0
+# EWMA weight of each day in the baseline (~60-day memory)
+BASELINE_ALPHA = 2 / 61
+# Floor for the baseline deviation on log1p counts (constant series)
+MIN_SIGMA = 0.25
+
+
+class CusumDetector:
+    """Two-sided CUSUM over one value per day; O(1) time and state per day."""
+
+    def __init__(self) -> None:
+        self.n = 0                 # days seen
+        self.mu = 0.0              # baseline mean of log1p(count)
+        self.var = 0.0
+        self.low = _Side()
+        self.high = _Side()
+        # (shift start index, detected index, "cooling"/"warming", confidence)
+        self.shifts: list[tuple[int, int, str, float]] = []
+
+    def update(self, count: int) -> None:
+        x = math.log1p(count)
+        i = self.n
+        self.n += 1
+        if i < WARMUP_DAYS:
+            # Running mean/variance (Welford) for the first baseline
+            delta = x - self.mu
+            self.mu += delta / self.n
+            self.var += (delta * (x - self.mu) - self.var) / self.n
+            return
+
+        sigma = max(math.sqrt(self.var), MIN_SIGMA)
+        z = min(max((x - self.mu) / sigma, -CLIP), CLIP)
+        self.low.step(i, x, -z - DRIFT)
+        self.high.step(i, x, z - DRIFT)
+
+        for side, direction in ((self.low, "cooling"), (self.high, "warming")):
+            if side.s > THRESHOLD:
+                mean = side.total / side.days
+                z_mean = abs(mean - self.mu) / (sigma / math.sqrt(side.days))
+                self.shifts.append((side.start, i, direction, math.erf(z_mean / math.sqrt(2))))
+                # Restart from the new regime
+                self.mu = mean
+                self.low = _Side()
+                self.high = _Side()
+                return
+
+        # Let the baseline follow slow drift (clipped, like the sums)
+        delta = z * sigma
+        self.mu += BASELINE_ALPHA * delta
+        self.var = (1 - BASELINE_ALPHA) * (self.var + BASELINE_ALPHA * delta * delta)
+
+
+class _Side:
+    """One CUSUM sum plus the days since it was last zero."""
+
+    __slots__ = ("s", "start", "total", "days")
+
+    def __init__(self) -> None:
+        self.s = 0.0
+        self.start = 0
+        self.total = 0.0
+        self.days = 0
+
+    def step(self, i: int, x: float, increment: float) -> None:
+        if not self.s:
+            self.start, self.total, self.days = i, 0.0, 0
+        self.s = max(0.0, self.s + increment)
+        self.total += x
+        self.days += 1
+
+
+def detect_regime_shifts(parsed: dict) -> list[dict]:
+    """Cooling and warming phases found by the CUSUM detector."""
+    table = as_table(parsed)
+    acc = CusumAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
+
+
+class CusumAccumulator(IndexConsumer):
+    """Feeds each completed day's message count to a CusumDetector.
+
+    Counts come from the day index. Rows arrive in day order, so every day
+    before the index's last day is complete and is fed as soon as a later
+    day shows up (days without messages as zeros). A merge brings the index
+    up to date and feeds the days it completed, so merged chunks give the
+    same shifts as one scan.
+    """
+
+    index_factories = {"day_index": DayIndex}
+
+    def __init__(self, table: MessageTable, parsed: dict, day_index: DayIndex | None = None) -> None:
+        self.detector = CusumDetector()
+        self.next_day: int | None = None   # first day not yet fed
+        self._use_indexes(table, day_index=day_index)
+
+    def add(self, block: RowBlock) -> None:
+        super().add(block)
+        self._feed(self.day_index.last_day)
+
+    def merge(self, other: "CusumAccumulator") -> None:
+        super().merge(other)
+        self._feed(self.day_index.last_day)
+
+    def _feed(self, stop: int | None) -> None:
+        """Feed the days before *stop*."""
+        if stop is None:
+            return
+        if self.next_day is None:
+            self.next_day = self.day_index.first_day
+        get = self.day_index.totals.get
+        update = self.detector.update
+        for day in range(self.next_day, stop):
+            update(get(day, 0))
+        self.next_day = max(self.next_day, stop)
+
+    def finalize(self) -> list[dict]:
+        day_index = self.day_index
+        if day_index.first_day is None:
+            return []
+        # The last day is complete now
+        self._feed(day_index.last_day + 1)
+        return _phases(day_index.first_day, day_index.dense_totals(), self.detector.shifts)
+
+
+class CusumColdWarAccumulator(CusumAccumulator):
+    """The cooling phases in the ``coldWars`` event format, plus confidence."""
+
+    def finalize(self) -> list[dict]:
+        return [
+            {
+                "startDate": phase["startDate"],
+                "endDate": phase["endDate"],
+                "messageDrop": max(-phase["changePercent"], 0),
+                "confidence": phase["confidence"],
+            }
+            for phase in super().finalize()
+            if phase["direction"] == "cooling"
+        ]
+
+
+def _phases(first_day: int, counts: list[int], shifts: list[tuple[int, int, str, float]]) -> list[dict]:
+    """One entry per shift, lasting until the next shift (or the last day)."""
+    prefix = [0]
+    for c in counts:
+        prefix.append(prefix[-1] + c)
+
+    def average(start: int, stop: int) -> float:
+        return (prefix[stop] - prefix[start]) / (stop - start)
+
+    phases = []
+    prev_start = 0
+    for j, (start, detected, direction, confidence) in enumerate(shifts):
+        end = shifts[j + 1][0] - 1 if j + 1 < len(shifts) else len(counts) - 1
+        before = average(prev_start, start)
+        after = average(start, end + 1)
+        phases.append({
+            "startDate": str(date.fromordinal(first_day + start)),
+            "endDate": str(date.fromordinal(first_day + end)),
+            "direction": direction,
+            "detectedDate": str(date.fromordinal(first_day + detected)),
+            "confidence": round(confidence, 3),
+            "avgBefore": round(before, 1),
+            "avgAfter": round(after, 1),
+            "changePercent": round((after / max(before, 1) - 1) * 100),
+        })
+        prev_start = start
+    return phases
@@ -1,7 +1,14 @@
-from collections import defaultdict
-from datetime import date, timedelta
+from collections.abc import Sequence
+from datetime import date
+from itertools import accumulate
 
-from app.services.parser import Message
+from app.services.day_index import DayIndex
+from app.services.message_table import IndexConsumer, MessageTable, as_table, scan
+
+# Default grid for sweep_cold_wars (includes the detect_cold_wars defaults)
+SWEEP_DROP_THRESHOLDS = (0.5, 0.6, 0.65, 0.7, 0.8)
+SWEEP_MIN_DAYS = (3, 5, 7, 10, 14)
+SWEEP_BASELINE_WINDOWS = (14, 30, 60)
 
 
 def detect_cold_wars(
@@ -17,93 +24,191 @@ def detect_cold_wars(
         min_days: Minimum consecutive low days to qualify
         baseline_window: Days of history used to compute normal volume
     """
-    messages: list[Message] = parsed["messages"]
-    if not messages:
-        return []
+    table = as_table(parsed)
+    acc = ColdWarAccumulator(table, parsed, drop_threshold, min_days, baseline_window)
+    scan(table, [acc])
+    return acc.finalize()
 
-    # Daily message counts
-    daily: dict[str, int] = defaultdict(int)
-    for m in messages:
-        daily[str(m.timestamp.date())] += 1
 
-    active_dates = sorted(daily.keys())
-    if len(active_dates) < 7:
+def sweep_cold_wars(
+    parsed: dict,
+    drop_thresholds: Sequence[float] = SWEEP_DROP_THRESHOLDS,
+    min_days: Sequence[int] = SWEEP_MIN_DAYS,
+    baseline_windows: Sequence[int] = SWEEP_BASELINE_WINDOWS,
+) -> list[dict]:
+    """Run ``detect_cold_wars`` for every parameter combination in one call.
+
+    Returns one ``{"dropThreshold", "minDays", "baselineWindow", "events"}``
+    entry per combination (window-major order), so a sensitivity control can
+    switch between them without re-analyzing.
+    """
+    table = as_table(parsed)
+    acc = ColdWarSweepAccumulator(table, parsed, drop_thresholds, min_days, baseline_windows)
+    scan(table, [acc])
+    return acc.finalize()
+
+
+class ColdWarAccumulator(IndexConsumer):
+    """Detection over the day index's daily totals, in finalize."""
+
+    index_factories = {"day_index": DayIndex}
+
+    def __init__(
+        self,
+        table: MessageTable,
+        parsed: dict,
+        drop_threshold: float = 0.65,
+        min_days: int = 7,
+        baseline_window: int = 30,
+        day_index: DayIndex | None = None,
+    ) -> None:
+        self.drop_threshold = drop_threshold
+        self.min_days = min_days
+        self.baseline_window = baseline_window
+        self._use_indexes(table, day_index=day_index)
+
+    def finalize(self) -> list[dict]:
+        return _detect_from_daily(self.day_index.totals, self.drop_threshold, self.min_days, self.baseline_window)
+
+
+class ColdWarSweepAccumulator(ColdWarAccumulator):
+    """Same daily totals; finalize evaluates a whole parameter grid."""
+
+    def __init__(
+        self,
+        table: MessageTable,
+        parsed: dict,
+        drop_thresholds: Sequence[float] = SWEEP_DROP_THRESHOLDS,
+        min_days: Sequence[int] = SWEEP_MIN_DAYS,
+        baseline_windows: Sequence[int] = SWEEP_BASELINE_WINDOWS,
+        day_index: DayIndex | None = None,
+    ) -> None:
+        super().__init__(table, parsed, day_index=day_index)
+        self.drop_thresholds = drop_thresholds
+        self.min_days_values = min_days
+        self.baseline_windows = baseline_windows
+
+    def finalize(self) -> list[dict]:
+        return _sweep_from_daily(self.day_index.totals, self.drop_thresholds, self.min_days_values, self.baseline_windows)
+
+
+def _detect_from_daily(
+    daily: dict[int, int], drop_threshold: float, min_days: int, baseline_window: int,
+) -> list[dict]:
+    series = _DailySeries.from_daily(daily)
+    if series is None:
         return []
+    runs = _low_runs(series.low_flags(drop_threshold, baseline_window))
+    return [series.event(start, end, baseline_window) for start, end in runs if end - start + 1 >= min_days]
 
-    # Complete date range including zero-message days
-    start_date = date.fromisoformat(active_dates[0])
-    end_date = date.fromisoformat(active_dates[-1])
-    all_dates: list[str] = []
-    d = start_date
-    while d <= end_date:
-        all_dates.append(str(d))
-        d += timedelta(days=1)
 
-    if len(all_dates) < 7:
-        return []
+def _sweep_from_daily(
+    daily: dict[int, int],
+    drop_thresholds: Sequence[float],
+    min_days: Sequence[int],
+    baseline_windows: Sequence[int],
+) -> list[dict]:
+    """Detection for every parameter combination, sharing work between them.
+
+    Baselines are computed once per window and low-day runs once per
+    (window, threshold); each ``min_days`` value only filters those runs.
+    """
+    series = _DailySeries.from_daily(daily)
+    results = []
+    for window in baseline_windows:
+        baselines = series.baselines(window) if series else None
+        for threshold in drop_thresholds:
+            runs = _low_runs(series.low_flags(threshold, window, baselines)) if series else []
+            for days in min_days:
+                results.append({
+                    "dropThreshold": threshold,
+                    "minDays": days,
+                    "baselineWindow": window,
+                    "events": [
+                        series.event(start, end, window) for start, end in runs if end - start + 1 >= days
+                    ],
+                })
+    return results
+
+
+class _DailySeries:
+    """Message counts for every day from the first to the last, with prefix sums.
+
+    ``prefix[i]`` is the total of ``counts[:i]``, so any window average is O(1).
+    """
 
-    counts = [daily.get(d, 0) for d in all_dates]
-
-    # Mark each day as "low" if it falls significantly below the rolling baseline
-    low_flags: list[bool] = []
-    for i in range(len(all_dates)):
-        lookback_start = max(0, i - baseline_window)
-        baseline_slice = counts[lookback_start:i]  # exclude current day
-        if len(baseline_slice) < 3:
-            low_flags.append(False)
-            continue
-        baseline = sum(baseline_slice) / len(baseline_slice)
-        if baseline < 3:
-            # Not enough baseline volume to judge
-            low_flags.append(False)
-            continue
-        threshold = baseline * (1 - drop_threshold)
-        low_flags.append(counts[i] <= max(threshold, 1))
-
-    # Extract consecutive low-day runs of at least min_days
-    cold_wars: list[dict] = []
+    def __init__(self, first_day: int, counts: list[int]) -> None:
+        self.first_day = first_day
+        self.counts = counts
+        self.prefix = [0, *accumulate(counts)]
+
+    @classmethod
+    def from_daily(cls, daily: dict[int, int]) -> "_DailySeries | None":
+        """None when there are too few days to judge."""
+        if len(daily) < 7:
+            return None
+        # Complete day range including zero-message days
+        first_day = min(daily)
+        return cls(first_day, [daily.get(d, 0) for d in range(first_day, max(daily) + 1)])
+
+    def window_average(self, start: int, stop: int) -> float:
+        return (self.prefix[stop] - self.prefix[start]) / (stop - start)
+
+    def baselines(self, baseline_window: int) -> list[float | None]:
+        """Average of the preceding *baseline_window* days (excluding the day itself).
+
+        None where it is not usable: under 3 days of history, or under 3
+        messages a day (not enough volume to judge).
+        """
+        result: list[float | None] = []
+        for i in range(len(self.counts)):
+            lookback_start = max(0, i - baseline_window)
+            if i - lookback_start < 3:
+                result.append(None)
+                continue
+            baseline = self.window_average(lookback_start, i)
+            result.append(baseline if baseline >= 3 else None)
+        return result
+
+    def low_flags(
+        self, drop_threshold: float, baseline_window: int, baselines: list[float | None] | None = None,
+    ) -> list[bool]:
+        """Mark each day as "low" if it falls significantly below the rolling baseline."""
+        if baselines is None:
+            baselines = self.baselines(baseline_window)
+        keep = 1 - drop_threshold
+        return [
+            baseline is not None and count <= max(baseline * keep, 1)
+            for count, baseline in zip(self.counts, baselines)
+        ]
+
+    def event(self, start_idx: int, end_idx: int, baseline_window: int) -> dict:
+        """Build a cold war event with accurate messageDrop percentage."""
+        cw_avg = self.window_average(start_idx, end_idx + 1)
+
+        # Baseline: average of the baseline_window days before the cold war
+        bl_start = max(0, start_idx - baseline_window)
+        baseline = self.window_average(bl_start, start_idx) if start_idx > bl_start else 1
+
+        drop_pct = round((1 - cw_avg / max(baseline, 1)) * 100)
+        return {
+            "startDate": str(date.fromordinal(self.first_day + start_idx)),
+            "endDate": str(date.fromordinal(self.first_day + end_idx)),
+            "messageDrop": max(drop_pct, 0),
+        }
+
+
+def _low_runs(low_flags: list[bool]) -> list[tuple[int, int]]:
+    """(start, end) index pairs of consecutive low-day runs."""
+    runs = []
     run_start = None
     for i, is_low in enumerate(low_flags):
         if is_low and run_start is None:
             run_start = i
         elif not is_low and run_start is not None:
-            run_end = i - 1
-            if run_end - run_start + 1 >= min_days:
-                cold_wars.append(_build_event(
-                    all_dates, counts, run_start, run_end, baseline_window,
-                ))
+            runs.append((run_start, i - 1))
             run_start = None
-
     # Handle run that extends to the end
     if run_start is not None:
-        run_end = len(all_dates) - 1
-        if run_end - run_start + 1 >= min_days:
-            cold_wars.append(_build_event(
-                all_dates, counts, run_start, run_end, baseline_window,
-            ))
-
-    return cold_wars
-
-
-def _build_event(
-    all_dates: list[str],
-    counts: list[int],
-    start_idx: int,
-    end_idx: int,
-    baseline_window: int,
-) -> dict:
-    """Build a cold war event with accurate messageDrop percentage."""
-    cw_counts = counts[start_idx : end_idx + 1]
-    cw_avg = sum(cw_counts) / len(cw_counts)
-
-    # Baseline: average of the baseline_window days before the cold war
-    bl_start = max(0, start_idx - baseline_window)
-    bl_slice = counts[bl_start:start_idx]
-    baseline = sum(bl_slice) / len(bl_slice) if bl_slice else 1
-
-    drop_pct = round((1 - cw_avg / max(baseline, 1)) * 100)
-    return {
-        "startDate": all_dates[start_idx],
-        "endDate": all_dates[end_idx],
-        "messageDrop": max(drop_pct, 0),
-    }
+        runs.append((run_start, len(low_flags) - 1))
+    return runs
@@ -0,0 +1,125 @@
+"""Period-over-period comparison from one parse.
+
+Two date ranges of the same chat each get basic stats, reply behavior, time
+patterns and the text analysis (word cloud), plus a ``delta`` of what
+changed from the first period to the second. The table is scanned once for
+both periods (``engine.run_periods``: each period has its own accumulators,
+fed only its rows), and jieba segments each distinct text once for both
+through a shared token cache.
+"""
+from datetime import date
+
+from app.services.date_range import records_between, row_range
+from app.services.engine import AccumulatorFactory, default_sections, run_periods
+from app.services.message_table import as_table
+from app.services.text_analysis import compute_text_analysis
+
+# Sections computed for each period
+COMPARE_SECTIONS = ("basicStats", "replyBehavior", "timePatterns")
+
+# Inclusive (start, end); None leaves a side open
+Period = tuple[date | None, date | None]
+
+
+def compare_periods(
+    parsed: dict,
+    first: Period,
+    second: Period,
+    sections: dict[str, AccumulatorFactory] | None = None,
+) -> dict:
+    """Sections for both periods and their ``delta`` (second minus first).
+
+    Both periods report the same ``persons`` (everyone who sent a message or
+    placed a call in either), so their sections line up key for key.
+    Raises ValueError if a period has no messages.
+    """
+    table = as_table(parsed)
+    periods = (first, second)
+    ranges = [row_range(table, start, end) for start, end in periods]
+    if any(lo == hi for lo, hi in ranges):
+        raise ValueError("No messages found in one of the periods")
+    calls = [records_between(parsed["calls"], start, end) for start, end in periods]
+    present = {table.sender_names[code] for lo, hi in ranges for code in set(table.senders[lo:hi])}
+    present.update(call.caller for period_calls in calls for call in period_calls)
+    persons = [p for p in parsed["persons"] if p in present]
+
+    views = [
+        (
+            {
+                "messages": table,
+                "calls": period_calls,
+                "transfers": records_between(parsed["transfers"], start, end),
+                "persons": persons,
+            },
+            lo,
+            hi,
+        )
+        for (start, end), (lo, hi), period_calls in zip(periods, ranges, calls)
+    ]
+    sections = default_sections() if sections is None else sections
+    results = run_periods(views, {name: sections[name] for name in COMPARE_SECTIONS})
+
+    token_cache: dict[str, list[str]] = {}
+    for result, (view, lo, hi) in zip(results, views):
+        text_analysis, _ = compute_text_analysis({**view, "messages": table.slice_rows(lo, hi)}, token_cache)
+        text_analysis.pop("_word_idf", None)
+        text_analysis.pop("_msg_words", None)
+        result["textAnalysis"] = text_analysis
+
+    before, after = results
+    delta = {name: _delta(before[name], after[name]) for name in COMPARE_SECTIONS}
+    if delta["timePatterns"]:
+        # The two trends cover different periods: nothing to subtract
+        delta["timePatterns"].pop("trend", None)
+    delta["textAnalysis"] = {
+        "wordCloud": _word_cloud_delta(before["textAnalysis"]["wordCloud"], after["textAnalysis"]["wordCloud"]),
+    }
+    return {
+        "persons": persons,
+        "periods": [
+            {"start": str(start) if start else None, "end": str(end) if end else None, **result}
+            for (start, end), result in zip(periods, results)
+        ],
+        "delta": delta,
+    }
+
+
+def _delta(before, after):
+    """``after - before`` for every number both sides hold, in the same shape.
+
+    Dicts keep the keys present on both sides; lists are compared item by
+    item only when they hold numbers (or lists of numbers) and have the same
+    length. Anything else (text, dates, lists of records) is dropped; None
+    if nothing is left.
+    """
+    if isinstance(before, bool) or isinstance(after, bool):
+        return None
+    if isinstance(before, (int, float)) and isinstance(after, (int, float)):
+        change = after - before
+        return round(change, 2) if isinstance(change, float) else change
+    if isinstance(before, dict) and isinstance(after, dict):
+        changes = {}
+        for key, value in before.items():
+            if key in after:
+                change = _delta(value, after[key])
+                if change is not None:
+                    changes[key] = change
+        return changes or None
+    if isinstance(before, list) and isinstance(after, list) and before and len(before) == len(after):
+        changes = [_delta(a, b) for a, b in zip(before, after)]
+        if all(isinstance(a, (int, float, list)) for a in before) and None not in changes:
+            return changes
+    return None
+
+
+def _word_cloud_delta(before: dict, after: dict) -> dict:
+    """Per person, the words that entered (``gained``) or left (``lost``) their word cloud."""
+    changes = {}
+    for person, entries in after.items():
+        old = {e["word"] for e in before.get(person, [])}
+        new = {e["word"] for e in entries}
+        changes[person] = {
+            "gained": [e["word"] for e in entries if e["word"] not in old],
+            "lost": [e["word"] for e in before.get(person, []) if e["word"] not in new],
+        }
+    return changes
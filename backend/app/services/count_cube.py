@@ -0,0 +1,384 @@
+"""Count cube: messages per (day, hour, sender, type), built once per scan.
+
+Heatmap, trend, type breakdown, person balance and call counts are all
+projections of the same counts. ``CountCube`` is a shared index (like the
+``DayIndex``) that counts every row once into integer cells keyed
+
+    key = (hour ordinal * n_senders + sender code) * n_types + type code
+
+where the hour ordinal ``ts // 3600`` is ``day ordinal * 24 + hour``. Only
+non-empty cells are kept. ``finalize`` packs them into arrays and rolls them
+up into two smaller cubes, so most slices never touch the full one:
+
+- ``day_keys`` / ``day_counts``: (day, sender), sparse
+- ``weekday_hour``: (weekday, hour, sender, type), dense
+
+``CallCube`` holds the calls the same way: calls, completed calls, seconds
+and the longest call per (day, hour, caller).
+
+``query_cube`` sums any slice of either cube (group by any dimensions,
+filter on any of them), picking the smallest cube that has every dimension
+the query needs. Nothing is rescanned, and a query that needs neither dates
+nor hours only visits the rollups. Each level is decoded into rows of
+dimension values once, on its first query; ``VecCountCube`` keeps them as
+NumPy columns and slices them with masks instead of a row loop.
+"""
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date
+from functools import reduce
+from operator import add, itemgetter
+
+from app.services.message_table import (
+    IndexConsumer,
+    MessageTable,
+    RowBlock,
+    as_table,
+    scan,
+)
+from app.services.records import CallRecord
+
+# Slice dimensions; a row of any cube decodes to one value per dimension
+DIMENSIONS = ("day", "month", "weekday", "hour", "sender", "type")
+# Measure → how two values combine. "messages" comes from the CountCube, the rest from the CallCube
+MEASURES = {
+    "messages": add,
+    "calls": add,
+    "completedCalls": add,
+    "callSeconds": add,
+    "longestCallSeconds": max,
+}
+# CallCube value columns, in MEASURES order
+CALL_MEASURES = ("calls", "completedCalls", "callSeconds", "longestCallSeconds")
+# Dimensions that need a day (``where`` also takes ``start``/``end``)
+_DAY_DIMS = {"day", "month"}
+_DIM_INDEX = {dim: i for i, dim in enumerate(DIMENSIONS)}
+
+
+class CountCube:
+    """Message counts per (hour ordinal, sender code, type code) cell.
+
+    While scanning, cells are counted in a dict; ``finalize`` (idempotent,
+    called by the readers since the engine only finalizes sections) packs
+    them into ``array('q')`` columns and builds the rollups. A cube cannot
+    be added to or merged after it is finalized.
+    """
+
+    def __init__(self, table: MessageTable) -> None:
+        # Names only: a kept cube must not hold on to the table (and its content)
+        self.sender_names = list(table.sender_names)
+        self.type_names = list(table.type_names)
+        self.n_senders = len(self.sender_names)
+        self.n_types = len(self.type_names)
+        self.counts: Counter[int] = Counter()
+        self.cell_keys: array | None = None
+        self.cell_counts: array | None = None
+        self.day_keys: array | None = None
+        self.day_counts: array | None = None
+        self.weekday_hour: array | None = None
+        # Level name → decoded rows, built on a level's first query
+        self._decoded: dict = {}
+
+    def add(self, block: RowBlock) -> None:
+        n_senders, n_types = self.n_senders, self.n_types
+        self.counts.update([
+            (ts // 3600 * n_senders + s) * n_types + t
+            for ts, s, t in zip(block.timestamps, block.senders, block.types)
+        ])
+
+    def merge(self, other: "CountCube") -> None:
+        self.counts.update(other.counts)
+
+    def finalize(self) -> "CountCube":
+        if self.cell_keys is None:
+            self._pack()
+        return self
+
+    def _pack(self) -> None:
+        n_senders, n_types = self.n_senders, self.n_types
+        n_cells = n_senders * n_types
+        # date.fromordinal(1) is a Monday, so the hour ordinal's slot in the
+        # week (weekday * 24 + hour) is (hour ordinal - 24) % 168
+        week, shift = 7 * 24 * n_cells, 24 * n_cells
+        weekday_hour = [0] * week
+        by_day: dict[int, int] = {}
+        get = by_day.get
+        for key, n in self.counts.items():
+            weekday_hour[(key - shift) % week] += n
+            k = key // shift * n_senders + key % n_cells // n_types
+            by_day[k] = get(k, 0) + n
+        self.cell_keys = array("q", self.counts.keys())
+        self.cell_counts = array("q", self.counts.values())
+        self.day_keys = array("q", by_day.keys())
+        self.day_counts = array("q", by_day.values())
+        self.weekday_hour = array("q", weekday_hour)
+        self.counts = Counter()
+
+    def totals(
+        self,
+        group_by: tuple[str, ...] = (),
+        where: dict[str, set] | None = None,
+        days: tuple[int, int] | None = None,
+    ) -> dict[tuple, int]:
+        """Messages per group of raw dimension values: day ordinal, month index
+        (``year * 12 + month - 1``), weekday, hour, sender code, type code.
+
+        *where* maps dimensions to the raw values to keep; *days* keeps day
+        ordinals in ``[first, last]``.
+        """
+        self.finalize()
+        if not group_by and not where and days is None:
+            return {(): sum(self.weekday_hour)} if self.cell_keys else {}
+        where = where or {}
+        dims = set(group_by) | set(where)
+        needs_day = days is not None or bool(dims & _DAY_DIMS)
+        if needs_day and ("hour" in dims or "type" in dims):
+            level = "cell"
+        elif needs_day:
+            level = "day"
+        else:
+            level = "weekday_hour"
+        rows = self._decoded.get(level)
+        if rows is None:
+            rows = self._decoded[level] = self._decode(level)
+        return self._sum(rows, group_by, where, days)
+
+    def _decode(self, level: str):
+        """The rows of one level: ``(day, month, weekday, hour, sender, type, count)``."""
+        return list(getattr(self, f"_{level}_rows")())
+
+    def _sum(
+        self, rows, group_by: tuple[str, ...], where: dict[str, set], days: tuple[int, int] | None,
+    ) -> dict[tuple, int]:
+        return _aggregate(rows, group_by, where, days, add)
+
+    def _cell_rows(self) -> Iterator[tuple]:
+        n_senders, n_types = self.n_senders, self.n_types
+        months = _MonthCache()
+        for key, n in zip(self.cell_keys, self.cell_counts):
+            hour, cell = divmod(key, n_senders * n_types)
+            day, h = divmod(hour, 24)
+            sender, t = divmod(cell, n_types)
+            yield day, months[day], (day - 1) % 7, h, sender, t, n
+
+    def _day_rows(self) -> Iterator[tuple]:
+        n_senders = self.n_senders
+        months = _MonthCache()
+        for key, n in zip(self.day_keys, self.day_counts):
+            day, sender = divmod(key, n_senders)
+            yield day, months[day], (day - 1) % 7, None, sender, None, n
+
+    def _weekday_hour_rows(self) -> Iterator[tuple]:
+        n_senders, n_types = self.n_senders, self.n_types
+        for key, n in enumerate(self.weekday_hour):
+            if n:
+                slot, cell = divmod(key, n_senders * n_types)
+                weekday, h = divmod(slot, 24)
+                sender, t = divmod(cell, n_types)
+                yield None, None, weekday, h, sender, t, n
+
+
+class CallCube:
+    """Calls per (hour ordinal, caller code) cell: one value column per CALL_MEASURES.
+
+    Callers get codes in order of first call (``callers``); they are names,
+    like message senders, but the codes are the cube's own.
+    """
+
+    def __init__(self, calls: Iterable[CallRecord]) -> None:
+        self.callers: list[str] = []
+        codes: dict[str, int] = {}
+        hours = []
+        for c in calls:
+            code = codes.get(c.caller)
+            if code is None:
+                code = codes[c.caller] = len(self.callers)
+                self.callers.append(c.caller)
+            ts = c.timestamp
+            hours.append((ts.toordinal() * 24 + ts.hour, code, c.duration_seconds))
+        n_callers = len(self.callers)
+        cells: dict[int, list[int]] = {}
+        for hour, code, seconds in hours:
+            key = hour * n_callers + code
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0, 0, 0, 0]
+            cell[0] += 1
+            if seconds > 0:
+                cell[1] += 1
+                cell[2] += seconds
+                cell[3] = max(cell[3], seconds)
+        self.keys = array("q", cells.keys())
+        self.columns = {
+            measure: array("q", map(itemgetter(i), cells.values()))
+            for i, measure in enumerate(CALL_MEASURES)
+        }
+
+    def totals(
+        self,
+        measure: str = "calls",
+        group_by: tuple[str, ...] = (),
+        where: dict[str, set] | None = None,
+        days: tuple[int, int] | None = None,
+    ) -> dict[tuple, int]:
+        """*measure* per group of raw dimension values; calls have no ``type``."""
+        if "type" in group_by or (where and "type" in where):
+            raise ValueError("Calls have no type dimension")
+        if not group_by and not where and days is None:
+            column = self.columns[measure]
+            return {(): reduce(MEASURES[measure], column)} if column else {}
+        return _aggregate(self._rows(measure), group_by, where or {}, days, MEASURES[measure])
+
+    def _rows(self, measure: str) -> Iterator[tuple]:
+        n_callers = len(self.callers)
+        months = _MonthCache()
+        for key, value in zip(self.keys, self.columns[measure]):
+            hour, caller = divmod(key, n_callers)
+            day, h = divmod(hour, 24)
+            yield day, months[day], (day - 1) % 7, h, caller, None, value
+
+
+@dataclass
+class Cubes:
+    """The message and call cubes of one analysis, as ``query_cube`` reads them."""
+
+    messages: CountCube
+    calls: CallCube
+
+
+class CubeAccumulator(IndexConsumer):
+    """Hands over the scan's count cube (plus a call cube) for slicing after the scan."""
+
+    index_factories = {"count_cube": CountCube}
+
+    def __init__(self, table: MessageTable, parsed: dict, count_cube: CountCube | None = None) -> None:
+        self.calls: list[CallRecord] = parsed["calls"]
+        self._use_indexes(table, count_cube=count_cube)
+
+    def finalize(self) -> Cubes:
+        return Cubes(self.count_cube.finalize(), CallCube(self.calls))
+
+
+def build_cubes(parsed: dict) -> Cubes:
+    table = as_table(parsed)
+    acc = CubeAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
+
+
+def query_cube(
+    cubes: Cubes,
+    measure: str = "messages",
+    group_by: Iterable[str] = (),
+    where: dict | None = None,
+) -> list[dict]:
+    """One ``{dimension: value, …, measure: total}`` row per non-empty group, in order.
+
+    *where* keeps only the given ``weekday`` (0 = Monday) / ``hour`` numbers
+    and ``sender`` / ``type`` names, and ``start`` / ``end`` dates
+    (``YYYY-MM-DD``, inclusive). Groups come out as ``day`` "YYYY-MM-DD",
+    ``month`` "YYYY-MM", ``weekday`` and ``hour`` numbers, and ``sender`` /
+    ``type`` names; ``sender`` is the caller for call measures. Without
+    *group_by* there is one row, the total. Raises ValueError for unknown
+    measures, dimensions or filters.
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"Unknown measure: {measure}")
+    group_by = tuple(group_by)
+    for dim in group_by:
+        if dim not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {dim}")
+    where = dict(where or {})
+    days = None
+    start, end = where.pop("start", None), where.pop("end", None)
+    if start is not None or end is not None:
+        try:
+            days = (
+                date.fromisoformat(start).toordinal() if start is not None else 1,
+                date.fromisoformat(end).toordinal() if end is not None else date.max.toordinal(),
+            )
+        except (TypeError, ValueError):
+            raise ValueError("start and end must be YYYY-MM-DD dates")
+
+    is_calls = measure != "messages"
+    sender_names = cubes.calls.callers if is_calls else cubes.messages.sender_names
+    type_names = cubes.messages.type_names
+    raw_where: dict[str, set] = {}
+    for dim, values in where.items():
+        if dim in ("weekday", "hour"):
+            raw_where[dim] = {int(v) for v in values}
+        elif dim == "sender":
+            raw_where[dim] = {code for code, name in enumerate(sender_names) if name in values}
+        elif dim == "type":
+            raw_where[dim] = {code for code, name in enumerate(type_names) if name in values}
+        else:
+            raise ValueError(f"Unknown filter: {dim}")
+
+    if is_calls:
+        totals = cubes.calls.totals(measure, group_by, raw_where, days)
+    else:
+        totals = cubes.messages.totals(group_by, raw_where, days)
+    if not group_by:
+        return [{measure: totals.get((), 0)}]
+
+    def label(dim: str, value: int):
+        if dim == "day":
+            return str(date.fromordinal(value))
+        if dim == "month":
+            return f"{value // 12:04d}-{value % 12 + 1:02d}"
+        if dim == "sender":
+            return sender_names[value]
+        if dim == "type":
+            return type_names[value]
+        return value
+
+    rows = []
+    for key in sorted(totals):
+        row = {dim: label(dim, value) for dim, value in zip(group_by, key)}
+        row[measure] = totals[key]
+        rows.append(row)
+    return rows
+
+
+class _MonthCache(dict):
+    """Day ordinal → month index (``year * 12 + month - 1``), computed once per day."""
+
+    def __missing__(self, day: int) -> int:
+        d = date.fromordinal(day)
+        month = self[day] = d.year * 12 + d.month - 1
+        return month
+
+
+def _aggregate(
+    rows: Iterable[tuple],
+    group_by: tuple[str, ...],
+    where: dict[str, set],
+    days: tuple[int, int] | None,
+    combine,
+) -> dict[tuple, int]:
+    """Combine the value (last field) of the rows that pass the filters, per group."""
+    indices = [_DIM_INDEX[dim] for dim in group_by]
+    if len(indices) == 1:
+        get = itemgetter(indices[0])
+
+        def key_of(row):
+            return (get(row),)
+    elif indices:
+        key_of = itemgetter(*indices)
+    else:
+        def key_of(row):
+            return ()
+    filters = [(_DIM_INDEX[dim], allowed) for dim, allowed in where.items()]
+    first, last = days if days is not None else (None, None)
+    out: dict[tuple, int] = {}
+    for row in rows:
+        if days is not None and not first <= row[0] <= last:
+            continue
+        if filters and any(row[i] not in allowed for i, allowed in filters):
+            continue
+        key = key_of(row)
+        value = row[-1]
+        out[key] = combine(out[key], value) if key in out else value
+    return out
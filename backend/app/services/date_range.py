@@ -0,0 +1,67 @@
+"""Restricting an analysis to a date window.
+
+Rows are chronological, so a window's row range is two binary searches over
+the timestamp column, and the window is copied out as a table of its own:
+every analyzer (and jieba and the AI sampling after them) then only sees
+the selected days. While streaming an upload the parser can also drop the
+days before the window and stop at the first date header past it
+(``ChatStreamParser(since=..., until=...)``), so rows outside the window are
+mostly never built.
+"""
+from bisect import bisect_left
+from datetime import date, datetime
+from operator import attrgetter
+
+from app.services.message_table import SECONDS_PER_DAY, MessageTable
+
+
+def parse_date_range(start: str | None, end: str | None) -> tuple[date | None, date | None]:
+    """Inclusive (start, end) from ``YYYY-MM-DD`` strings; None leaves a side open.
+
+    Raises ValueError for malformed dates or an end before the start.
+    """
+    try:
+        first = date.fromisoformat(start) if start else None
+        last = date.fromisoformat(end) if end else None
+    except ValueError:
+        raise ValueError("start and end must be YYYY-MM-DD dates")
+    if first is not None and last is not None and last < first:
+        raise ValueError("end must not be before start")
+    return first, last
+
+
+def row_range(table: MessageTable, start: date | None, end: date | None) -> tuple[int, int]:
+    """Rows [lo, hi) of *table* dated from *start* to *end*, inclusive."""
+    timestamps = table.timestamps
+    lo = bisect_left(timestamps, start.toordinal() * SECONDS_PER_DAY) if start else 0
+    hi = bisect_left(timestamps, (end.toordinal() + 1) * SECONDS_PER_DAY) if end else len(timestamps)
+    return lo, max(lo, hi)
+
+
+def records_between(records: list, start: date | None, end: date | None) -> list:
+    """Calls or transfers (chronological) dated from *start* to *end*, inclusive."""
+    key = attrgetter("timestamp")
+    lo = bisect_left(records, datetime.combine(start, datetime.min.time()), key=key) if start else 0
+    hi = bisect_left(records, datetime.fromordinal(end.toordinal() + 1), key=key) if end else len(records)
+    return records[lo:hi]
+
+
+def select_dates(parsed: dict, start: date | None, end: date | None) -> dict:
+    """The parsed dict restricted to messages, calls and transfers from *start* to *end*.
+
+    ``persons`` keeps only those who sent a message or placed a call in the
+    window.
+    """
+    if start is None and end is None:
+        return parsed
+    table = parsed["messages"]
+    window = table.slice_rows(*row_range(table, start, end))
+    calls = records_between(parsed["calls"], start, end)
+    present = {window.sender_names[code] for code in set(window.senders)}
+    present.update(call.caller for call in calls)
+    return {
+        "messages": window,
+        "calls": calls,
+        "transfers": records_between(parsed["transfers"], start, end),
+        "persons": [p for p in parsed["persons"] if p in present],
+    }
@@ -0,0 +1,102 @@
+"""Per-day index of a message table, built once per scan and shared.
+
+Several sections need per-day data:
+- cold wars, the cold war sweep and the CUSUM engine: daily totals
+- basic stats: the first and last day
+- goodnight analysis: each day's row range
+
+A ``DayIndex`` is one accumulator that derives all of it in a single walk.
+The engine scans it ahead of the accumulators that read it (see
+``message_table.IndexConsumer``), so they share one copy instead of each
+counting days themselves. (Counts per day and sender come from the
+``CountCube``.)
+
+Rows of one day are contiguous in a parsed export (one date header per
+day), so each block is counted one day-run at a time. Runs are found by
+bisecting the block's day column.
+"""
+from bisect import bisect_right
+
+from app.services.message_table import MessageTable, RowBlock
+
+
+class DayIndex:
+    """Message counts per day ordinal, plus row ranges.
+
+    ``rows[day]`` is ``[start, stop)``, from the day's first row to just after
+    its last. The dicts fill in row order; use ``days()`` for a sorted view.
+    """
+
+    def __init__(self, table: MessageTable) -> None:
+        self.table = table
+        self.totals: dict[int, int] = {}
+        self.rows: dict[int, list[int]] = {}
+        self.first_day: int | None = None
+        self.last_day: int | None = None
+
+    def add(self, block: RowBlock) -> None:
+        days = block.days
+        if not days:
+            return
+        totals, rows = self.totals, self.rows
+        if sorted(days) == days:
+            # Day order (the usual case): one bisect per day
+            runs = []
+            i = 0
+            while i < len(days):
+                j = bisect_right(days, days[i], i)
+                runs.append((i, j))
+                i = j
+            first, last = days[0], days[-1]
+        else:
+            runs = [(i, i + 1) for i in range(len(days))]
+            first, last = min(days), max(days)
+        for i, j in runs:
+            day = days[i]
+            start, stop = block.start + i, block.start + j
+            span = rows.get(day)
+            if span is None:
+                totals[day] = 0
+                rows[day] = [start, stop]
+            else:
+                span[0], span[1] = min(span[0], start), max(span[1], stop)
+            totals[day] += j - i
+        self._extend_range(first, last)
+
+    def _extend_range(self, first: int, last: int) -> None:
+        if self.first_day is None or first < self.first_day:
+            self.first_day = first
+        if self.last_day is None or last > self.last_day:
+            self.last_day = last
+
+    def _add_day(self, day: int, total: int, start: int, stop: int) -> None:
+        """Fold in one day's count and row range (from another chunk or a vectorized block)."""
+        span = self.rows.get(day)
+        if span is None:
+            self.totals[day] = total
+            self.rows[day] = [start, stop]
+            return
+        self.totals[day] += total
+        span[0], span[1] = min(span[0], start), max(span[1], stop)
+
+    def merge(self, other: "DayIndex") -> None:
+        if other.first_day is None:
+            return
+        for day, total in other.totals.items():
+            span = other.rows[day]
+            self._add_day(day, total, span[0], span[1])
+        self._extend_range(other.first_day, other.last_day)
+
+    def finalize(self) -> "DayIndex":
+        return self
+
+    def days(self) -> list[int]:
+        """Day ordinals that have messages, ascending."""
+        return sorted(self.totals)
+
+    def dense_totals(self) -> list[int]:
+        """Totals for every day from ``first_day`` to ``last_day``, zeros included."""
+        if self.first_day is None:
+            return []
+        get = self.totals.get
+        return [get(day, 0) for day in range(self.first_day, self.last_day + 1)]
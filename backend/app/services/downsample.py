@@ -0,0 +1,63 @@
+"""Shape-preserving downsampling of chart series (Largest-Triangle-Three-Buckets).
+
+LTTB keeps the first and last points and, from each of the buckets in
+between, the point that forms the largest triangle with the point kept
+from the previous bucket and the average of the next bucket. Peaks and
+drops survive, unlike with plain decimation or averaging.
+"""
+from datetime import date
+
+
+def lttb_indices(xs: list[float], ys: list[float], points: int) -> list[int]:
+    """Indices of the *points* (at least 3) samples LTTB keeps, ascending."""
+    size = len(xs)
+    if points >= size:
+        return list(range(size))
+    if points < 3:
+        raise ValueError("LTTB needs at least 3 points")
+    every = (size - 2) / (points - 2)
+    kept = [0]
+    a = 0
+    for i in range(points - 2):
+        # Average of the next bucket (the last point, for the last bucket)
+        next_start = int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, size)
+        span = next_stop - next_start
+        avg_x = sum(xs[next_start:next_stop]) / span
+        avg_y = sum(ys[next_start:next_stop]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = next_start - 1, -1.0
+        for j in range(int(i * every) + 1, next_start):
+            # Twice the triangle area; the factor does not change the pick
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(size - 1)
+    return kept
+
+
+def _period_ordinal(period: str) -> int:
+    """Day ordinal of a ``YYYY-MM-DD`` day or ``YYYY-MM`` month label."""
+    return date.fromisoformat(period if len(period) == 10 else period + "-01").toordinal()
+
+
+def downsample_trend(trend: dict, points: int) -> dict:
+    """The columnar trend (see ``TrendAccumulator``) with at most *points* periods per resolution.
+
+    Periods are picked by LTTB on the total over all persons, with time on
+    the x axis, and every person's column keeps the same periods.
+    """
+    result = {}
+    for resolution, series in trend.items():
+        periods = series["periods"]
+        columns = list(series["counts"].values())
+        totals = [sum(values) for values in zip(*columns)] if columns else [0] * len(periods)
+        kept = lttb_indices([_period_ordinal(p) for p in periods], totals, points)
+        result[resolution] = {
+            "periods": [periods[i] for i in kept],
+            "counts": {person: [values[i] for i in kept] for person, values in series["counts"].items()},
+        }
+    return result
@@ -0,0 +1,165 @@
+"""Single-pass analytics over a parsed chat.
+
+Each result section is produced by an accumulator (see
+``message_table.Accumulator``). ``run_analyzers`` walks the message table
+once, block by block, and hands every block to all accumulators, so day and
+second-of-day are derived once per row rather than once per analyzer.
+
+When NumPy is installed the vectorized accumulators (``vectorized.py``) are
+used instead; ``ANALYTICS_BACKEND=python`` forces the pure-Python ones.
+
+Accumulator state is mergeable: ``chunk_rows`` scans the table as separate
+row ranges and reduces the per-chunk states left to right, which gives the
+same result as one scan (the map step could run anywhere). ``run_periods``
+computes sections for several row ranges of one table in a single scan,
+each range with its own accumulators.
+
+Accumulators that read shared indexes (``index_factories``: the
+``DayIndex`` of per-day counts, the ``SessionIndex`` of gap-based sessions,
+the ``CountCube`` of counts per hour, sender and type) get one of each that
+``_build`` creates per scan and places ahead of them, so days, sessions and
+counts are worked out once per analysis rather than once per section.
+
+The ``coldWars`` section can come from either cold-war engine
+(``COLD_WAR_ENGINES``); ``sections_for`` picks one per request and adds the
+opt-in ``coldWarSweep`` section when asked for.
+"""
+import os
+from collections.abc import Callable
+
+from app.services import vectorized
+from app.services.change_point import CusumAccumulator, CusumColdWarAccumulator
+from app.services.cold_war import ColdWarAccumulator, ColdWarSweepAccumulator
+from app.services.first_conversation import FirstConversationAccumulator
+from app.services.message_table import Accumulator, MessageTable, as_table, scan, scan_ranges
+from app.services.reply_analysis import ReplyAccumulator
+from app.services.sessions import SessionStatsAccumulator
+from app.services.stats import BasicStatsAccumulator
+from app.services.time_patterns import TimePatternsAccumulator
+from app.services.transfer_analysis import TransferAccumulator
+
+AccumulatorFactory = Callable[[MessageTable, dict], Accumulator]
+
+# Result section → accumulator factory, in the order sections are reported
+SECTIONS: dict[str, AccumulatorFactory] = {
+    "basicStats": BasicStatsAccumulator,
+    "replyBehavior": ReplyAccumulator,
+    "timePatterns": TimePatternsAccumulator,
+    "coldWars": ColdWarAccumulator,
+    "transferAnalysis": TransferAccumulator,
+    "firstConversation": FirstConversationAccumulator,
+    "sessions": SessionStatsAccumulator,
+}
+
+# Same sections, vectorized where NumPy helps
+VECTOR_SECTIONS: dict[str, AccumulatorFactory] = {
+    **SECTIONS,
+    "basicStats": vectorized.VecBasicStatsAccumulator,
+    "replyBehavior": vectorized.VecReplyAccumulator,
+    "timePatterns": vectorized.VecTimePatternsAccumulator,
+    "coldWars": vectorized.VecColdWarAccumulator,
+}
+
+# "auto" (NumPy when importable) or "python"
+ANALYTICS_BACKEND = os.environ.get("ANALYTICS_BACKEND", "auto")
+
+
+def _use_numpy() -> bool:
+    return ANALYTICS_BACKEND != "python" and vectorized.HAS_NUMPY
+
+
+def default_sections() -> dict[str, AccumulatorFactory]:
+    return VECTOR_SECTIONS if _use_numpy() else SECTIONS
+
+
+# Cold-war engines selectable per request; "cusum" also reports regimeShifts
+COLD_WAR_ENGINES = ("rolling", "cusum")
+
+
+def sections_for(cold_war_engine: str = "rolling", cold_war_sweep: bool = False) -> dict[str, AccumulatorFactory]:
+    """``default_sections()`` with ``coldWars`` from the given engine.
+
+    With *cold_war_sweep*, also ``coldWarSweep``: the rolling detector for
+    every parameter combination (``cold_war.sweep_cold_wars``), too costly
+    to compute for every request.
+    """
+    if cold_war_engine not in COLD_WAR_ENGINES:
+        raise ValueError(f"Unknown cold war engine: {cold_war_engine}")
+    sections = default_sections()
+    if cold_war_engine == "cusum":
+        sections = {
+            **sections,
+            "coldWars": CusumColdWarAccumulator,
+            "regimeShifts": CusumAccumulator,
+        }
+    if cold_war_sweep:
+        sweep = vectorized.VecColdWarSweepAccumulator if _use_numpy() else ColdWarSweepAccumulator
+        sections = {**sections, "coldWarSweep": sweep}
+    return sections
+
+
+def run_analyzers(
+    parsed: dict,
+    sections: dict[str, AccumulatorFactory] | None = None,
+    chunk_rows: int | None = None,
+) -> dict:
+    """Compute every section in one scan; returns ``{section: result}``.
+
+    Pass *sections* to run a different set of accumulators (defaults to
+    ``default_sections()``). With *chunk_rows*, each run of that many rows is
+    scanned into its own accumulators and the states are merged in order.
+    """
+    table = as_table(parsed)
+    sections = default_sections() if sections is None else sections
+    accumulators = _build(table, parsed, sections)
+    if chunk_rows is None:
+        scan(table, accumulators.values())
+    else:
+        for start in range(0, len(table), chunk_rows):
+            part = _build(table, parsed, sections)
+            scan(table, part.values(), start=start, stop=start + chunk_rows)
+            merge_states(accumulators, part)
+    return {name: accumulators[name].finalize() for name in sections}
+
+
+def run_periods(
+    views: list[tuple[dict, int, int]],
+    sections: dict[str, AccumulatorFactory] | None = None,
+) -> list[dict]:
+    """Sections for several row ranges of one table, all in one scan.
+
+    Each view is ``(parsed, start, stop)``: every *parsed* holds the same
+    table plus that range's calls, transfers and persons. Each range gets
+    its own accumulators, which see only its rows (see ``scan_ranges``).
+    """
+    sections = default_sections() if sections is None else sections
+    built = [(start, stop, _build(as_table(parsed), parsed, sections)) for parsed, start, stop in views]
+    if built:
+        scan_ranges(as_table(views[0][0]), [(start, stop, accs.values()) for start, stop, accs in built])
+    return [{name: accs[name].finalize() for name in sections} for _, _, accs in built]
+
+
+def _build(table: MessageTable, parsed: dict, sections: dict[str, AccumulatorFactory]) -> dict[str, Accumulator]:
+    """One accumulator per section, after the shared indexes they read (keyed ``_<name>``).
+
+    The indexes come first so they have seen each block (and are merged)
+    before the accumulators that read them. When sections ask for different
+    classes of the same index (pure-Python and NumPy), the first one wins:
+    both build the same index.
+    """
+    index_factories: dict[str, Callable[[MessageTable], Accumulator]] = {}
+    for factory in sections.values():
+        for name, index_factory in getattr(factory, "index_factories", {}).items():
+            index_factories.setdefault(name, index_factory)
+    indexes = {name: index_factory(table) for name, index_factory in index_factories.items()}
+    accumulators: dict[str, Accumulator] = {f"_{name}": index for name, index in indexes.items()}
+    for name, factory in sections.items():
+        wanted = getattr(factory, "index_factories", {})
+        accumulators[name] = factory(table, parsed, **{key: indexes[key] for key in wanted})
+    return accumulators
+
+
+def merge_states(into: dict[str, Accumulator], following: dict[str, Accumulator]) -> None:
+    """Fold the per-section states of the next chunk into *into*."""
+    for name, acc in into.items():
+        acc.merge(following[name])
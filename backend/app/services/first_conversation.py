@@ -4,13 +4,16 @@ from __future__ import annotations
 
 from datetime import timedelta
 
+from app.services.message_table import IndexConsumer, MessageTable, as_table, scan
 from app.services.parser import Message
+from app.services.sessions import SESSION_GAPS, SessionIndex
 
 # Two adjacent messages within this gap are considered part of the same burst.
 BURST_GAP = timedelta(minutes=30)
 MIN_BURST = 5       # fewer than this → fallback to first N messages
 FALLBACK_COUNT = 20  # how many messages to show in fallback mode
 MAX_MESSAGES = 50    # hard cap to keep payload small
+assert BURST_GAP.total_seconds() in SESSION_GAPS
 
 _NON_TEXT_LABELS: dict[str, str] = {
     "sticker": "[貼圖]",
@@ -19,6 +22,9 @@ _NON_TEXT_LABELS: dict[str, str] = {
     "file": "[檔案]",
     "link": "[連結]",
     "emoji": "[表情符號]",
+    "unsent": "[已收回訊息]",
+    "album": "[相簿]",
+    "note": "[記事本]",
 }
 
 
@@ -39,28 +45,41 @@ def extract_first_conversation(parsed: dict) -> dict | None:
 
     Returns ``None`` when *messages* is empty.
     """
-    messages: list[Message] = parsed.get("messages", [])
-    if not messages:
-        return None
-
-    # --- collect the first burst ---
-    burst: list[Message] = [messages[0]]
-    for prev, cur in zip(messages, messages[1:]):
-        if cur.timestamp - prev.timestamp > BURST_GAP:
-            break
-        burst.append(cur)
-
-    is_fallback = len(burst) < MIN_BURST
-    if is_fallback:
-        chosen = messages[:FALLBACK_COUNT]
-    else:
-        chosen = burst
-
-    # Hard cap
-    chosen = chosen[:MAX_MESSAGES]
+    table = as_table(parsed)
+    acc = FirstConversationAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
 
-    return {
-        "messages": [_format_message(m) for m in chosen],
-        "startDate": chosen[0].timestamp.strftime("%Y-%m-%d"),
-        "isFallback": is_fallback,
-    }
+
+class FirstConversationAccumulator(IndexConsumer):
+    """The first burst is the first 30-minute session."""
+
+    index_factories = {"session_index": SessionIndex}
+
+    def __init__(self, table: MessageTable, parsed: dict, session_index: SessionIndex | None = None) -> None:
+        self.table = table
+        self._use_indexes(table, session_index=session_index)
+
+    @property
+    def burst_len(self) -> int:
+        index = self.session_index
+        starts = index.starts[int(BURST_GAP.total_seconds())]
+        if not starts:
+            return 0
+        end = starts[1] if len(starts) > 1 else index.stop
+        return min(end - starts[0], MAX_MESSAGES)
+
+    def finalize(self) -> dict | None:
+        if not self.table:
+            return None
+
+        is_fallback = self.burst_len < MIN_BURST
+        count = FALLBACK_COUNT if is_fallback else self.burst_len
+        # Hard cap
+        chosen = self.table[:min(count, MAX_MESSAGES)]
+
+        return {
+            "messages": [_format_message(m) for m in chosen],
+            "startDate": chosen[0].timestamp.strftime("%Y-%m-%d"),
+            "isFallback": is_fallback,
+        }
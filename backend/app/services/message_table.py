@@ -0,0 +1,345 @@
+"""Columnar, array-backed storage for parsed chat messages.
+
+A ``MessageTable`` keeps one compact column per field instead of one Python
+object per message:
+
+- ``timestamps``: ``array('q')`` of ordinal seconds
+  (``date.toordinal() * 86400 + second_of_day``), so ``ts // 86400`` is the
+  day ordinal and ``ts % 86400 // 3600`` the hour
+- ``senders`` / ``types``: small-int codes into ``sender_names`` / ``type_names``
+- ``char_counts``: ``len(content)`` per message (for word counts)
+- content: one UTF-8 ``bytearray`` plus an ``array('Q')`` of end offsets
+
+It also behaves as a read-only ``Sequence[Message]`` so code that iterates
+``parsed["messages"]`` keeps working; ``Message`` objects are built on access.
+"""
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Protocol
+
+from app.services.records import Message
+
+SECONDS_PER_DAY = 86400
+# Rows per block handed to accumulators by ``scan``
+BLOCK_ROWS = 65536
+
+
+def to_ordinal_seconds(ts: datetime) -> int:
+    return ts.toordinal() * SECONDS_PER_DAY + ts.hour * 3600 + ts.minute * 60 + ts.second
+
+
+def from_ordinal_seconds(value: int) -> datetime:
+    day, sec = divmod(value, SECONDS_PER_DAY)
+    return datetime.fromordinal(day) + timedelta(seconds=sec)
+
+
+class MessageTable(Sequence):
+    """Chronological message columns. Append-only; build via the parser."""
+
+    def __init__(self) -> None:
+        self.timestamps = array("q")
+        self.senders = array("H")
+        self.types = array("B")
+        self.char_counts = array("I")
+        self.sender_names: list[str] = []
+        self.type_names: list[str] = []
+        self._sender_codes: dict[str, int] = {}
+        self._type_codes: dict[str, int] = {}
+        self._content = bytearray()
+        self._ends = array("Q")
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[Message]) -> "MessageTable":
+        table = cls()
+        for m in messages:
+            table.append(to_ordinal_seconds(m.timestamp), m.sender, m.msg_type, m.content)
+        return table
+
+    def append(self, ts: int, sender: str, msg_type: str, content: str) -> None:
+        code = self._sender_codes.get(sender)
+        if code is None:
+            code = self._code(self._sender_codes, self.sender_names, sender)
+        tcode = self._type_codes.get(msg_type)
+        if tcode is None:
+            tcode = self._code(self._type_codes, self.type_names, msg_type)
+        self.timestamps.append(ts)
+        self.senders.append(code)
+        self.types.append(tcode)
+        self.char_counts.append(len(content))
+        self._content += content.encode("utf-8")
+        self._ends.append(len(self._content))
+
+    def extend(self, other: "MessageTable") -> None:
+        """Append all rows of *other*, remapping its sender/type codes."""
+        sender_map = array("H", (self._code(self._sender_codes, self.sender_names, n)
+                                 for n in other.sender_names))
+        type_map = array("B", (self._code(self._type_codes, self.type_names, n)
+                               for n in other.type_names))
+        base = len(self._content)
+        self.timestamps.extend(other.timestamps)
+        self.senders.extend(array("H", map(sender_map.__getitem__, other.senders)))
+        self.types.extend(array("B", map(type_map.__getitem__, other.types)))
+        self.char_counts.extend(other.char_counts)
+        self._content += other._content
+        self._ends.extend(array("Q", [e + base for e in other._ends]))
+
+    def slice_rows(self, start: int, stop: int) -> "MessageTable":
+        """Rows [start, stop) copied into a new table.
+
+        Only the senders and types present in those rows get codes, in order
+        of first appearance, as if the rows had been parsed on their own.
+        """
+        part = MessageTable()
+        part.timestamps = self.timestamps[start:stop]
+        part.senders = _recode(self.senders[start:stop], self.sender_names, part._sender_codes, part.sender_names)
+        part.types = _recode(self.types[start:stop], self.type_names, part._type_codes, part.type_names)
+        part.char_counts = self.char_counts[start:stop]
+        ends = self._ends[start:stop]
+        if ends:
+            base = self._ends[start - 1] if start > 0 else 0
+            part._content = self._content[base:ends[-1]]
+            part._ends = array("Q", [e - base for e in ends]) if base else ends
+        return part
+
+    def extend_last(self, text: str) -> None:
+        """Append *text* to the content of the last message."""
+        self._content += text.encode("utf-8")
+        self._ends[-1] = len(self._content)
+        self.char_counts[-1] += len(text)
+
+    @staticmethod
+    def _code(codes: dict[str, int], names: list[str], name: str) -> int:
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def sender_code(self, name: str) -> int | None:
+        return self._sender_codes.get(name)
+
+    def type_code(self, msg_type: str) -> int | None:
+        return self._type_codes.get(msg_type)
+
+    def content(self, i: int) -> str:
+        start = self._ends[i - 1] if i > 0 else 0
+        return self._content[start:self._ends[i]].decode("utf-8")
+
+    def message(self, i: int) -> Message:
+        return Message(
+            timestamp=from_ordinal_seconds(self.timestamps[i]),
+            sender=self.sender_names[self.senders[i]],
+            content=self.content(i),
+            msg_type=self.type_names[self.types[i]],
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.message(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self.message(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MessageTable):
+            return (
+                self.timestamps == other.timestamps
+                and [self.sender_names[c] for c in self.senders]
+                == [other.sender_names[c] for c in other.senders]
+                and [self.type_names[c] for c in self.types]
+                == [other.type_names[c] for c in other.types]
+                and [self.content(i) for i in range(len(self))]
+                == [other.content(i) for i in range(len(other))]
+            )
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def iter_blocks(
+        self, size: int = BLOCK_ROWS, start: int = 0, stop: int | None = None,
+    ) -> Iterator["RowBlock"]:
+        """Yield consecutive row blocks in table order.
+
+        With *start*/*stop* only that row range is covered, and it is treated
+        as a table of its own: the first block has no previous row.
+        """
+        end = len(self) if stop is None else min(stop, len(self))
+        prev_ts = prev_sender = None
+        for first in range(start, end, size):
+            last = min(first + size, end)
+            timestamps = self.timestamps[first:last]
+            senders = self.senders[first:last]
+            yield RowBlock(
+                start=first,
+                timestamps=timestamps,
+                senders=senders,
+                types=self.types[first:last],
+                char_counts=self.char_counts[first:last],
+                prev_ts=prev_ts,
+                prev_sender=prev_sender,
+            )
+            prev_ts, prev_sender = timestamps[-1], senders[-1]
+
+
+def _recode(codes: array, names: list[str], new_codes: dict[str, int], new_names: list[str]) -> array:
+    """*codes* renumbered in order of first appearance, registering their names."""
+    used = list(dict.fromkeys(codes))
+    for code in used:
+        MessageTable._code(new_codes, new_names, names[code])
+    if used == list(range(len(used))):
+        return codes
+    mapping = {old: new for new, old in enumerate(used)}
+    return array(codes.typecode, map(mapping.__getitem__, codes))
+
+
+@dataclass
+class RowBlock:
+    """A contiguous slice of table rows, as seen by accumulators."""
+
+    start: int                 # table index of the first row
+    timestamps: array          # ordinal seconds
+    senders: array
+    types: array
+    char_counts: array
+    prev_ts: int | None        # the row just before this block (None for the first block)
+    prev_sender: int | None
+
+    # Derived once per block and shared by every accumulator that asks
+
+    @cached_property
+    def days(self) -> list[int]:
+        """Day ordinal per row."""
+        return [ts // SECONDS_PER_DAY for ts in self.timestamps]
+
+    @cached_property
+    def secs(self) -> list[int]:
+        """Second of day per row."""
+        return [ts % SECONDS_PER_DAY for ts in self.timestamps]
+
+    def clip(self, start: int, stop: int) -> "RowBlock":
+        """This block's rows within table rows [start, stop), as seen by a scan from *start*.
+
+        Returns the block itself when it lies wholly inside the range.
+        """
+        lo = max(start - self.start, 0)
+        hi = min(stop - self.start, len(self.timestamps))
+        # The range's first block has no previous row
+        first = start >= self.start
+        if not lo and hi == len(self.timestamps) and (not first or self.prev_ts is None):
+            return self
+        return RowBlock(
+            start=self.start + lo,
+            timestamps=self.timestamps[lo:hi],
+            senders=self.senders[lo:hi],
+            types=self.types[lo:hi],
+            char_counts=self.char_counts[lo:hi],
+            prev_ts=None if first else self.prev_ts,
+            prev_sender=None if first else self.prev_sender,
+        )
+
+
+class Accumulator(Protocol):
+    """Consumes row blocks in table order and produces one result section.
+
+    ``merge`` folds in an accumulator of the same kind that scanned the rows
+    directly after this one's (as a separate ``scan`` range), so a table can
+    be scanned in chunks and reduced left to right with the same result as a
+    single scan. Either side may have seen no rows.
+    """
+
+    def add(self, block: RowBlock) -> None: ...
+
+    def merge(self, other: "Accumulator") -> None: ...
+
+    def finalize(self): ...
+
+
+class IndexConsumer:
+    """Base for accumulators that read shared per-scan indexes (day, session).
+
+    ``index_factories`` maps each index's keyword / attribute name to its
+    class. The engine builds one of each per scan, hands it every block (and
+    merges it) ahead of its readers, and passes it in; an accumulator given
+    none builds, feeds and merges its own.
+    """
+
+    index_factories: dict = {}
+
+    def _use_indexes(self, table: "MessageTable", **indexes) -> None:
+        self.owned_indexes: list[str] = []
+        for name, factory in self.index_factories.items():
+            index = indexes.get(name)
+            if index is None:
+                index = factory(table)
+                self.owned_indexes.append(name)
+            setattr(self, name, index)
+
+    def add(self, block: RowBlock) -> None:
+        for name in self.owned_indexes:
+            getattr(self, name).add(block)
+
+    def merge(self, other: "IndexConsumer") -> None:
+        for name in self.owned_indexes:
+            getattr(self, name).merge(getattr(other, name))
+
+
+def scan(
+    table: MessageTable,
+    accumulators: Iterable[Accumulator],
+    block_rows: int = BLOCK_ROWS,
+    start: int = 0,
+    stop: int | None = None,
+) -> None:
+    """Walk *table* (or rows ``start:stop``) once, handing each row block to every accumulator."""
+    accumulators = list(accumulators)
+    for block in table.iter_blocks(block_rows, start, stop):
+        for acc in accumulators:
+            acc.add(block)
+
+
+def scan_ranges(
+    table: MessageTable,
+    ranges: Iterable[tuple[int, int, Iterable[Accumulator]]],
+    block_rows: int = BLOCK_ROWS,
+) -> None:
+    """Walk several ``(start, stop, accumulators)`` row ranges of *table* in one pass.
+
+    Each range's accumulators get the same rows as from ``scan(table, accs,
+    start=start, stop=stop)``. Rows shared by overlapping ranges are sliced
+    into one block for all of them, and rows outside every range are skipped.
+    """
+    ranges = [(start, min(stop, len(table)), list(accs)) for start, stop, accs in ranges]
+    ranges = [r for r in ranges if r[0] < r[1]]
+    # Merged, sorted spans covering every range
+    spans: list[list[int]] = []
+    for start, stop, _ in sorted(ranges, key=lambda r: r[0]):
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], stop)
+        else:
+            spans.append([start, stop])
+    for first, last in spans:
+        for block in table.iter_blocks(block_rows, first, last):
+            end = block.start + len(block.timestamps)
+            for start, stop, accumulators in ranges:
+                if start < end and stop > block.start:
+                    part = block.clip(start, stop)
+                    for acc in accumulators:
+                        acc.add(part)
+
+
+def as_table(parsed: dict) -> MessageTable:
+    """Return ``parsed["messages"]`` as a MessageTable, converting plain lists."""
+    messages = parsed["messages"]
+    if isinstance(messages, MessageTable):
+        return messages
+    return MessageTable.from_messages(messages)
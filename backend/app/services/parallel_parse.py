@@ -0,0 +1,144 @@
+"""Multi-core LINE export parsing, split at date-header boundaries.
+
+Day blocks parse independently, so the text is cut into roughly equal
+ranges that each start on a date header line and parsed in a process pool.
+Two pieces of cross-chunk state are fixed up while merging in order:
+
+- continuation lines that open a chunk belong to the previous chunk's last
+  message;
+- short-format transfers ("收到NT$300的轉帳。") infer their payer from the
+  persons seen *so far in the whole file*, which a chunk cannot know.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from app.services.message_table import MessageTable
+from app.services.parser import (
+    DATE_HEADER_EN_RE,
+    DATE_HEADER_ZH_RE,
+    CallRecord,
+    ChatFormat,
+    ChatStreamParser,
+    TransferRecord,
+    infer_payer,
+    parse_line_chat,
+    sniff_format,
+)
+
+logger = logging.getLogger(__name__)
+
+# Below this size the pool round-trip costs more than it saves
+PARALLEL_MIN_CHARS = 1_000_000
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool reused across requests (spawned, so safe from threaded servers)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _next_date_header(text: str, pos: int) -> int | None:
+    """Offset of the first date header line that starts after *pos*."""
+    while True:
+        nl = text.find("\n", pos)
+        if nl < 0:
+            return None
+        start = nl + 1
+        end = text.find("\n", start)
+        line = text[start:end] if end >= 0 else text[start:]
+        if DATE_HEADER_ZH_RE.match(line) or DATE_HEADER_EN_RE.match(line):
+            return start
+        pos = start
+
+
+def split_at_date_headers(text: str, parts: int) -> list[tuple[int, int]]:
+    """Split *text* into up to *parts* (start, end) ranges aligned to date headers."""
+    bounds = [0]
+    for k in range(1, parts):
+        cut = _next_date_header(text, max(len(text) * k // parts, bounds[-1]))
+        if cut is None:
+            break
+        if cut > bounds[-1]:
+            bounds.append(cut)
+    bounds.append(len(text))
+    return list(zip(bounds, bounds[1:]))
+
+
+def _parse_chunk(chunk: str, fmt: ChatFormat) -> tuple:
+    table = MessageTable()
+    parser = ChatStreamParser(table, fmt)
+    records = parser.feed_text(chunk) + parser.close()
+    calls = [r for r in records if isinstance(r, CallRecord)]
+    transfers = [r for r in records if isinstance(r, TransferRecord)]
+    index = {id(t): i for i, t in enumerate(transfers)}
+    inferred = [(index[id(t)], seq) for t, seq in parser.inferred_transfers]
+    return table, calls, transfers, parser.first_seen, inferred, parser.orphan_parts
+
+
+def _merge(results: list[tuple]) -> dict:
+    table = MessageTable()
+    calls: list[CallRecord] = []
+    transfers: list[TransferRecord] = []
+    first_seen: dict[str, tuple[int, int]] = {}  # person → (chunk, seq)
+    fixups: list[tuple[int, tuple[int, int]]] = []
+
+    for k, (chunk_table, chunk_calls, chunk_transfers, seen, inferred, orphans) in enumerate(results):
+        if orphans and table:
+            table.extend_last("\n" + "\n".join(orphans))
+        table.extend(chunk_table)
+        calls.extend(chunk_calls)
+        base = len(transfers)
+        transfers.extend(chunk_transfers)
+        for person, seq in seen.items():
+            first_seen.setdefault(person, (k, seq))
+        fixups.extend((base + i, (k, seq)) for i, seq in inferred)
+
+    for i, pos in fixups:
+        known = [p for p, first in first_seen.items() if first <= pos]
+        transfers[i].sender = infer_payer(transfers[i].receiver, known)
+
+    return {
+        "messages": table,
+        "calls": calls,
+        "transfers": transfers,
+        "persons": sorted(first_seen),
+    }
+
+
+def parse_line_chat_parallel(
+    text: str, workers: int | None = None, min_chars: int = PARALLEL_MIN_CHARS,
+) -> dict:
+    """Parse like ``parse_line_chat`` but across *workers* processes.
+
+    Falls back to the serial parser for small inputs or a single worker.
+    Raises NotLineChatError before fanning out if the head is not a LINE export.
+    """
+    workers = workers or os.cpu_count() or 1
+    fmt = sniff_format(text)
+    if workers < 2 or len(text) < min_chars:
+        return parse_line_chat(text)
+
+    ranges = split_at_date_headers(text, workers)
+    if len(ranges) < 2:
+        return parse_line_chat(text)
+
+    logger.info("parallel parse: %d chars in %d chunks", len(text), len(ranges))
+    pool = _get_pool(workers)
+    results = list(pool.map(_parse_chunk, (text[a:b] for a, b in ranges), repeat(fmt)))
+    return _merge(results)
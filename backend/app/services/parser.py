@@ -1,29 +1,15 @@
+import codecs
 import re
+from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass
-from datetime import datetime, date
 
-
-@dataclass
-class Message:
-    timestamp: datetime
-    sender: str
-    content: str
-    msg_type: str  # "text", "sticker", "photo", "video", "file"
-
-
-@dataclass
-class CallRecord:
-    timestamp: datetime
-    caller: str  # who initiated the call
-    duration_seconds: int  # 0 = missed call
-
-
-@dataclass
-class TransferRecord:
-    timestamp: datetime
-    sender: str   # who paid
-    receiver: str  # who received
-    amount: int
+from app.services.message_table import (
+    SECONDS_PER_DAY, MessageTable, from_ordinal_seconds, to_ordinal_seconds,
+)
+from app.services.records import CallRecord, Message, TransferRecord
+from app.services.timestamps import (
+    TIME_TABLE, date_ordinal, decode_time, time_style, time_table_for,
+)
 
 
 # Chinese format: 2024/01/15（一）
@@ -36,6 +22,7 @@ _TIME_PAT = r"(?:[上下]午)?\d{1,2}:\d{2}(?:\s*[APap][Mm])?"
 MSG_LINE_RE = re.compile(rf"^({_TIME_PAT})\t(.+?)\t(.*)$")
 CALL_LINE_2COL_RE = re.compile(rf"^({_TIME_PAT})\t☎\s*(.+)$")
 CALL_LINE_3COL_RE = re.compile(rf"^({_TIME_PAT})\t(.+?)\t☎\s*(.+)$")
+SYSTEM_LINE_RE = re.compile(rf"^({_TIME_PAT})\t([^\t]+)$")
 CALL_DURATION_RE = re.compile(r"(?:通話時間|Duration)\s*(?:(\d+):)?(\d{1,2}):(\d{2})")
 
 TYPE_MARKERS = {
@@ -73,50 +60,85 @@ def _clean_content(content: str, msg_type: str) -> tuple[str, str]:
     """
     if msg_type != "text":
         return content, msg_type
-    cleaned = _URL_RE.sub("", content)
-    cleaned = _LINE_EMOJI_RE.sub("", cleaned).strip()
+    # Literal prefilters: every URL match contains "://" or "www." (any case,
+    # so "w." or "W."), every emoji token contains "("
+    has_url = "://" in content or "w." in content or "W." in content
+    cleaned = _URL_RE.sub("", content) if has_url else content
+    if "(" in cleaned:
+        cleaned = _LINE_EMOJI_RE.sub("", cleaned)
+    cleaned = cleaned.strip()
     if not cleaned:
         # Original had content but cleaned is empty → was all URL or emoji
-        if _URL_RE.search(content):
+        if has_url and _URL_RE.search(content):
             return content, "link"
         return content, "emoji"
     return cleaned, "text"
 
 
-def _parse_time(time_str: str) -> datetime:
-    """Parse time string like '09:30', '上午11:19', '下午02:07', '10:50 PM', '6:05 AM'."""
-    s = time_str.strip()
+def _detect_type(content: str) -> str:
+    stripped = content.strip()
+    return TYPE_MARKERS.get(stripped, "text")
 
-    # Chinese AM/PM prefix
-    is_pm = s.startswith("下午")
-    is_am = s.startswith("上午")
-    if is_am or is_pm:
-        s = s[2:]
 
-    # English AM/PM suffix
-    s_upper = s.upper().strip()
-    if s_upper.endswith("PM"):
-        is_pm = True
-        s = s_upper[:-2].strip()
-    elif s_upper.endswith("AM"):
-        is_am = True
-        s = s_upper[:-2].strip()
+def _is_unsent(content: str) -> bool:
+    s = content.strip()
+    return s.endswith("已收回訊息") or s.endswith(("unsent a message", "unsent a message."))
+
+
+# Special message types beyond TYPE_MARKERS: (msg_type, literal markers, check).
+# The check only runs when one of the markers occurs in the content, so
+# ordinary lines pay a few substring tests. Add new system-line types here.
+SPECIAL_TYPES: tuple[tuple[str, tuple[str, ...], Callable[[str], bool]], ...] = (
+    ("unsent", ("已收回訊息", "unsent a message"), _is_unsent),
+    ("album", ("[相簿]", "[Album]"), lambda c: c.lstrip().startswith(("[相簿]", "[Album]"))),
+    ("note", ("[記事本]", "[Note]"), lambda c: c.lstrip().startswith(("[記事本]", "[Note]"))),
+)
+
+# Two-column system lines ("time\t小美已收回訊息") that name a person:
+# (msg_type, suffixes after the person's name). They go to
+# ChatStreamParser.system_events, never into the message table.
+SYSTEM_LINE_TYPES: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("unsent", ("已收回訊息", " unsent a message.", " unsent a message")),
+)
+# How the exporting user appears in system lines; not a participant name
+_SELF_NAMES = frozenset({"您", "你", "You"})
+
+
+def _detect_special(content: str) -> str | None:
+    for msg_type, markers, check in SPECIAL_TYPES:
+        for marker in markers:
+            if marker in content:
+                if check(content):
+                    return msg_type
+                break
+    return None
 
-    h, m = map(int, s.split(":"))
-    if is_pm and h != 12:
-        h += 12
-    elif is_am and h == 12:
-        h = 0
-    return datetime.strptime(f"{h}:{m}", "%H:%M")
 
+def _detect_system_line(text: str) -> tuple[str, str] | None:
+    """Return (person, msg_type) for a two-column system line naming a person."""
+    text = text.strip()
+    for msg_type, suffixes in SYSTEM_LINE_TYPES:
+        for suffix in suffixes:
+            if text.endswith(suffix):
+                person = text[:-len(suffix)].strip()
+                if person and person not in _SELF_NAMES:
+                    return person, msg_type
+    return None
+
+
+def infer_payer(receiver: str, persons: Iterable[str]) -> str:
+    """The payer of a short-format transfer: the only other known person, else ""."""
+    others = set(persons) - {receiver}
+    return others.pop() if len(others) == 1 else ""
 
-def _detect_type(content: str) -> str:
-    stripped = content.strip()
-    return TYPE_MARKERS.get(stripped, "text")
 
+def _detect_transfer(
+    content: str, sender: str, persons: Iterable[str], ts: int,
+) -> tuple[TransferRecord, bool] | None:
+    """Try to parse a transfer message.
 
-def _detect_transfer(content: str, sender: str, persons: set[str], timestamp: datetime) -> TransferRecord | None:
-    """Try to parse a transfer message. Returns TransferRecord or None.
+    Returns (TransferRecord, payer_inferred) or None. *ts* is in ordinal
+    seconds; a datetime is only built on a match.
 
     Two formats carry full info:
     - "已將NT$120轉帳給XXX。" → sender paid XXX
@@ -129,22 +151,29 @@ def _detect_transfer(content: str, sender: str, persons: set[str], timestamp: da
     if m:
         amount = int(m.group(1).replace(",", ""))
         receiver = m.group(2).strip()
-        return TransferRecord(timestamp=timestamp, sender=sender, receiver=receiver, amount=amount)
+        return TransferRecord(
+            timestamp=from_ordinal_seconds(ts), sender=sender, receiver=receiver, amount=amount,
+        ), False
 
     # "您已收到NT$ 170。（來自：XXX）"
     m = TRANSFER_RECV_RE.search(content)
     if m:
         amount = int(m.group(1).replace(",", ""))
         payer = m.group(2).strip()
-        return TransferRecord(timestamp=timestamp, sender=payer, receiver=sender, amount=amount)
+        return TransferRecord(
+            timestamp=from_ordinal_seconds(ts), sender=payer, receiver=sender, amount=amount,
+        ), False
 
     # "收到NT$300的轉帳。" — infer payer as the other person
     m = TRANSFER_RECV_SHORT_RE.search(content)
     if m:
         amount = int(m.group(1).replace(",", ""))
-        others = persons - {sender}
-        payer = others.pop() if len(others) == 1 else ""
-        return TransferRecord(timestamp=timestamp, sender=payer, receiver=sender, amount=amount)
+        return TransferRecord(
+            timestamp=from_ordinal_seconds(ts),
+            sender=infer_payer(sender, persons),
+            receiver=sender,
+            amount=amount,
+        ), True
 
     return None
 
@@ -161,101 +190,383 @@ def _parse_call_duration(text: str) -> int:
     return hours * 3600 + mins * 60 + secs
 
 
-def parse_line_chat(text: str) -> dict:
-    lines = text.split("\n")
-    messages: list[Message] = []
-    calls: list[CallRecord] = []
-    transfers: list[TransferRecord] = []
-    persons: set[str] = set()
+class NotLineChatError(ValueError):
+    """Raised when the input is clearly not a LINE chat export."""
+
+
+@dataclass(frozen=True)
+class ChatFormat:
+    """Export layout detected from the head of the file."""
+
+    has_header: bool           # "[LINE] 與…的聊天記錄" / "[LINE] Chat history with …"
+    date_style: str | None     # "zh" (2024/01/15（一）) or "en" (2024/01/15, Mon)
+    time_style: str | None     # "zh12", "en12" or "24h" (see timestamps.time_style)
+
+
+SNIFF_CHARS = 8192
 
-    current_date: date | None = None
 
+def sniff_format(head: str) -> ChatFormat:
+    """Detect the export format from the first SNIFF_CHARS of text.
+
+    Raises NotLineChatError when the head has no LINE header, no date header
+    and no message/call line. An empty or whitespace-only head is an empty
+    export, not a foreign file: it gets a format without styles and parses
+    to no messages.
+    """
+    if not head[:SNIFF_CHARS].lstrip("\ufeff").strip():
+        return ChatFormat(has_header=False, date_style=None, time_style=None)
+    lines = head[:SNIFF_CHARS].split("\n")
+    has_header = bool(lines) and lines[0].lstrip("\ufeff").startswith("[LINE]")
+    zh_dates = en_dates = 0
+    styles: dict[str, int] = {}
     for line in lines:
-        # Try date header (Chinese or English format)
-        dm = DATE_HEADER_ZH_RE.match(line) or DATE_HEADER_EN_RE.match(line)
-        if dm:
-            current_date = datetime.strptime(dm.group(1), "%Y/%m/%d").date()
+        if DATE_HEADER_ZH_RE.match(line):
+            zh_dates += 1
             continue
-
-        if current_date is None:
+        if DATE_HEADER_EN_RE.match(line):
+            en_dates += 1
             continue
+        m = MSG_LINE_RE.match(line) or CALL_LINE_2COL_RE.match(line)
+        if m:
+            style = time_style(m.group(1))
+            styles[style] = styles.get(style, 0) + 1
+
+    if not (has_header or zh_dates or en_dates or styles):
+        raise NotLineChatError("not a LINE chat export")
+
+    date_style = None
+    if zh_dates or en_dates:
+        date_style = "zh" if zh_dates >= en_dates else "en"
+    return ChatFormat(
+        has_header=has_header,
+        date_style=date_style,
+        time_style=max(styles, key=styles.get) if styles else None,
+    )
+
+
+Record = Message | CallRecord | TransferRecord
+
+
+class _PastUntil(Exception):
+    """Raised at the first date header after the parser's ``until`` day."""
+
+
+class ChatStreamParser:
+    """Incremental LINE export parser.
+
+    Feed raw bytes with ``feed()`` (or decoded text with ``feed_text()``) and
+    call ``close()`` at end of input. Each call returns the records completed
+    so far, so memory stays bounded by the largest single message rather than
+    the whole file.
+
+    A message stays open until the next message line (or ``close()``) because
+    tab-indented continuation lines may follow it — even after a call line —
+    so a ``CallRecord`` can be returned before the message that precedes it.
+
+    When *table* is given, messages are appended to it instead of being
+    returned as ``Message`` objects. Passing a known *fmt* skips sniffing.
+    *since* / *until* (day ordinals) restrict parsing to a date window: days
+    before *since* are skipped like text before the first date header, and
+    parsing stops at the first date header after *until* (``done`` is set
+    and any further input is ignored).
+    """
+
+    def __init__(
+        self,
+        table: MessageTable | None = None,
+        fmt: ChatFormat | None = None,
+        since: int | None = None,
+        until: int | None = None,
+    ) -> None:
+        self._table = table
+        self.since = since
+        self.until = until
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._tail = ""  # partial line carried over between chunks
+        self._head: list[str] | None = []  # text buffered until the format is sniffed
+        self._head_len = 0
+        self.format: ChatFormat | None = None
+        self._time_table = TIME_TABLE
+        self._date_res = (DATE_HEADER_ZH_RE, DATE_HEADER_EN_RE)
+        if fmt is not None:
+            self._head = None
+            self._apply_format(fmt)
+        self._day_base: int | None = None  # current date in ordinal seconds
+        # person → sequence number of the message/call that introduced them
+        self.first_seen: dict[str, int] = {}
+        self._seq = 0
+        # Short-format transfers whose payer was inferred, with their sequence number
+        self.inferred_transfers: list[tuple[TransferRecord, int]] = []
+        # Continuation lines seen before any message (chunked parsing merges them back)
+        self.orphan_parts: list[str] = []
+        # Two-column system lines naming a person: (ordinal seconds, person, msg_type).
+        # Kept apart from the message table so analyzers only see real messages.
+        self.system_events: list[tuple[int, str, str]] = []
+        # Open message: (ordinal seconds, sender, msg_type, content parts) + its transfer
+        self._pending: tuple[int, str, str, list[str]] | None = None
+        self._pending_transfer: TransferRecord | None = None
+
+    @property
+    def persons(self) -> list[str]:
+        return sorted(self.first_seen)
+
+    def feed(self, chunk: bytes) -> list[Record]:
+        """Decode a chunk of UTF-8 bytes. Raises UnicodeDecodeError on bad input."""
+        if self.done:
+            return []
+        return self.feed_text(self._decoder.decode(chunk))
+
+    def feed_text(self, text: str) -> list[Record]:
+        out: list[Record] = []
+        if not text or self.done:
+            return out
+        if self._head is not None:
+            # Hold the first SNIFF_CHARS back until the format is known
+            self._head.append(text)
+            self._head_len += len(text)
+            if self._head_len < SNIFF_CHARS:
+                return out
+            text = self._start()
+        buf = self._tail + text if self._tail else text
+        pos = 0
+        feed_line = self._feed_line
+        try:
+            while True:
+                nl = buf.find("\n", pos)
+                if nl < 0:
+                    break
+                feed_line(buf[pos:nl], out)
+                pos = nl + 1
+        except _PastUntil:
+            self.done = True
+            pos = len(buf)
+        self._tail = buf[pos:]
+        return out
+
+    def close(self) -> list[Record]:
+        # Input after an early stop is never decoded
+        out = [] if self.done else self.feed_text(self._decoder.decode(b"", final=True))
+        if self._head is not None:
+            out.extend(self.feed_text(self._start()))
+        if self._tail:
+            # The last line has no newline of its own
+            out.extend(self.feed_text("\n"))
+        self._flush(out)
+        return out
+
+    def _start(self) -> str:
+        """Sniff the buffered head, specialise the classifier, return the head text."""
+        head = "".join(self._head)
+        self._head = None
+        self._apply_format(sniff_format(head))
+        return head
+
+    def _apply_format(self, fmt: ChatFormat) -> None:
+        self.format = fmt
+        self._time_table = time_table_for(fmt.time_style)
+        if fmt.date_style == "en":
+            self._date_res = (DATE_HEADER_EN_RE, DATE_HEADER_ZH_RE)
+
+    def _flush(self, out: list[Record]) -> None:
+        if self._pending is None:
+            return
+        ts, sender, msg_type, parts = self._pending
+        content = parts[0] if len(parts) == 1 else "\n".join(parts)
+        if self._table is not None:
+            self._table.append(ts, sender, msg_type, content)
+        else:
+            out.append(Message(
+                timestamp=from_ordinal_seconds(ts),
+                sender=sender,
+                content=content,
+                msg_type=msg_type,
+            ))
+        if self._pending_transfer is not None:
+            out.append(self._pending_transfer)
+            self._pending_transfer = None
+        self._pending = None
+
+    def _feed_line(self, line: str, out: list[Record]) -> None:
+        """Classify one line with cheap checks, falling back to the regexes.
+
+        Message lines look like ``time\tsender\tcontent``: if the text before
+        the first tab is a known time token and the line has no ☎, the line
+        is split on tabs directly. Anything else (date headers, calls,
+        unusual tokens) goes through ``_feed_line_regex``.
+        """
+        if line[:1] == "\t":
+            # Continuation line (starts with tab, no timestamp)
+            if self._day_base is not None:
+                self._add_continuation(line)
+            return
+
+        tab = line.find("\t")
+        minutes = self._time_table.get(line[:tab]) if tab > 0 else None
+        if minutes is None or "☎" in line:
+            self._feed_line_regex(line, out)
+            return
+
+        if self._day_base is None:
+            return
+        tab2 = line.find("\t", tab + 1)
+        if tab2 < 0:
+            # Two-column system line, not a message
+            self._add_system_line(self._day_base + minutes * 60, line[tab + 1:])
+            return
+        if tab2 == tab + 1:
+            self._feed_line_regex(line, out)  # empty sender: let the regex decide
+            return
+        self._add_message(
+            self._day_base + minutes * 60, line[tab + 1:tab2], line[tab2 + 1:], out,
+        )
+
+    def _feed_line_regex(self, line: str, out: list[Record]) -> None:
+        # Try date header (sniffed style first)
+        dm = self._date_res[0].match(line) or self._date_res[1].match(line)
+        if dm:
+            day = date_ordinal(dm.group(1))
+            if self.until is not None and day > self.until:
+                raise _PastUntil
+            # Lines of days before the window are dropped as they arrive
+            self._day_base = day * SECONDS_PER_DAY if self.since is None or day >= self.since else None
+            return
+
+        day_base = self._day_base
+        if day_base is None:
+            return
 
         # Try call line — 3-col format: time\tsender\t☎ text
         cm3 = CALL_LINE_3COL_RE.match(line)
         if cm3:
-            time_str = cm3.group(1)
             caller = cm3.group(2)
-            call_text = cm3.group(3)
-            ts = datetime.combine(
-                current_date,
-                _parse_time(time_str).time(),
-            )
-            persons.add(caller)
-            calls.append(CallRecord(
-                timestamp=ts,
+            self._seq += 1
+            self.first_seen.setdefault(caller, self._seq)
+            out.append(CallRecord(
+                timestamp=from_ordinal_seconds(day_base + decode_time(cm3.group(1)) * 60),
                 caller=caller,
-                duration_seconds=_parse_call_duration(call_text),
+                duration_seconds=_parse_call_duration(cm3.group(3)),
             ))
-            continue
+            return
 
         # Try call line — 2-col format: time\t☎ text
         cm2 = CALL_LINE_2COL_RE.match(line)
         if cm2:
-            time_str = cm2.group(1)
-            call_text = cm2.group(2)
-            ts = datetime.combine(
-                current_date,
-                _parse_time(time_str).time(),
-            )
-            calls.append(CallRecord(
-                timestamp=ts,
+            out.append(CallRecord(
+                timestamp=from_ordinal_seconds(day_base + decode_time(cm2.group(1)) * 60),
                 caller="",
-                duration_seconds=_parse_call_duration(call_text),
+                duration_seconds=_parse_call_duration(cm2.group(2)),
             ))
-            continue
+            return
 
         # Try message line
         mm = MSG_LINE_RE.match(line)
         if mm:
-            time_str = mm.group(1)
-            sender = mm.group(2)
-            content = mm.group(3)
-            ts = datetime.combine(
-                current_date,
-                _parse_time(time_str).time(),
-            )
-            persons.add(sender)
-
-            # Check for transfer messages before regular type detection
-            transfer = _detect_transfer(content, sender, persons, ts)
-            if transfer:
-                transfers.append(transfer)
-                messages.append(Message(
-                    timestamp=ts,
-                    sender=sender,
-                    content=content,
-                    msg_type="transfer",
-                ))
-                continue
-
-            raw_type = _detect_type(content)
-            clean_text, final_type = _clean_content(content, raw_type)
-            messages.append(Message(
-                timestamp=ts,
-                sender=sender,
-                content=clean_text,
-                msg_type=final_type,
-            ))
-            continue
+            ts = day_base + decode_time(mm.group(1)) * 60
+            self._add_message(ts, mm.group(2), mm.group(3), out)
+            return
 
-        # Continuation line (starts with tab, no timestamp)
-        if line.startswith("\t") and messages:
-            messages[-1].content += "\n" + line.lstrip("\t")
-            continue
+        sm = SYSTEM_LINE_RE.match(line)
+        if sm:
+            self._add_system_line(day_base + decode_time(sm.group(1)) * 60, sm.group(2))
+            return
 
+        # Continuation line (starts with tab, no timestamp)
+        if line.startswith("\t"):
+            self._add_continuation(line)
+
+    def _add_continuation(self, line: str) -> None:
+        if self._pending is not None:
+            self._pending[3].append(line.lstrip("\t"))
+        else:
+            self.orphan_parts.append(line.lstrip("\t"))
+
+    def _add_message(self, ts: int, sender: str, content: str, out: list[Record]) -> None:
+        self._flush(out)
+        self._seq += 1
+        self.first_seen.setdefault(sender, self._seq)
+
+        # Check for transfer messages before regular type detection;
+        # every transfer format contains the literal "NT$"
+        detected = _detect_transfer(content, sender, self.first_seen, ts) if "NT$" in content else None
+        if detected:
+            transfer, inferred = detected
+            if inferred:
+                self.inferred_transfers.append((transfer, self._seq))
+            self._pending_transfer = transfer
+            self._pending = (ts, sender, "transfer", [content])
+            return
+
+        special = _detect_special(content)
+        if special is not None:
+            self._pending = (ts, sender, special, [content])
+            return
+
+        raw_type = _detect_type(content)
+        clean_text, final_type = _clean_content(content, raw_type)
+        self._pending = (ts, sender, final_type, [clean_text])
+
+    def _add_system_line(self, ts: int, text: str) -> None:
+        """Record two-column system lines that name a person in ``system_events``.
+
+        They are not messages: the table, ``persons`` and the open message are
+        left untouched, so continuation lines still join the previous message.
+        """
+        detected = _detect_system_line(text)
+        if detected is not None:
+            person, msg_type = detected
+            self.system_events.append((ts, person, msg_type))
+
+
+def iter_line_chat(chunks: Iterable[bytes]) -> Iterator[Record]:
+    """Yield records from an iterable of UTF-8 byte chunks as lines complete."""
+    parser = ChatStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def collect_records(
+    records: Iterable[Record], persons: list[str], table: MessageTable | None = None,
+) -> dict:
+    """Group parsed records into the dict shape the analyzers consume.
+
+    ``messages`` is always a MessageTable; pass the parser's sink *table* so
+    messages it already stored are kept.
+    """
+    messages = table if table is not None else MessageTable()
+    calls: list[CallRecord] = []
+    transfers: list[TransferRecord] = []
+    for r in records:
+        if isinstance(r, Message):
+            messages.append(to_ordinal_seconds(r.timestamp), r.sender, r.msg_type, r.content)
+        elif isinstance(r, CallRecord):
+            calls.append(r)
+        else:
+            transfers.append(r)
     return {
         "messages": messages,
         "calls": calls,
         "transfers": transfers,
-        "persons": sorted(persons),
+        "persons": persons,
     }
+
+
+def parse_line_chat_stream(chunks: Iterable[bytes]) -> dict:
+    """Parse a LINE export from UTF-8 byte chunks without decoding it whole."""
+    table = MessageTable()
+    parser = ChatStreamParser(table)
+    records: list[Record] = []
+    for chunk in chunks:
+        records.extend(parser.feed(chunk))
+    records.extend(parser.close())
+    return collect_records(records, parser.persons, table)
+
+
+def parse_line_chat(text: str) -> dict:
+    table = MessageTable()
+    parser = ChatStreamParser(table)
+    records = parser.feed_text(text)
+    records.extend(parser.close())
+    return collect_records(records, parser.persons, table)
@@ -0,0 +1,85 @@
+"""Bounded-memory, mergeable quantile sketch for durations in whole seconds.
+
+DDSketch-style: values are counted in logarithmically sized buckets, so a
+quantile comes back within ``RELATIVE_ACCURACY`` of the true value, memory is
+bounded by the number of buckets (``len(BUCKET_BOUNDS)``, under 900 for
+anything up to ten years) however many values are added, and two sketches
+merge exactly by adding bucket counts.
+
+Bucket bounds are integers computed once at import, so the pure-Python and
+NumPy paths (``np.searchsorted`` on the same bounds) bucket identically.
+Small values get one bucket each and are returned exactly, and the
+``PINNED_BOUNDS`` thresholds are bucket edges, so ``count_at_most`` is exact
+for them.
+"""
+import math
+from bisect import bisect_left
+
+RELATIVE_ACCURACY = 0.01
+# Values above this land in the last bucket
+MAX_VALUE = 10 * 365 * 86400
+# Thresholds that must be bucket edges (reply analysis counts replies up to
+# 1 min / 5 min / 30 min / 1 h); splitting a bucket only makes it narrower
+PINNED_BOUNDS = (60, 300, 1800, 3600)
+
+
+def _bucket_bounds(pinned: tuple[int, ...] = ()) -> list[int]:
+    """Inclusive upper bound of each bucket; bucket k holds (bounds[k-1], bounds[k]]."""
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    bounds = [0]
+    while bounds[-1] < MAX_VALUE:
+        bounds.append(max(bounds[-1] + 1, math.floor(bounds[-1] * gamma)))
+    return sorted(set(bounds).union(pinned))
+
+
+BUCKET_BOUNDS = _bucket_bounds(PINNED_BOUNDS)
+_LAST_KEY = len(BUCKET_BOUNDS) - 1
+
+
+def bucket_key(value: int) -> int:
+    return min(bisect_left(BUCKET_BOUNDS, value), _LAST_KEY)
+
+
+def _bucket_value(key: int) -> float:
+    """Harmonic mean of the bucket's range: within RELATIVE_ACCURACY of every member."""
+    if key == 0:
+        return 0.0
+    lo, hi = BUCKET_BOUNDS[key - 1] + 1, BUCKET_BOUNDS[key]
+    return 2 * lo * hi / (lo + hi)
+
+
+class QuantileSketch:
+    __slots__ = ("counts", "n")
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}  # bucket key → count
+        self.n = 0
+
+    def add(self, value: int) -> None:
+        self.add_key(bucket_key(value))
+
+    def add_key(self, key: int, count: int = 1) -> None:
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + count
+        self.n += count
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for key, count in other.counts.items():
+            self.add_key(key, count)
+
+    def count_at_most(self, value: int) -> int:
+        """Values ≤ *value* (exact when *value* is a bucket bound)."""
+        last = bucket_key(value)
+        return sum(count for key, count in self.counts.items() if key <= last)
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate of the value at rank ``q * (n - 1)``; None when empty."""
+        if not self.n:
+            return None
+        rank = q * (self.n - 1)
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen > rank:
+                return _bucket_value(key)
+        return _bucket_value(max(self.counts))
@@ -0,0 +1,26 @@
+"""Record types produced by the LINE chat parser."""
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class Message:
+    timestamp: datetime
+    sender: str
+    content: str
+    msg_type: str  # "text", "sticker", "photo", "link", "transfer", "unsent", …
+
+
+@dataclass
+class CallRecord:
+    timestamp: datetime
+    caller: str  # who initiated the call
+    duration_seconds: int  # 0 = missed call
+
+
+@dataclass
+class TransferRecord:
+    timestamp: datetime
+    sender: str   # who paid
+    receiver: str  # who received
+    amount: int
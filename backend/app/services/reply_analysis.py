@@ -1,105 +1,227 @@
+from array import array
 from collections import defaultdict
-from app.services.parser import Message
+from datetime import date
+
+from app.services.message_table import SECONDS_PER_DAY, IndexConsumer, MessageTable, RowBlock, as_table, scan
+from app.services.quantile_sketch import BUCKET_BOUNDS, PINNED_BOUNDS, QuantileSketch, bucket_key
+from app.services.sessions import SESSION_GAPS, SessionIndex
 
 INSTANT_THRESHOLD_SECONDS = 60
 REPLY_CAP_SECONDS = 3600  # ignore gaps > 1 hour for avg reply time
+# Streak: longest run of messages with gaps of at most 5 minutes
+STREAK_GAP_SECONDS = 300
 SLEEP_START_HOUR = 2   # 凌晨 2 點
 SLEEP_END_HOUR = 8     # 早上 8 點
-
-
-def _is_sleep_gap(prev: Message, curr: Message) -> bool:
-    """Return True if the gap between messages is likely overnight sleep."""
-    prev_h = prev.timestamp.hour
-    curr_h = curr.timestamp.hour
+# Reported reply-time quantiles (output key → q)
+REPLY_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+N_KEYS = len(BUCKET_BOUNDS)
+# Gaps up to here have a sketch bucket of their own (key == gap)
+EXACT_UP_TO = next(k for k, b in enumerate(BUCKET_BOUNDS) if b != k) - 1
+# Speed distribution: bucket → largest gap it holds (None for the rest)
+SPEED_BUCKETS = {"<1m": 60, "1-5m": 300, "5-30m": 1800, "30m-1h": 3600, ">1h": None}
+assert INSTANT_THRESHOLD_SECONDS in PINNED_BOUNDS and REPLY_CAP_SECONDS in PINNED_BOUNDS
+assert STREAK_GAP_SECONDS in SESSION_GAPS and REPLY_CAP_SECONDS in SESSION_GAPS
+assert all(edge in PINNED_BOUNDS for edge in SPEED_BUCKETS.values() if edge is not None)
+
+
+def _is_sleep_gap(prev_ts: int, curr_ts: int) -> bool:
+    """Return True if the gap between two ordinal-second timestamps is likely overnight sleep."""
+    prev_h = prev_ts % SECONDS_PER_DAY // 3600
+    curr_h = curr_ts % SECONDS_PER_DAY // 3600
     prev_before_sleep = prev_h >= 20 or prev_h < SLEEP_START_HOUR
     curr_after_wake = SLEEP_END_HOUR <= curr_h < 12
-    delta_hours = (curr.timestamp - prev.timestamp).total_seconds() / 3600
+    delta_hours = (curr_ts - prev_ts) / 3600
     return prev_before_sleep and curr_after_wake and 4 <= delta_hours <= 14
 
 
 def compute_reply_behavior(parsed: dict) -> dict:
-    messages: list[Message] = parsed["messages"]
-    persons: list[str] = parsed["persons"]
-
-    if len(messages) < 2:
-        return _empty_result(persons)
-
-    reply_times: dict[str, list[float]] = defaultdict(list)
-    speed_buckets = {"<1m": 0, "1-5m": 0, "5-30m": 0, "30m-1h": 0, ">1h": 0}
-
-    # Streak tracking: longest consecutive conversation (gap < 5 min between messages)
-    streak_threshold = 300  # 5 minutes
-    current_streak = 1
-    longest_streak = 1
-    longest_streak_date = messages[0].timestamp.date()
-
-    # Read-left-on-read: last message in a conversation with no reply for > 1 hour
-    left_on_read: dict[str, int] = defaultdict(int)
-
-    prev = messages[0]
-    for msg in messages[1:]:
-        delta = (msg.timestamp - prev.timestamp).total_seconds()
-
-        # Streak tracking
-        if delta <= streak_threshold:
-            current_streak += 1
+    table = as_table(parsed)
+    acc = ReplyAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
+
+
+class ReplyAccumulator(IndexConsumer):
+    """Reply gaps and speed buckets over consecutive rows; streaks and left-on-read from sessions.
+
+    Reply gaps are not kept: each one bumps the quantile-sketch bucket count
+    of its (sender, hour of day) cell, so memory does not grow with the chat.
+    The reply thresholds are sketch bucket edges, so reply counts, instant
+    replies and the speed distribution are read off those counts exactly;
+    only the sum of gaps within the cap (for the average) is kept besides.
+
+    Streaks are the 5-minute sessions, and left-on-read looks only at the
+    1-hour session boundaries (gaps over the cap).
+    """
+
+    index_factories = {"session_index": SessionIndex}
+
+    def __init__(self, table: MessageTable, parsed: dict, session_index: SessionIndex | None = None) -> None:
+        self.table = table
+        self.persons: list[str] = parsed["persons"]
+        # Per sender code: sum of reply gaps within REPLY_CAP_SECONDS
+        self.active_sum = [0] * len(table.sender_names)
+        # (sender code * 24 + hour of the reply) * N_KEYS + sketch bucket → count
+        self.reply_buckets: dict[int, int] = {}
+        # Boundary rows, for merging with the neighbouring chunks
+        self.first_ts: int | None = None
+        self.first_sender: int | None = None
+        self.last_ts: int | None = None
+        self.last_sender: int | None = None
+        self._use_indexes(table, session_index=session_index)
+
+    def add(self, block: RowBlock) -> None:
+        super().add(block)
+        self._add_replies(block)
+
+    def _add_replies(self, block: RowBlock) -> None:
+        timestamps = block.timestamps
+        senders = block.senders
+        if block.prev_ts is None:
+            # First row of the table: nothing to compare with yet
+            prev_ts, prev_sender = timestamps[0], senders[0]
+            self.first_ts, self.first_sender = prev_ts, prev_sender
+            rows = zip(timestamps[1:], senders[1:])
         else:
-            if current_streak > longest_streak:
-                longest_streak = current_streak
-                longest_streak_date = prev.timestamp.date()
-            current_streak = 1
-
-        # Left on read: if gap > 1 hour AND same sender didn't double-text AND not sleep
-        if delta > REPLY_CAP_SECONDS and msg.sender != prev.sender and not _is_sleep_gap(prev, msg):
-            left_on_read[prev.sender] += 1
-
-        # Reply time: only when different sender
-        if msg.sender != prev.sender and delta >= 0:
-            reply_times[msg.sender].append(delta)
-
-            if delta <= 60:
-                speed_buckets["<1m"] += 1
-            elif delta <= 300:
-                speed_buckets["1-5m"] += 1
-            elif delta <= 1800:
-                speed_buckets["5-30m"] += 1
-            elif delta <= 3600:
-                speed_buckets["30m-1h"] += 1
+            prev_ts, prev_sender = block.prev_ts, block.prev_sender
+            rows = zip(timestamps, senders)
+
+        active_sum = self.active_sum
+        reply_buckets = self.reply_buckets
+        for ts, sender in rows:
+            # Reply time: only when different sender
+            if sender != prev_sender:
+                delta = ts - prev_ts
+                if delta >= 0:
+                    k = (sender * 24 + ts % SECONDS_PER_DAY // 3600) * N_KEYS + (
+                        delta if delta <= EXACT_UP_TO else bucket_key(delta)
+                    )
+                    reply_buckets[k] = reply_buckets.get(k, 0) + 1
+                    if delta <= REPLY_CAP_SECONDS:
+                        active_sum[sender] += delta
+            prev_ts = ts
+            prev_sender = sender
+
+        self.last_ts = prev_ts
+        self.last_sender = prev_sender
+
+    def merge(self, other: "ReplyAccumulator") -> None:
+        super().merge(other)
+        if other.first_ts is None:
+            return
+        if self.first_ts is None:
+            # No rows on our side yet: their state is the merged state
+            self.active_sum = other.active_sum
+            self.reply_buckets = other.reply_buckets
+            self.first_ts, self.first_sender = other.first_ts, other.first_sender
+            self.last_ts, self.last_sender = other.last_ts, other.last_sender
+            return
+
+        # The pair across the chunk boundary: feed the other side's first row
+        # as if it followed our last one (only timestamps/senders are read)
+        self._add_replies(RowBlock(
+            start=0,
+            timestamps=array("q", [other.first_ts]),
+            senders=array("H", [other.first_sender]),
+            types=array("B", [0]),
+            char_counts=array("I", [0]),
+            prev_ts=self.last_ts,
+            prev_sender=self.last_sender,
+        ))
+        self.last_ts, self.last_sender = other.last_ts, other.last_sender
+
+        active_sum = self.active_sum
+        for sender, total in enumerate(other.active_sum):
+            active_sum[sender] += total
+        reply_buckets = self.reply_buckets
+        for k, n in other.reply_buckets.items():
+            reply_buckets[k] = reply_buckets.get(k, 0) + n
+
+    def _sketches(self) -> tuple[list[QuantileSketch], list[QuantileSketch], QuantileSketch]:
+        """Reply-gap sketches per sender code, per hour of day and overall."""
+        by_sender = [QuantileSketch() for _ in self.table.sender_names]
+        by_hour = [QuantileSketch() for _ in range(24)]
+        overall = QuantileSketch()
+        for k, n in self.reply_buckets.items():
+            cell, key = divmod(k, N_KEYS)
+            sender, hour = divmod(cell, 24)
+            by_sender[sender].add_key(key, n)
+            by_hour[hour].add_key(key, n)
+            overall.add_key(key, n)
+        return by_sender, by_hour, overall
+
+    def finalize(self) -> dict:
+        table = self.table
+        persons = self.persons
+        if len(table) < 2:
+            return _empty_result(persons)
+
+        longest_streak, longest_streak_day = self._longest_streak()
+        by_sender, by_hour, overall = self._sketches()
+
+        # Instant reply rate per person (as 0-100 percentage)
+        instant_rate = {}
+        avg_reply = {}
+        # Reply-time quantiles per person and per hour of day (hour of the reply)
+        percentiles = {}
+        for p in persons:
+            code = table.sender_code(p)
+            sketch = by_sender[code] if code is not None else QuantileSketch()
+            if sketch.n:
+                instant_rate[p] = round(sketch.count_at_most(INSTANT_THRESHOLD_SECONDS) / sketch.n * 100, 1)
+                # Average reply: only count replies within 1 hour (exclude offline/sleep)
+                active_n = sketch.count_at_most(REPLY_CAP_SECONDS)
+                avg_reply[p] = round(int(self.active_sum[code]) / active_n) if active_n else 0
             else:
-                speed_buckets[">1h"] += 1
-
-        prev = msg
-
-    # Check final streak
-    if current_streak > longest_streak:
-        longest_streak = current_streak
-        longest_streak_date = prev.timestamp.date()
-
-    # Instant reply rate per person (as 0-100 percentage)
-    instant_rate = {}
-    avg_reply = {}
-    for p in persons:
-        times = reply_times[p]
-        if times:
-            instant_count = sum(1 for t in times if t <= INSTANT_THRESHOLD_SECONDS)
-            instant_rate[p] = round(instant_count / len(times) * 100, 1)
-            # Average reply: only count replies within 1 hour (exclude offline/sleep)
-            active_times = [t for t in times if t <= REPLY_CAP_SECONDS]
-            avg_reply[p] = round(sum(active_times) / len(active_times)) if active_times else 0
-        else:
-            instant_rate[p] = 0
-            avg_reply[p] = 0
-
-    return {
-        "instantReplyRate": instant_rate,
-        "avgReplyTime": avg_reply,
-        "speedDistribution": speed_buckets,
-        "longestStreak": {
-            "count": longest_streak,
-            "date": str(longest_streak_date),
-        },
-        "leftOnRead": dict(left_on_read),
-    }
+                instant_rate[p] = 0
+                avg_reply[p] = 0
+            percentiles[p] = _quantiles(sketch)
+
+        speed = {}
+        below = 0
+        for key, edge in SPEED_BUCKETS.items():
+            upto = overall.n if edge is None else overall.count_at_most(edge)
+            speed[key] = upto - below
+            below = upto
+
+        return {
+            "instantReplyRate": instant_rate,
+            "avgReplyTime": avg_reply,
+            "speedDistribution": speed,
+            "longestStreak": {
+                "count": longest_streak,
+                "date": str(date.fromordinal(longest_streak_day)),
+            },
+            "leftOnRead": self._left_on_read(),
+            "replyTimePercentiles": percentiles,
+            "replyTimePercentilesByHour": [{"hour": h, **_quantiles(s)} for h, s in enumerate(by_hour)],
+        }
+
+    def _longest_streak(self) -> tuple[int, int]:
+        """(messages, day ordinal of its last message) of the first longest 5-minute session."""
+        index = self.session_index
+        lengths = index.lengths(STREAK_GAP_SECONDS)
+        best = max(range(len(lengths)), key=lengths.__getitem__)
+        last_row = index.starts[STREAK_GAP_SECONDS][best] + lengths[best] - 1
+        return lengths[best], self.table.timestamps[last_row] // SECONDS_PER_DAY
+
+    def _left_on_read(self) -> dict[str, int]:
+        """Per person: messages a different sender answered only after over an hour, sleep aside."""
+        index = self.session_index
+        timestamps = self.table.timestamps
+        senders = self.table.senders
+        left: dict[int, int] = defaultdict(int)
+        for row in index.starts[REPLY_CAP_SECONDS]:
+            if row == index.first_row:
+                continue
+            prev_sender = senders[row - 1]
+            if senders[row] != prev_sender and not _is_sleep_gap(timestamps[row - 1], timestamps[row]):
+                left[prev_sender] += 1
+        return {self.table.sender_names[code]: n for code, n in left.items()}
+
+
+def _quantiles(sketch: QuantileSketch) -> dict[str, int]:
+    return {key: round(sketch.quantile(q) or 0) for key, q in REPLY_QUANTILES.items()}
 
 
 def _empty_result(persons):
@@ -109,4 +231,6 @@ def _empty_result(persons):
         "speedDistribution": {"<1m": 0, "1-5m": 0, "5-30m": 0, "30m-1h": 0, ">1h": 0},
         "longestStreak": {"count": 0, "date": ""},
         "leftOnRead": {},
+        "replyTimePercentiles": {p: dict.fromkeys(REPLY_QUANTILES, 0) for p in persons},
+        "replyTimePercentilesByHour": [{"hour": h, **dict.fromkeys(REPLY_QUANTILES, 0)} for h in range(24)],
     }
@@ -1,17 +1,146 @@
-"""Unified segmenter using jieba + dict.txt.big + 10K custom dict."""
+"""Unified segmenter using jieba + dict.txt.big + 10K custom dict.
+
+With ``SEGMENT_WORKERS`` > 1, large batches are segmented across a pool of
+worker processes forked after the dictionaries are loaded, so each worker
+inherits jieba's prefix dictionary (copy-on-write) instead of loading
+dict.txt.big again.
+
+With ``SEGMENT_CACHE_ENTRIES`` > 0, segmented texts are kept in
+``shared_cache``, an in-memory LRU shared by all requests of this process:
+short chat lines ("我到家了", "你在幹嘛") repeat across chats as much as
+within one. It is off by default, since it keeps user text past the request.
+
+Building jieba's prefix dictionary from dict.txt.big and user_dict.txt
+takes seconds, so the result can be serialized once (``python -m
+app.services.segmenter``, run by the Dockerfile) into ``PREFIX_CACHE`` and
+loaded from there; the app loads it at startup (``warm_up``) and
+``is_ready`` tells when it is done.
+"""
+import hashlib
 import logging
+import marshal
+import multiprocessing
 import os
 import re
+import sys
 import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import jieba
+from jieba import finalseg
 
 logger = logging.getLogger(__name__)
 _initialized = False
 _init_lock = threading.Lock()
+# Set by warm_up once the dictionaries (and the worker pool) are ready
+_ready = threading.Event()
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+BIG_DICT = os.path.join(DATA_DIR, "dict.txt.big")
+USER_DICT = os.path.join(DATA_DIR, "user_dict.txt")
+# Serialized prefix dictionary (main and user dictionaries), built ahead of time
+PREFIX_CACHE = os.path.join(DATA_DIR, "jieba_prefix.cache")
+# Fields of a PREFIX_CACHE file and their types
+_PREFIX_CACHE_FIELDS = {
+    "fingerprint": list, "freq": dict, "total": (int, float), "tags": dict, "force_split": list,
+}
+
+# >1 segments large batches across forked worker processes
+SEGMENT_WORKERS = int(os.environ.get("SEGMENT_WORKERS", "1"))
+# Below this many texts to segment the pool round-trip costs more than it saves
+PARALLEL_MIN_TEXTS = 2000
+# Shards per worker, so one slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Bounds of the cross-request cache; off (0, nothing retained) unless set
+SEGMENT_CACHE_ENTRIES = int(os.environ.get("SEGMENT_CACHE_ENTRIES", "0"))
+SEGMENT_CACHE_MB = int(os.environ.get("SEGMENT_CACHE_MB", "32"))
+# Longer texts are rarely repeated: not worth an entry
+CACHE_MAX_CHARS = 64
+
+
+class TokenCache:
+    """Thread-safe LRU of text → jieba words, bounded by entries and bytes.
+
+    The size of an entry is ``sys.getsizeof`` of the text, the words tuple
+    and each word. Texts longer than ``max_chars`` are never stored. With
+    ``max_entries`` 0 nothing is stored: user text never outlives the
+    request that sent it.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, max_chars: int = CACHE_MAX_CHARS) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        # text → (words, size in bytes)
+        self._entries: OrderedDict[str, tuple[tuple[str, ...], int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, texts: Iterable[str]) -> dict[str, tuple[str, ...]]:
+        """The cached words of those *texts* that are cached, marking them recently used."""
+        found = {}
+        with self._lock:
+            entries = self._entries
+            for t in texts:
+                entry = entries.get(t)
+                if entry is None:
+                    self.misses += 1
+                else:
+                    entries.move_to_end(t)
+                    found[t] = entry[0]
+            self.hits += len(found)
+        return found
+
+    def put_many(self, texts: Iterable[str], words: Iterable[list[str]]) -> None:
+        """Store each text's words, evicting the least recently used past the bounds."""
+        if not self.max_entries:
+            return
+        with self._lock:
+            entries = self._entries
+            for t, w in zip(texts, words):
+                if len(t) > self.max_chars or t in entries:
+                    continue
+                cached = tuple(w)
+                size = sys.getsizeof(t) + sys.getsizeof(cached) + sum(map(sys.getsizeof, cached))
+                entries[t] = (cached, size)
+                self.bytes += size
+            while entries and (len(entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, size) = entries.popitem(last=False)
+                self.bytes -= size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+shared_cache = TokenCache(SEGMENT_CACHE_ENTRIES, SEGMENT_CACHE_MB * 1024 * 1024)
 
 _REPEAT_RE = re.compile(r"^(.)\1+$")
 _NOISE_RE = re.compile(r"^[\s\d\W]+$")
+# jieba segments each run of these characters on its own (its ``re_han``
+# blocks); everything between runs (punctuation, whitespace, emoji) is split
+# off character by character
+_CLAUSE_RE = jieba.re_han_default
 
 
 def _is_trivial(text: str) -> bool:
@@ -31,6 +160,84 @@ def _is_trivial(text: str) -> bool:
     return False
 
 
+def _dictionary_fingerprint() -> list:
+    """jieba's version and a hash of each dictionary the prefix dictionary is built from."""
+    sources: list = [jieba.__version__]
+    for path in (BIG_DICT, USER_DICT):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                sources.append([os.path.basename(path), hashlib.sha1(f.read()).hexdigest()])
+    return sources
+
+
+def _load_dictionaries() -> None:
+    """Build jieba's prefix dictionary from the dictionary files (slow)."""
+    if os.path.exists(BIG_DICT):
+        jieba.set_dictionary(BIG_DICT)
+        logger.info("jieba: loaded dict.txt.big")
+    if os.path.exists(USER_DICT):
+        jieba.load_userdict(USER_DICT)
+        logger.info("jieba: loaded user_dict.txt")
+    jieba.initialize()
+
+
+def _load_prefix_cache() -> bool:
+    """Load the prefix dictionary from PREFIX_CACHE; False if missing, malformed or stale.
+
+    Nothing is applied to jieba unless every field checks out.
+    """
+    try:
+        with open(PREFIX_CACHE, "rb") as f:
+            # One read: marshal.load on the file object reads it in small pieces
+            cached = marshal.loads(f.read())
+    except FileNotFoundError:
+        return False
+    except (OSError, EOFError, ValueError, TypeError):
+        logger.warning("jieba: unreadable %s, building the prefix dictionary", PREFIX_CACHE)
+        return False
+    if not isinstance(cached, dict) or any(
+        not isinstance(cached.get(key), kind) for key, kind in _PREFIX_CACHE_FIELDS.items()
+    ):
+        logger.warning("jieba: malformed %s, building the prefix dictionary", PREFIX_CACHE)
+        return False
+    if cached["fingerprint"] != _dictionary_fingerprint():
+        logger.warning("jieba: %s is stale, building the prefix dictionary", PREFIX_CACHE)
+        return False
+    dt = jieba.dt
+    with dt.lock:
+        if os.path.exists(BIG_DICT):
+            dt.dictionary = os.path.abspath(BIG_DICT)
+        dt.FREQ, dt.total = cached["freq"], cached["total"]
+        dt.user_word_tag_tab.update(cached["tags"])
+        finalseg.Force_Split_Words.update(cached["force_split"])
+        dt.initialized = True
+    logger.info("jieba: loaded prefix dictionary from %s", PREFIX_CACHE)
+    return True
+
+
+def _write_prefix_cache(path: str) -> None:
+    """Serialize jieba's loaded prefix dictionary to *path* (atomically)."""
+    dt = jieba.dt
+    cached = {
+        "fingerprint": _dictionary_fingerprint(),
+        "freq": dt.FREQ,
+        "total": dt.total,
+        "tags": dt.user_word_tag_tab,
+        "force_split": sorted(finalseg.Force_Split_Words),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        marshal.dump(cached, f)
+    os.replace(tmp, path)
+    logger.info("jieba: wrote %d prefix dictionary entries to %s", len(dt.FREQ), path)
+
+
+def build_prefix_cache(path: str = PREFIX_CACHE) -> None:
+    """Build the prefix dictionary from the dictionary files and serialize it to *path*."""
+    _load_dictionaries()
+    _write_prefix_cache(path)
+
+
 def _ensure_initialized():
     global _initialized
     if _initialized:
@@ -38,32 +245,151 @@ def _ensure_initialized():
     with _init_lock:
         if _initialized:
             return
-        data_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data")
-        big_dict = os.path.join(data_dir, "dict.txt.big")
-        if os.path.exists(big_dict):
-            jieba.set_dictionary(big_dict)
-            logger.info("jieba: loaded dict.txt.big")
-        user_dict = os.path.join(data_dir, "user_dict.txt")
-        if os.path.exists(user_dict):
-            jieba.load_userdict(user_dict)
-            logger.info("jieba: loaded user_dict.txt")
-        jieba.initialize()
+        if not os.path.exists(PREFIX_CACHE):
+            _load_dictionaries()
+        elif not _load_prefix_cache():
+            # Corrupt or stale: build from the dictionary files and replace it
+            _load_dictionaries()
+            try:
+                _write_prefix_cache(PREFIX_CACHE)
+            except OSError:
+                logger.warning("jieba: could not rewrite %s", PREFIX_CACHE, exc_info=True)
         _initialized = True
         logger.info("jieba initialized")
 
 
-def cut(text: str) -> list[str]:
-    """Segment a single string."""
+def warm_up(workers: int = SEGMENT_WORKERS) -> None:
+    """Load the dictionaries, run one segmentation and, with *workers* > 1,
+    fork the worker pool, so the first request does not wait.
+
+    The app runs it in a background thread at startup; ``is_ready`` turns
+    True when it is done.
+    """
+    _ensure_initialized()
+    jieba.lcut("預熱一下")
+    if workers > 1:
+        start_pool(workers)
+    _ready.set()
+
+
+def is_ready() -> bool:
+    """True once ``warm_up`` has loaded the dictionaries (and started the pool)."""
+    return _ready.is_set()
+
+
+def split_clauses(text: str) -> list[str]:
+    """*text* cut at the boundaries jieba segments across independently.
+
+    ``jieba.lcut(text)`` equals the concatenated ``jieba.lcut`` of the pieces,
+    so each piece can be segmented (and memoized) on its own.
+    """
+    return [c for c in _CLAUSE_RE.split(text) if c]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool reused across calls, forked once jieba is initialized.
+
+    Only the first call forks (with *workers* processes; in the app that is
+    ``start_pool`` at startup). Later calls get the same pool whatever
+    worker count they ask for: re-forking from a request thread could
+    deadlock the children. The one exception is a broken pool (a worker
+    died), which ``_cut_all`` drops so the next call forks a replacement.
+    """
+    global _pool, _pool_workers
+    _ensure_initialized()
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def start_pool(workers: int = SEGMENT_WORKERS) -> None:
+    """Load the dictionaries and fork the worker pool now.
+
+    ``warm_up`` calls it at startup, before any request segments text, so
+    requests never fork. Otherwise the pool is forked on first use.
+    """
+    # A fork pool starts all its workers on the first submit
+    _get_pool(workers).submit(int).result()
+
+
+def _cut_shard(texts: list[str]) -> list[list[str]]:
+    """Worker side: jieba is already initialized in the forked process."""
+    return [jieba.lcut(t) for t in texts]
+
+
+def _cut_all(texts: list[str], workers: int) -> list[list[str]]:
+    """jieba words for each of *texts*, in order; across *workers* processes when it pays."""
+    if workers < 2 or len(texts) < PARALLEL_MIN_TEXTS or "fork" not in multiprocessing.get_all_start_methods():
+        return [jieba.lcut(t) for t in texts]
+    pool = _get_pool(workers)
+    size = -(-len(texts) // (_pool_workers * SHARDS_PER_WORKER))
+    shards = (texts[i:i + size] for i in range(0, len(texts), size))
+    logger.info("batch_cut: %d texts across %d workers", len(texts), _pool_workers)
+    results: list[list[str]] = []
+    try:
+        for words in pool.map(_cut_shard, shards):
+            results.extend(words)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed): drop the pool and segment this batch here
+        logger.warning("batch_cut: worker pool broken, segmenting %d texts serially", len(texts))
+        _drop_pool(pool)
+        return [jieba.lcut(t) for t in texts]
+    return results
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget *pool* if it is still the current one, so the next use forks a new pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def cut(text: str, cache: dict[str, list[str]] | None = None) -> list[str]:
+    """Segment a single string.
+
+    With *cache* (text → words), a text already segmented there is not cut
+    again and new results are added to it.
+    """
+    if cache is not None:
+        words = cache.get(text)
+        if words is None:
+            words = cache[text] = cut(text)
+        return words
     _ensure_initialized()
     return jieba.lcut(text)
 
 
-def batch_cut(texts: list[str], progress: dict | None = None) -> list[list[str]]:
+def batch_cut(
+    texts: list[str],
+    progress: dict | None = None,
+    cache: dict[str, list[str]] | None = None,
+    skip_trivial: bool = True,
+    workers: int | None = None,
+    by_clause: bool = False,
+) -> list[list[str]]:
     """Batch segment with aggressive pre-filter + dedup.
 
-    1. Pre-filter trivial texts (≤4 chars, noise, repeats) — skip entirely.
+    1. Pre-filter trivial texts (≤4 chars, noise, repeats) — skip entirely
+       (each comes back as the single word ``[text]``), unless
+       *skip_trivial* is False.
     2. Deduplicate remaining texts.
-    3. Segment only unique non-trivial texts via jieba, then map results back.
+    3. Segment only unique non-trivial texts via jieba (or take them from
+       *cache*, as in ``cut``, or from ``shared_cache``), then map results
+       back. Equal texts share one word list.
+
+    With *by_clause*, texts are split into clauses (``split_clauses``) and
+    the dedup, the shared cache and jieba work on clauses instead, so long
+    messages built from common clauses ("好啊，那我們明天見！") reuse them.
+    The words are the same as segmenting each whole text.
+
+    Large batches are split across *workers* processes (default
+    ``SEGMENT_WORKERS``); the results are the same as a serial run.
     """
     if not texts:
         return []
@@ -77,7 +403,7 @@ def batch_cut(texts: list[str], progress: dict | None = None) -> list[list[str]]
 
     trivial_count = 0
     for t in texts:
-        if _is_trivial(t):
+        if skip_trivial and _is_trivial(t):
             text_indices.append(-1)
             trivial_count += 1
             continue
@@ -92,8 +418,31 @@ def batch_cut(texts: list[str], progress: dict | None = None) -> list[list[str]]
         (1 - len(unique_texts) / max(len(texts), 1)) * 100,
     )
 
-    # Segment unique texts
-    unique_results = [jieba.lcut(t) for t in unique_texts]
+    # Segment unique texts not cached for this call or across requests
+    known = {} if cache is None else cache
+    missing = [t for t in unique_texts if t not in known]
+    if by_clause:
+        clauses = {t: split_clauses(t) for t in missing}
+        units = list(dict.fromkeys(c for parts in clauses.values() for c in parts))
+        logger.info(
+            "batch_cut: %d texts → %d clauses → %d unique",
+            len(missing), sum(map(len, clauses.values())), len(units),
+        )
+    else:
+        units = missing
+    found = shared_cache.get_many(units)
+    new = [u for u in units if u not in found]
+    new_words = _cut_all(new, SEGMENT_WORKERS if workers is None else workers)
+    shared_cache.put_many(new, new_words)
+    if by_clause:
+        unit_words: dict[str, list[str] | tuple[str, ...]] = dict(found)
+        unit_words.update(zip(new, new_words))
+        known.update((t, [w for c in parts for w in unit_words[c]]) for t, parts in clauses.items())
+    else:
+        known.update((t, list(words)) for t, words in found.items())
+        known.update(zip(new, new_words))
+    unique_results = [known[t] for t in unique_texts]
+    logger.info("batch_cut: %d from the shared cache, %d segmented", len(found), len(new))
 
     if progress is not None:
         progress["done"] = 1
@@ -104,3 +453,9 @@ def batch_cut(texts: list[str], progress: dict | None = None) -> list[list[str]]
         unique_results[idx] if idx >= 0 else [texts[i]]
         for i, idx in enumerate(text_indices)
     ]
+
+
+if __name__ == "__main__":
+    # Build step: python -m app.services.segmenter [path]
+    logging.basicConfig(level=logging.INFO)
+    build_prefix_cache(*sys.argv[1:2])
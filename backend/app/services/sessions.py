@@ -0,0 +1,145 @@
+"""Conversation sessions: gap-based segmentation at several thresholds.
+
+A session starts at the first row and at every row whose gap from the
+previous row exceeds the threshold. Negative gaps (out-of-order rows) never
+split a session. ``SessionIndex`` finds every threshold's boundaries in one
+walk over the gaps and keeps them as integer row arrays. It is shared per
+scan like the ``DayIndex``, and these analyzers read their segmentation
+from it:
+
+- reply streaks (5 min)
+- bedtime chat blocks (10 min)
+- the first conversation (30 min)
+- left-on-read (1 h)
+- ``sessions``: who starts conversations and how long they run, at every
+  threshold (the 4 h one is the "topic initiator" gap)
+"""
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from itertools import chain
+from operator import sub
+
+from app.services.message_table import IndexConsumer, MessageTable, as_table, scan
+
+# Gap thresholds in seconds, ascending
+SESSION_GAPS = (300, 600, 1800, 3600, 4 * 3600)
+# Session length distribution: bucket → most messages it holds (None for the rest)
+SESSION_LENGTH_BUCKETS = {"1": 1, "2-5": 5, "6-20": 20, "21-100": 100, ">100": None}
+
+
+class SessionIndex:
+    """Start rows of the sessions at each gap threshold.
+
+    ``starts[gap]`` is an ``array('q')`` of table rows, ascending. The last
+    session of the scanned range ends at ``stop``.
+    """
+
+    def __init__(self, table: MessageTable, gaps: tuple[int, ...] = SESSION_GAPS) -> None:
+        self.table = table
+        self.gaps = tuple(sorted(gaps))
+        self.starts = {gap: array("q") for gap in self.gaps}
+        self.first_row: int | None = None
+        self.stop: int | None = None  # one past the last row seen
+
+    def add(self, block) -> None:
+        timestamps = block.timestamps
+        if not timestamps:
+            return
+        if block.prev_ts is None:
+            self.first_row = block.start
+            for starts in self.starts.values():
+                starts.append(block.start)
+            prev = timestamps[0]
+        else:
+            prev = block.prev_ts
+        # One pass for the smallest threshold; the larger ones only revisit its splits
+        smallest = self.gaps[0]
+        rows: list[int] = []
+        deltas: list[int] = []
+        for row, ts in enumerate(timestamps, block.start):
+            delta = ts - prev
+            if delta > smallest:
+                rows.append(row)
+                deltas.append(delta)
+            prev = ts
+        for gap, starts in self.starts.items():
+            if gap != smallest:
+                rows = [row for row, delta in zip(rows, deltas) if delta > gap]
+                deltas = [delta for delta in deltas if delta > gap]
+            starts.extend(rows)
+        self.stop = block.start + len(timestamps)
+
+    def merge(self, other: "SessionIndex") -> None:
+        if other.first_row is None:
+            return
+        if self.first_row is None:
+            # Nothing on our side yet: copy their boundaries
+            for gap, starts in self.starts.items():
+                starts.extend(other.starts[gap])
+            self.first_row, self.stop = other.first_row, other.stop
+            return
+        # The other range's first row starts a session only if the gap across the boundary splits it
+        timestamps = self.table.timestamps
+        delta = timestamps[other.first_row] - timestamps[self.stop - 1]
+        for gap, starts in self.starts.items():
+            theirs = other.starts[gap]
+            starts.extend(theirs if delta > gap else theirs[1:])
+        self.stop = other.stop
+
+    def finalize(self) -> "SessionIndex":
+        return self
+
+    def lengths(self, gap: int) -> list[int]:
+        """Messages per session at *gap*, in order."""
+        starts = self.starts[gap]
+        if not starts:
+            return []
+        return list(map(sub, chain(starts[1:], (self.stop,)), starts))
+
+    def session_start(self, gap: int, row: int) -> int:
+        """First row of the session at *gap* that contains *row*."""
+        starts = self.starts[gap]
+        return starts[bisect_right(starts, row) - 1]
+
+
+def compute_sessions(parsed: dict) -> list[dict]:
+    table = as_table(parsed)
+    acc = SessionStatsAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
+
+
+class SessionStatsAccumulator(IndexConsumer):
+    """Session count, initiators and length distribution per gap threshold."""
+
+    index_factories = {"session_index": SessionIndex}
+
+    def __init__(self, table: MessageTable, parsed: dict, session_index: SessionIndex | None = None) -> None:
+        self.table = table
+        self.persons: list[str] = parsed["persons"]
+        self._use_indexes(table, session_index=session_index)
+
+    def finalize(self) -> list[dict]:
+        index = self.session_index
+        senders = self.table.senders
+        codes = {p: self.table.sender_code(p) for p in self.persons}
+        result = []
+        for gap in index.gaps:
+            starts = index.starts[gap]
+            started = Counter(map(senders.__getitem__, starts))
+            # Sessions per distinct length (far fewer than sessions)
+            distribution = dict.fromkeys(SESSION_LENGTH_BUCKETS, 0)
+            for n, count in Counter(index.lengths(gap)).items():
+                for key, most in SESSION_LENGTH_BUCKETS.items():
+                    if most is None or n <= most:
+                        distribution[key] += count
+                        break
+            result.append({
+                "gapMinutes": gap // 60,
+                "count": len(starts),
+                "avgMessages": round((index.stop - starts[0]) / len(starts), 1) if starts else 0,
+                "initiators": {p: started[c] if c is not None else 0 for p, c in codes.items()},
+                "lengthDistribution": distribution,
+            })
+        return result
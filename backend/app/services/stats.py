@@ -1,69 +1,128 @@
-from app.services.parser import Message, CallRecord
+from datetime import date
+
+from app.services.count_cube import CALL_MEASURES, CallCube, CountCube
+from app.services.day_index import DayIndex
+from app.services.message_table import IndexConsumer, MessageTable, RowBlock, as_table, scan
+from app.services.parser import CallRecord
 
 
 def compute_basic_stats(parsed: dict) -> dict:
-    messages: list[Message] = parsed["messages"]
-    calls: list[CallRecord] = parsed["calls"]
-    persons: list[str] = parsed["persons"]
+    table = as_table(parsed)
+    acc = BasicStatsAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
+
+
+class BasicStatsAccumulator(IndexConsumer):
+    """Text chars per (sender, type) cell; counts come from the count cube (and a
+    call cube), the date range from the day index."""
+
+    index_factories = {"day_index": DayIndex, "count_cube": CountCube}
+
+    def __init__(
+        self,
+        table: MessageTable,
+        parsed: dict,
+        day_index: DayIndex | None = None,
+        count_cube: CountCube | None = None,
+    ) -> None:
+        self.table = table
+        self.calls: list[CallRecord] = parsed["calls"]
+        self.persons: list[str] = parsed["persons"]
+        self.n_types = len(table.type_names)
+        self.cell_chars = [0] * (len(table.sender_names) * self.n_types)
+        self._use_indexes(table, day_index=day_index, count_cube=count_cube)
+
+    def add(self, block: RowBlock) -> None:
+        super().add(block)
+        self._add_cells(block)
+
+    def _add_cells(self, block: RowBlock) -> None:
+        n_types = self.n_types
+        cell_chars = self.cell_chars
+        for s, t, c in zip(block.senders, block.types, block.char_counts):
+            cell_chars[s * n_types + t] += c
+
+    def merge(self, other: "BasicStatsAccumulator") -> None:
+        super().merge(other)
+        self.cell_chars = [a + b for a, b in zip(self.cell_chars, other.cell_chars)]
+
+    def finalize(self) -> dict:
+        return _basic_stats(self)
+
+
+def _basic_stats(acc: BasicStatsAccumulator) -> dict:
+    table = acc.table
+    persons = acc.persons
+    n_types = acc.n_types
+    cell_counts = [0] * len(acc.cell_chars)
+    for (s, t), n in acc.count_cube.totals(("sender", "type")).items():
+        cell_counts[s * n_types + t] = n
+    cell_chars = acc.cell_chars
+    calls = CallCube(acc.calls)
+
+    def _cell(person: str, msg_type: str, cells: list[int]) -> int:
+        s = table.sender_code(person)
+        t = table.type_code(msg_type)
+        if s is None or t is None:
+            return 0
+        return cells[s * n_types + t]
 
     # Message counts
     msg_counts = {}
     word_counts = {}
     for p in persons:
-        p_msgs = [m for m in messages if m.sender == p]
-        msg_counts[p] = len(p_msgs)
-        word_counts[p] = sum(len(m.content) for m in p_msgs if m.msg_type == "text")
-    msg_counts["total"] = len(messages)
+        s = table.sender_code(p)
+        msg_counts[p] = sum(cell_counts[s * n_types:(s + 1) * n_types]) if s is not None else 0
+        word_counts[p] = _cell(p, "text", cell_chars)
+    msg_counts["total"] = sum(cell_counts)  # rows scanned
     word_counts["total"] = sum(word_counts[p] for p in persons)
 
-    # Type breakdown
+    # Type breakdown (type codes are assigned in order of first appearance)
     type_counts: dict[str, int] = {}
-    for m in messages:
-        type_counts[m.msg_type] = type_counts.get(m.msg_type, 0) + 1
+    for t, name in enumerate(table.type_names):
+        type_counts[name] = sum(cell_counts[t::n_types])
 
     # Call stats
-    completed = [c for c in calls if c.duration_seconds > 0]
-    missed = [c for c in calls if c.duration_seconds == 0]
-    total_dur = sum(c.duration_seconds for c in completed)
+    call_totals = {measure: calls.totals(measure).get((), 0) for measure in CALL_MEASURES}
+    n_calls = call_totals["calls"]
+    completed = call_totals["completedCalls"]
+    total_dur = call_totals["callSeconds"]
 
     call_stats = {
-        "totalCalls": len(calls),
-        "completedCalls": len(completed),
-        "missedCalls": len(missed),
+        "totalCalls": n_calls,
+        "completedCalls": completed,
+        "missedCalls": n_calls - completed,
         "totalDurationSeconds": total_dur,
-        "avgDurationSeconds": round(total_dur / len(completed)) if completed else 0,
-        "maxDurationSeconds": max((c.duration_seconds for c in completed), default=0),
+        "avgDurationSeconds": round(total_dur / completed) if completed else 0,
+        "maxDurationSeconds": call_totals["longestCallSeconds"],
     }
 
     # Date range
-    if messages:
-        dates = [m.timestamp.date() for m in messages]
-        start = min(dates)
-        end = max(dates)
+    day_index = acc.day_index
+    if day_index.first_day is not None:
+        start = date.fromordinal(day_index.first_day)
+        end = date.fromordinal(day_index.last_day)
         total_days = (end - start).days + 1
     else:
         start = end = None
         total_days = 0
 
     # Per-person metrics
-    def _count_type(person: str, msg_type: str) -> int:
-        return len([m for m in messages if m.sender == person and m.msg_type == msg_type])
-
-    def _call_count(person: str) -> int:
-        return len([c for c in calls if c.caller == person])
+    call_counts = {calls.callers[code]: n for (code,), n in calls.totals("calls", ("sender",)).items()}
 
     total_msgs = msg_counts["total"] or 1
     total_words = word_counts["total"] or 1
     total_stickers = max(type_counts.get("sticker", 0), 1)
     total_photos = max(type_counts.get("photo", 0), 1)
-    total_calls = max(len(calls), 1)
+    total_calls = max(n_calls, 1)
 
     # Structure: personBalance[person][metric] = {count, percent}
     person_balance = {}
     for p in persons:
-        sticker_count = _count_type(p, "sticker")
-        photo_count = _count_type(p, "photo")
-        call_count = _call_count(p)
+        sticker_count = _cell(p, "sticker", cell_counts)
+        photo_count = _cell(p, "photo", cell_counts)
+        call_count = call_counts.get(p, 0)
         person_balance[p] = {
             "text": {"count": msg_counts[p], "percent": round(msg_counts[p] / total_msgs * 100, 1)},
             "word": {"count": word_counts[p], "percent": round(word_counts[p] / total_words * 100, 1)},
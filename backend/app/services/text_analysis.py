@@ -309,13 +309,27 @@ def _tfidf_score(word: str, tf: int, total_msgs: int) -> float:
     return tf_norm * idf
 
 
+def _shared_word_totals(all_words_by_person: dict[str, Counter]) -> dict[str, int]:
+    """Words used by at least two persons → total count across everyone.
+
+    One pass over each person's vocabulary, so group chats with hundreds of
+    members cost the same as comparing every pair would for two people.
+    """
+    users: Counter = Counter()
+    totals: Counter = Counter()
+    for counter in all_words_by_person.values():
+        users.update(counter.keys())
+        totals.update(counter)
+    return {w: totals[w] for w, n in users.items() if n >= 2}
+
+
 def _extract_shared_interests(
     all_words_by_person: dict[str, Counter], persons: list[str],
     total_msgs: int = 0,
 ) -> list[dict]:
     """Extract shared interests using TF-IDF scoring (jieba fallback).
 
-    1. Only words BOTH people mention (truly shared).
+    1. Only words at least two people mention (truly shared).
     2. Categorize by explicit word->category lookup (no suffix guessing).
     3. Rank by TF-IDF: frequent in this chat but rare in general Chinese.
     """
@@ -324,17 +338,15 @@ def _extract_shared_interests(
 
     _load_interest_words()
 
-    p1, p2 = persons[0], persons[1]
-    shared_words = set(all_words_by_person[p1]) & set(all_words_by_person[p2])
+    shared = _shared_word_totals(all_words_by_person)
 
     categorized: dict[str, list[tuple[str, int, float]]] = {}
-    for w in shared_words:
+    for w, total in shared.items():
         if w in _BORING_WORDS or len(w) < 2:
             continue
         cat = _word_to_category.get(w)
         if not cat:
             continue
-        total = all_words_by_person[p1][w] + all_words_by_person[p2][w]
         score = _tfidf_score(w, total, total_msgs)
         if cat not in categorized:
             categorized[cat] = []
@@ -362,22 +374,20 @@ def build_interest_context(
 ) -> str:
     """Build structured context for AI to categorize shared interests.
 
-    Finds TF-IDF top distinctive words shared by both persons, then
+    Finds TF-IDF top distinctive words shared by two or more persons, then
     traces back to original messages for context. The AI uses this
     to produce accurate sharedInterests with specific proper nouns.
     """
     if len(persons) < 2:
         return ""
 
-    p1, p2 = persons[0], persons[1]
-    shared = set(all_words_by_person[p1]) & set(all_words_by_person[p2])
+    shared = _shared_word_totals(all_words_by_person)
 
     # Score by TF-IDF, filter boring
     scored = []
-    for w in shared:
+    for w, total in shared.items():
         if w in _BORING_WORDS or len(w) < 2:
             continue
-        total = all_words_by_person[p1][w] + all_words_by_person[p2][w]
         score = _tfidf_score(w, total, total_msgs)
         scored.append((w, total, score))
 
@@ -432,81 +442,77 @@ def build_interest_context(
     return "\n".join(lines)
 
 
-def compute_text_analysis(parsed: dict) -> tuple[dict, str]:
+def tokenize_messages(
+    msg_texts: list[str | None], token_cache: dict[str, list[str]] | None = None,
+) -> list[list[str]]:
+    """jieba words per message: the token column every text consumer reads.
+
+    *msg_texts* holds each message's text (URLs removed), None for
+    non-text messages, which get no words. Each distinct text is segmented
+    once (and taken from *token_cache* when it is already there), clause by
+    clause so repeated clauses of long messages are segmented once too, and
+    equal texts share one word list.
+    """
+    texts = [t for t in msg_texts if t is not None]
+    words = iter(segmenter.batch_cut(texts, cache=token_cache, skip_trivial=False, by_clause=True))
+    return [[] if t is None else next(words) for t in msg_texts]
+
+
+def _cloud_words(text: str, words: list[str]) -> list[str]:
+    """Words of *text* counted in the word cloud.
+
+    Trivial texts (≤4 chars, noise, repeats) count as one word, the whole
+    text, as ``segmenter.batch_cut`` returns them.
+    """
+    if segmenter._is_trivial(text):
+        words = [text]
+    return [
+        w for w in words
+        if len(w) >= 2
+        and w not in STOP_WORDS
+        and not re.match(r"^[\d\W]+$", w)
+        and not re.match(r"^(.)\1+$", w)
+    ]
+
+
+def compute_text_analysis(
+    parsed: dict, token_cache: dict[str, list[str]] | None = None,
+) -> tuple[dict, str]:
     """Compute word cloud, unique phrases, and interest context for AI.
 
     Returns (text_analysis_dict, interest_context_str).
     text_analysis_dict includes a "_word_idf" key for sample_messages().
+    Every message is segmented in one pass (``tokenize_messages``); the
+    per-message words are also returned under "_msg_words" for the AI
+    sampling. Pass the same *token_cache* (text → jieba words) to several
+    calls to segment each distinct text once across all of them.
     """
     messages: list[Message] = parsed["messages"]
     persons: list[str] = parsed["persons"]
 
-    # 收集每人的文字訊息
-    texts_by_person: dict[str, list[str]] = {p: [] for p in persons}
-    for m in messages:
-        if m.msg_type == "text":
-            texts_by_person[m.sender].append(_URL_RE.sub("", m.content))
-
-    # 批次分詞（jieba）
-    all_texts: list[str] = []
-    person_ranges: list[tuple[str, int, int]] = []  # (person, start, end)
-    for p in persons:
-        start = len(all_texts)
-        all_texts.extend(texts_by_person[p])
-        person_ranges.append((p, start, len(all_texts)))
-
-    all_words = segmenter.batch_cut(all_texts)
-
-    # 統計
-    word_cloud = {}
-    all_words_by_person: dict[str, Counter] = {}
-
-    for person, start, end in person_ranges:
-        counter: Counter = Counter()
-        for word_list in all_words[start:end]:
-            filtered = [
-                w for w in word_list
-                if len(w) >= 2
-                and w not in STOP_WORDS
-                and not re.match(r"^[\d\W]+$", w)
-                and not re.match(r"^(.)\1+$", w)
-            ]
-            counter.update(filtered)
-        all_words_by_person[person] = counter
-        word_cloud[person] = [
-            {"word": w, "count": c}
-            for w, c in counter.most_common(80)
-        ]
+    msg_texts = [_URL_RE.sub("", m.content) if m.msg_type == "text" else None for m in messages]
+    msg_words = tokenize_messages(msg_texts, token_cache)
+
+    # 統計 (each distinct text is filtered once)
+    all_words_by_person: dict[str, Counter] = {p: Counter() for p in persons}
+    cloud_words: dict[str, list[str]] = {}
+    for m, text, words in zip(messages, msg_texts, msg_words):
+        if text is None:
+            continue
+        filtered = cloud_words.get(text)
+        if filtered is None:
+            filtered = cloud_words[text] = _cloud_words(text, words)
+        all_words_by_person[m.sender].update(filtered)
+    word_cloud = {
+        person: [{"word": w, "count": c} for w, c in counter.most_common(80)]
+        for person, counter in all_words_by_person.items()
+    }
 
     # Unique phrases: words that appear disproportionately in THIS chat
-    # Simple approach: words used by both persons (shared vocabulary)
-    if len(persons) == 2:
-        p1, p2 = persons
-        shared = set(all_words_by_person[p1]) & set(all_words_by_person[p2])
-        unique = sorted(
-            shared,
-            key=lambda w: all_words_by_person[p1][w] + all_words_by_person[p2][w],
-            reverse=True,
-        )[:20]
-        unique_phrases = [
-            {
-                "phrase": w,
-                "count": all_words_by_person[p1][w] + all_words_by_person[p2][w],
-            }
-            for w in unique
-        ]
-    else:
-        unique_phrases = []
-
-    # Build per-message word lists aligned with original messages (for sample_messages)
-    # all_words above is aligned with all_texts (per-person), we need per-message alignment
-    msg_words: list[list[str]] = []
-    for m in messages:
-        if m.msg_type == "text":
-            cleaned = _URL_RE.sub("", m.content)
-            msg_words.append(segmenter.cut(cleaned))
-        else:
-            msg_words.append([])
+    # Simple approach: words used by at least two persons (shared vocabulary)
+    shared = _shared_word_totals(all_words_by_person)
+    unique = sorted(shared, key=shared.get, reverse=True)[:20]
+    unique_phrases = [{"phrase": w, "count": shared[w]} for w in unique]
 
     # Build word IDF from all segmented words (for TF-IDF message scoring)
     import math
@@ -1,51 +1,150 @@
 import re
+from bisect import bisect_left
 from collections import defaultdict
-from datetime import datetime
-from app.services.parser import Message
+from datetime import date
+
+from app.services.count_cube import CountCube
+from app.services.day_index import DayIndex
+from app.services.message_table import SECONDS_PER_DAY, IndexConsumer, MessageTable, RowBlock, as_table, scan
+from app.services.sessions import SESSION_GAPS, SessionIndex
 
 
 # Use word boundaries (\b) to avoid matching inside URLs or other words
 GOODNIGHT_RE = re.compile(r"(晚安|good\s*night\b|睡了|想睡|睡覺)", re.IGNORECASE)
 GOODMORNING_RE = re.compile(r"(早安|早～|早啊|good\s*morning\b|起床了)", re.IGNORECASE)
 _URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
+# Bedtime chat: messages from 22:00; a gap over 10 min starts a new block
+BEDTIME_HOUR = 22
+BEDTIME_GAP = 600
+assert BEDTIME_GAP in SESSION_GAPS
 
 
 def compute_time_patterns(parsed: dict) -> dict:
-    messages: list[Message] = parsed["messages"]
-    persons: list[str] = parsed["persons"]
+    table = as_table(parsed)
+    acc = TimePatternsAccumulator(table, parsed)
+    scan(table, [acc])
+    return acc.finalize()
 
-    heatmap = _build_heatmap(messages)
-    trend = _build_trend(messages, persons)
-    goodnight = _build_goodnight(messages, persons)
 
-    return {
-        "heatmap": heatmap,
-        "trend": trend,
-        "goodnightAnalysis": goodnight,
-    }
+class TimePatternsAccumulator(IndexConsumer):
+    """Heatmap, trend and goodnight analysis; the parts share this accumulator's indexes."""
+
+    index_factories = {"day_index": DayIndex, "session_index": SessionIndex, "count_cube": CountCube}
+
+    def __init__(
+        self,
+        table: MessageTable,
+        parsed: dict,
+        day_index: DayIndex | None = None,
+        session_index: SessionIndex | None = None,
+        count_cube: CountCube | None = None,
+    ) -> None:
+        self._use_indexes(table, day_index=day_index, session_index=session_index, count_cube=count_cube)
+        self._build_parts(table, parsed)
+
+    def _build_parts(self, table: MessageTable, parsed: dict) -> None:
+        self.heatmap = HeatmapAccumulator(table, self.count_cube)
+        self.trend = TrendAccumulator(table, parsed["persons"], self.count_cube)
+        self.goodnight = GoodnightAccumulator(table, self.day_index, self.session_index)
+
+    def add(self, block: RowBlock) -> None:
+        super().add(block)
+        self.heatmap.add(block)
+        self.trend.add(block)
+        self.goodnight.add(block)
+
+    def merge(self, other: "TimePatternsAccumulator") -> None:
+        super().merge(other)
+        self.heatmap.merge(other.heatmap)
+        self.trend.merge(other.trend)
+        self.goodnight.merge(other.goodnight)
+
+    def finalize(self) -> dict:
+        return {
+            "heatmap": self.heatmap.finalize(),
+            "trend": self.trend.finalize(),
+            "goodnightAnalysis": self.goodnight.finalize(),
+        }
+
+
+class HeatmapAccumulator(IndexConsumer):
+    """7 rows (Mon=0..Sun=6) x 24 cols (0-23, one per hour), from the count cube."""
+
+    index_factories = {"count_cube": CountCube}
+
+    def __init__(self, table: MessageTable, count_cube: CountCube | None = None) -> None:
+        self._use_indexes(table, count_cube=count_cube)
+
+    def finalize(self) -> list[list[int]]:
+        cells = [[0] * 24 for _ in range(7)]
+        for (weekday, hour), n in self.count_cube.totals(("weekday", "hour")).items():
+            cells[weekday][hour] = n
+        return cells
+
+
+class TrendAccumulator(IndexConsumer):
+    """Message counts per person by day, week and month, from the count cube.
+
+    Each resolution is columnar: ``{"periods": [...], "counts": {person:
+    [...]}}`` with one entry per period that has messages. Periods are
+    ``YYYY-MM-DD`` days, the ``YYYY-MM-DD`` Monday starting each week, and
+    ``YYYY-MM`` months.
+    """
+
+    index_factories = {"count_cube": CountCube}
 
+    def __init__(self, table: MessageTable, persons: list[str], count_cube: CountCube | None = None) -> None:
+        self.table = table
+        self.persons = persons
+        self._use_indexes(table, count_cube=count_cube)
 
-def _build_heatmap(messages: list[Message]) -> list[list[int]]:
-    """7 rows (Mon=0..Sun=6) x 24 cols (0-23, one per hour)."""
-    grid = [[0] * 24 for _ in range(7)]
-    for m in messages:
-        day = m.timestamp.weekday()  # 0=Mon
-        grid[day][m.timestamp.hour] += 1
-    return grid
+    def finalize(self) -> dict:
+        persons = self.persons
+        codes = [self.table.sender_code(p) for p in persons]
+        # The cube's (day, sender) rollup, read directly: this runs on every analysis
+        cube = self.count_cube.finalize()
+        n_senders = cube.n_senders
+        per_day: dict[int, list[int]] = {}
+        for key, n in zip(cube.day_keys, cube.day_counts):
+            day, sender = divmod(key, n_senders)
+            counts = per_day.get(day)
+            if counts is None:
+                counts = per_day[day] = [0] * n_senders
+            counts[sender] = n
+        days = sorted(per_day)
+        # Day ordinal 1 is a Monday
+        weeks = _group_days(days, per_day, lambda day: day - (day - 1) % 7)
+        months = _group_days(days, per_day, lambda day: date.fromordinal(day).replace(day=1).toordinal())
+        return {
+            "day": _trend_columns(per_day, persons, codes, str),
+            "week": _trend_columns(weeks, persons, codes, str),
+            "month": _trend_columns(months, persons, codes, lambda label: label[:7]),
+        }
 
 
-def _build_trend(messages: list[Message], persons: list[str]) -> list[dict]:
-    """Daily message counts per person (YYYY-MM-DD)."""
-    buckets: dict[str, dict[str, int]] = defaultdict(lambda: {p: 0 for p in persons})
-    for m in messages:
-        key = str(m.timestamp.date())  # "2024-03-15"
-        buckets[key][m.sender] += 1
+def _group_days(days: list[int], per_day: dict[int, list[int]], first_day_of) -> dict[int, list[int]]:
+    """Per-sender counts summed over the days sharing a period, keyed by its first day."""
+    groups: dict[int, list[int]] = {}
+    for day in days:
+        key = first_day_of(day)
+        counts = groups.get(key)
+        if counts is None:
+            groups[key] = list(per_day[day])
+        else:
+            for sender, n in enumerate(per_day[day]):
+                counts[sender] += n
+    return groups
 
-    result = []
-    for period in sorted(buckets):
-        entry = {"period": period, **buckets[period]}
-        result.append(entry)
-    return result
+
+def _trend_columns(groups: dict[int, list[int]], persons: list[str], codes: list, label) -> dict:
+    keys = sorted(groups)
+    return {
+        "periods": [label(str(date.fromordinal(key))) for key in keys],
+        "counts": {
+            p: [groups[key][code] for key in keys] if code is not None else [0] * len(keys)
+            for p, code in zip(persons, codes)
+        },
+    }
 
 
 def _is_greeting(content: str, pattern: re.Pattern) -> bool:
@@ -54,60 +153,121 @@ def _is_greeting(content: str, pattern: re.Pattern) -> bool:
     return bool(pattern.search(text))
 
 
-def _build_goodnight(messages: list[Message], persons: list[str]) -> dict:
-    gn_first: dict[str, int] = defaultdict(int)
-    gm_first: dict[str, int] = defaultdict(int)
-    last_chat_hours: list[float] = []
-    bedtime_durations: list[float] = []  # in minutes
-
-    # Group messages by date
-    by_date: dict[str, list[Message]] = defaultdict(list)
-    for m in messages:
-        by_date[str(m.timestamp.date())].append(m)
-
-    for date_str, day_msgs in by_date.items():
-        # Find first goodnight (only count after 21:00)
-        for m in day_msgs:
-            if (m.msg_type == "text"
-                    and m.timestamp.hour >= 21
-                    and _is_greeting(m.content, GOODNIGHT_RE)):
-                gn_first[m.sender] += 1
-                break
-
-        # Find first good morning (only count between 5:00-11:59)
-        for m in day_msgs:
-            if (m.msg_type == "text"
-                    and 5 <= m.timestamp.hour < 12
-                    and _is_greeting(m.content, GOODMORNING_RE)):
-                gm_first[m.sender] += 1
-                break
-
-        # Last message time of day (only count days with messages after 20:00)
-        night_last = [m for m in day_msgs if m.timestamp.hour >= 20]
-        if night_last:
-            last = night_last[-1].timestamp
-            last_chat_hours.append(last.hour + last.minute / 60)
-
-        # Bedtime chat duration: last continuous conversation block after 22:00
-        night_msgs = [m for m in day_msgs if m.timestamp.hour >= 22]
-        if len(night_msgs) >= 2:
-            block_start = night_msgs[-1].timestamp
-            for i in range(len(night_msgs) - 1, 0, -1):
-                gap = (night_msgs[i].timestamp - night_msgs[i - 1].timestamp).total_seconds()
-                if gap > 600:  # 10 min gap = conversation break
-                    break
-                block_start = night_msgs[i - 1].timestamp
-            duration_min = (night_msgs[-1].timestamp - block_start).total_seconds() / 60
-            if duration_min >= 1:
+# Per-day goodnight state slots
+_GN, _GM, _NIGHT_LAST = range(3)
+
+
+class GoodnightAccumulator(IndexConsumer):
+    """Per-day greeting state, kept in order of first appearance.
+
+    Bedtime chat blocks come from the indexes in finalize. Rows within a day
+    are in time order (as exported), so a day's rows from 22:00 on are the
+    tail of its row range, and the last bedtime block starts at the later of
+    that tail's first row and the 10-minute session holding the day's last row.
+    """
+
+    index_factories = {"day_index": DayIndex, "session_index": SessionIndex}
+
+    def __init__(
+        self,
+        table: MessageTable,
+        day_index: DayIndex | None = None,
+        session_index: SessionIndex | None = None,
+    ) -> None:
+        self.table = table
+        self.text_code = table.type_code("text")
+        # day ordinal → [first goodnight sender, first good-morning sender, last ts ≥ 20:00]
+        self.days: dict[int, list] = {}
+        self._use_indexes(table, day_index=day_index, session_index=session_index)
+
+    def add(self, block: RowBlock) -> None:
+        super().add(block)
+        self._add_greetings(block)
+
+    def _add_greetings(self, block: RowBlock) -> None:
+        table = self.table
+        text_code = self.text_code
+        days = self.days
+        current = None
+        for i, (day, sec, ts, t) in enumerate(zip(block.days, block.secs, block.timestamps, block.types)):
+            if day != current:
+                current = day
+                state = days.get(day)
+                if state is None:
+                    state = days[day] = [None, None, None]
+            hour = sec // 3600
+            if hour < 5:
+                continue
+            if t == text_code:
+                # First goodnight (only count after 21:00)
+                if hour >= 21 and state[_GN] is None:
+                    if _is_greeting(table.content(block.start + i), GOODNIGHT_RE):
+                        state[_GN] = block.senders[i]
+                # First good morning (only count between 5:00-11:59)
+                elif 5 <= hour < 12 and state[_GM] is None:
+                    if _is_greeting(table.content(block.start + i), GOODMORNING_RE):
+                        state[_GM] = block.senders[i]
+            if hour >= 20:
+                state[_NIGHT_LAST] = ts
+
+    def merge(self, other: "GoodnightAccumulator") -> None:
+        super().merge(other)
+        days = self.days
+        for day, theirs in other.days.items():
+            state = days.get(day)
+            if state is None:
+                days[day] = theirs
+                continue
+            # A day split across chunks: first greetings from our side,
+            # latest night rows from theirs
+            for slot in (_GN, _GM):
+                if state[slot] is None:
+                    state[slot] = theirs[slot]
+            if theirs[_NIGHT_LAST] is not None:
+                state[_NIGHT_LAST] = theirs[_NIGHT_LAST]
+
+    def _bedtime_minutes(self, day: int) -> float | None:
+        """Length of the day's last bedtime block, if it has two or more messages."""
+        timestamps = self.table.timestamps
+        start, stop = self.day_index.rows[day]
+        night = bisect_left(timestamps, day * SECONDS_PER_DAY + BEDTIME_HOUR * 3600, start, stop)
+        if stop - night < 2:
+            return None
+        block_start = max(night, self.session_index.session_start(BEDTIME_GAP, stop - 1))
+        if block_start == stop - 1:
+            return None
+        return (timestamps[stop - 1] - timestamps[block_start]) / 60
+
+    def finalize(self) -> dict:
+        names = self.table.sender_names
+        gn_first: dict[str, int] = defaultdict(int)
+        gm_first: dict[str, int] = defaultdict(int)
+        last_chat_hours: list[float] = []
+        bedtime_durations: list[float] = []  # in minutes
+
+        for day, (gn, gm, night_last) in self.days.items():
+            if gn is not None:
+                gn_first[names[gn]] += 1
+            if gm is not None:
+                gm_first[names[gm]] += 1
+
+            # Last message time of day (only count days with messages after 20:00)
+            if night_last is not None:
+                sec = night_last % SECONDS_PER_DAY
+                last_chat_hours.append(sec // 3600 + sec % 3600 // 60 / 60)
+
+            # Bedtime chat duration: last continuous conversation block after 22:00
+            duration_min = self._bedtime_minutes(day)
+            if duration_min is not None and duration_min >= 1:
                 bedtime_durations.append(duration_min)
 
-    avg_last = round(sum(last_chat_hours) / len(last_chat_hours), 1) if last_chat_hours else 0
-    avg_bedtime_chat = round(sum(bedtime_durations) / len(bedtime_durations)) if bedtime_durations else 0
+        avg_last = round(sum(last_chat_hours) / len(last_chat_hours), 1) if last_chat_hours else 0
+        avg_bedtime_chat = round(sum(bedtime_durations) / len(bedtime_durations)) if bedtime_durations else 0
 
-    return {
-        "whoSaysGoodnightFirst": dict(gn_first),
-        "whoSaysGoodmorningFirst": dict(gm_first),
-        "avgLastChatTime": avg_last,
-        "avgBedtimeChatMinutes": avg_bedtime_chat,
-        "bedtimeChatCount": len(bedtime_durations),
-    }
+        return {
+            "whoSaysGoodnightFirst": dict(gn_first),
+            "whoSaysGoodmorningFirst": dict(gm_first),
+            "avgLastChatTime": avg_last,
+            "avgBedtimeChatMinutes": avg_bedtime_chat,
+            "bedtimeChatCount": len(bedtime_durations),
+        }
@@ -0,0 +1,115 @@
+"""Fast timestamp decoding for LINE exports.
+
+Every message line starts with a time token such as ``上午09:15``,
+``下午02:07``, ``09:15`` or ``10:50 PM``. Instead of normalising the string
+and running ``strptime`` per line, all common tokens are enumerated once at
+import into ``TIME_TABLE`` (token → minute of day). Date headers are turned
+into day ordinals once per header, so a message timestamp is just
+``ordinal * 86400 + minute * 60``.
+"""
+from datetime import date
+
+
+def _to_minutes(h: int, m: int, is_am: bool, is_pm: bool) -> int | None:
+    """Apply AM/PM to a parsed hour; None if the result is not a valid time."""
+    if is_pm and h != 12:
+        h += 12
+    elif is_am and h == 12:
+        h = 0
+    if not (0 <= h <= 23 and 0 <= m <= 59):
+        return None
+    return h * 60 + m
+
+
+def parse_time_minutes(time_str: str) -> int:
+    """Slow path: parse '09:30', '上午11:19', '下午02:07', '10:50 PM', '6:05 AM'.
+
+    Returns minute of day. Raises ValueError for out-of-range values.
+    """
+    s = time_str.strip()
+
+    # Chinese AM/PM prefix
+    is_pm = s.startswith("下午")
+    is_am = s.startswith("上午")
+    if is_am or is_pm:
+        s = s[2:]
+
+    # English AM/PM suffix
+    s_upper = s.upper().strip()
+    if s_upper.endswith("PM"):
+        is_pm = True
+        s = s_upper[:-2].strip()
+    elif s_upper.endswith("AM"):
+        is_am = True
+        s = s_upper[:-2].strip()
+
+    h, m = map(int, s.split(":"))
+    minutes = _to_minutes(h, m, is_am, is_pm)
+    if minutes is None:
+        raise ValueError(f"invalid time: {time_str!r}")
+    return minutes
+
+
+def _build_time_table() -> dict[str, int]:
+    table: dict[str, int] = {}
+    for h in range(24):
+        hour_strs = {str(h), f"{h:02d}"}
+        for m in range(60):
+            for hs in hour_strs:
+                clock = f"{hs}:{m:02d}"
+                table[clock] = h * 60 + m
+                for prefix, is_am in (("上午", True), ("下午", False)):
+                    minutes = _to_minutes(h, m, is_am, not is_am)
+                    if minutes is not None:
+                        table[prefix + clock] = minutes
+                for suffix in ("AM", "PM", "am", "pm"):
+                    is_am = suffix.upper() == "AM"
+                    minutes = _to_minutes(h, m, is_am, not is_am)
+                    if minutes is not None:
+                        table[f"{clock} {suffix}"] = minutes
+                        table[clock + suffix] = minutes
+    return table
+
+
+# token → minute of day, for every token the common export variants produce
+TIME_TABLE: dict[str, int] = _build_time_table()
+
+
+TIME_STYLES = ("zh12", "en12", "24h")
+
+
+def time_style(token: str) -> str:
+    """Classify a time token as 'zh12' (上午/下午), 'en12' (AM/PM) or '24h'."""
+    if token.startswith(("上午", "下午")):
+        return "zh12"
+    if token[-2:].upper() in ("AM", "PM"):
+        return "en12"
+    return "24h"
+
+
+_STYLE_TABLES: dict[str, dict[str, int]] = {}
+
+
+def time_table_for(style: str | None) -> dict[str, int]:
+    """Subset of TIME_TABLE holding only tokens of one style (all if None)."""
+    if style is None:
+        return TIME_TABLE
+    table = _STYLE_TABLES.get(style)
+    if table is None:
+        table = {k: v for k, v in TIME_TABLE.items() if time_style(k) == style}
+        _STYLE_TABLES[style] = table
+    return table
+
+
+def decode_time(token: str) -> int:
+    """Return minute of day for a time token, via the table when possible."""
+    minutes = TIME_TABLE.get(token)
+    if minutes is None:
+        minutes = parse_time_minutes(token)
+    return minutes
+
+
+def date_ordinal(date_str: str) -> int:
+    """Convert a 'YYYY/M/D' header date to a proleptic day ordinal."""
+    y, m, d = date_str.split("/")
+    return date(int(y), int(m), int(d)).toordinal()
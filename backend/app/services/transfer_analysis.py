@@ -1,5 +1,6 @@
 from collections import defaultdict
 
+from app.services.message_table import MessageTable, RowBlock
 from app.services.parser import TransferRecord
 
 
@@ -36,3 +37,19 @@ def compute_transfer_analysis(parsed: dict) -> dict | None:
         "totalCount": total_count,
         "perPerson": per_person,
     }
+
+
+class TransferAccumulator:
+    """Transfers are parsed records, not messages: nothing to do per block."""
+
+    def __init__(self, table: MessageTable, parsed: dict) -> None:
+        self.parsed = parsed
+
+    def add(self, block: RowBlock) -> None:
+        pass
+
+    def merge(self, other: "TransferAccumulator") -> None:
+        pass
+
+    def finalize(self) -> dict | None:
+        return compute_transfer_analysis(self.parsed)
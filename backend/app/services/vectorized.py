@@ -0,0 +1,348 @@
+"""NumPy implementations of the message accumulators.
+
+Optional: install with ``pip install .[fast]``. Each class subclasses the
+pure-Python accumulator it replaces and only swaps out the per-block work
+(and, where needed, how state is merged and finalized), so the JSON output
+is identical.
+The engine picks these automatically when NumPy is importable; set
+``ANALYTICS_BACKEND=python`` to force the pure-Python path.
+
+Block columns are viewed as arrays without copying (``np.frombuffer`` on the
+MessageTable's ``array`` slices). Content-dependent work (greeting regexes)
+stays in Python but only visits candidate rows.
+"""
+from array import array
+from datetime import date
+
+from app.services.cold_war import ColdWarAccumulator, ColdWarSweepAccumulator
+from app.services.count_cube import CountCube
+from app.services.day_index import DayIndex
+from app.services.message_table import SECONDS_PER_DAY, MessageTable, RowBlock
+from app.services.quantile_sketch import BUCKET_BOUNDS
+from app.services.reply_analysis import N_KEYS, REPLY_CAP_SECONDS, ReplyAccumulator
+from app.services.sessions import SessionIndex
+from app.services.stats import BasicStatsAccumulator
+from app.services.time_patterns import (
+    GOODMORNING_RE,
+    GOODNIGHT_RE,
+    GoodnightAccumulator,
+    TimePatternsAccumulator,
+    _GM,
+    _GN,
+    _NIGHT_LAST,
+    _is_greeting,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without the extra
+    np = None
+
+HAS_NUMPY = np is not None
+
+_BOUNDS = np.asarray(BUCKET_BOUNDS, dtype=np.int64) if HAS_NUMPY else None
+# Day ordinal of 1970-01-01, NumPy's datetime64 epoch
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class _Arrays:
+    """Zero-copy NumPy views of one block's columns, plus derived columns."""
+
+    def __init__(self, block: RowBlock) -> None:
+        self.ts = np.frombuffer(block.timestamps, dtype=np.int64)
+        self.senders = np.frombuffer(block.senders, dtype=np.uint16).astype(np.intp)
+        self.types = np.frombuffer(block.types, dtype=np.uint8)
+        self.chars = np.frombuffer(block.char_counts, dtype=np.uint32)
+        self.days, self.secs = np.divmod(self.ts, SECONDS_PER_DAY)
+        self.hours = self.secs // 3600
+
+
+def _arrays(block: RowBlock) -> _Arrays:
+    """The block's arrays, built once and shared by every vectorized accumulator."""
+    arrays = block.__dict__.get("_arrays")
+    if arrays is None:
+        arrays = block.__dict__["_arrays"] = _Arrays(block)
+    return arrays
+
+
+def _sum_by_key(keys, counts):
+    """(distinct keys ascending, summed counts) as int64 arrays."""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    # Counts stay far below 2**53, so float64 weights are exact
+    return uniq, np.bincount(inverse, weights=counts, minlength=len(uniq)).astype(np.int64)
+
+
+def _to_array(values) -> array:
+    packed = array("q")
+    packed.frombytes(np.ascontiguousarray(values, dtype=np.int64).tobytes())
+    return packed
+
+
+def _month_index(days):
+    """Month index (``year * 12 + month - 1``) of each day ordinal, as in ``count_cube._MonthCache``."""
+    months = (days - _EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return months + 1970 * 12
+
+
+def _first_seen_order(values) -> list[int]:
+    """Distinct values in order of first occurrence."""
+    uniq, first = np.unique(values, return_index=True)
+    return uniq[np.argsort(first, kind="stable")].tolist()
+
+
+class VecDayIndex(DayIndex):
+    def add(self, block: RowBlock) -> None:
+        a = _arrays(block)
+        n = len(a.days)
+        if not n:
+            return
+        step = np.diff(a.days)
+        if (step >= 0).all():
+            # Day order: each day is one run
+            change = np.flatnonzero(step) + 1
+            starts = np.concatenate(([0], change))
+            stops = np.concatenate((change, [n]))
+            days = a.days[starts]
+            totals = stops - starts
+        else:
+            # First and last row of each day present in the block
+            days, starts, totals = np.unique(a.days, return_index=True, return_counts=True)
+            _, from_end = np.unique(a.days[::-1], return_index=True)
+            stops = n - from_end
+        for day, total, start, stop in zip(
+            days.tolist(), totals.tolist(),
+            (starts + block.start).tolist(), (stops + block.start).tolist(),
+        ):
+            self._add_day(day, total, start, stop)
+        self._extend_range(int(days.min()), int(days.max()))
+
+
+class VecSessionIndex(SessionIndex):
+    def add(self, block: RowBlock) -> None:
+        a = _arrays(block)
+        if not len(a.ts):
+            return
+        if block.prev_ts is None:
+            self.first_row = block.start
+            for starts in self.starts.values():
+                starts.append(block.start)
+            deltas = np.diff(a.ts)
+            offset = block.start + 1
+        else:
+            deltas = np.diff(a.ts, prepend=block.prev_ts)
+            offset = block.start
+        for gap, starts in self.starts.items():
+            starts.frombytes((np.flatnonzero(deltas > gap) + offset).astype(np.int64).tobytes())
+        self.stop = block.start + len(a.ts)
+
+
+class VecCountCube(CountCube):
+    """Counts each block's distinct cells in NumPy; the cells are summed once, when packed."""
+
+    def __init__(self, table: MessageTable) -> None:
+        super().__init__(table)
+        self._parts: list[tuple] = []  # (distinct keys, counts) per block
+
+    def add(self, block: RowBlock) -> None:
+        a = _arrays(block)
+        if len(a.ts):
+            keys = (a.ts // 3600 * self.n_senders + a.senders) * self.n_types + a.types
+            self._parts.append(np.unique(keys, return_counts=True))
+
+    def merge(self, other: "VecCountCube") -> None:
+        self._parts.extend(other._parts)
+
+    def _pack(self) -> None:
+        if not self._parts:
+            super()._pack()
+            return
+        keys, counts = _sum_by_key(
+            np.concatenate([keys for keys, _ in self._parts]),
+            np.concatenate([counts for _, counts in self._parts]),
+        )
+        n_cells = self.n_senders * self.n_types
+        # Same slots as CountCube._pack
+        week, shift = 7 * 24 * n_cells, 24 * n_cells
+        weekday_hour = np.bincount((keys - shift) % week, weights=counts, minlength=week)
+        day_keys, day_counts = _sum_by_key(keys // shift * self.n_senders + keys % n_cells // self.n_types, counts)
+        self.cell_keys = _to_array(keys)
+        self.cell_counts = _to_array(counts)
+        self.day_keys = _to_array(day_keys)
+        self.day_counts = _to_array(day_counts)
+        self.weekday_hour = _to_array(weekday_hour)
+        self._parts = []
+
+    def _decode(self, level: str) -> dict:
+        """One int64 column per dimension (-1 where the level lacks it) plus ``count``."""
+        n_cells = self.n_senders * self.n_types
+        if level == "weekday_hour":
+            counts = np.frombuffer(self.weekday_hour, dtype=np.int64)
+            slots = np.flatnonzero(counts)
+            weekday_hour, cell = np.divmod(slots, n_cells)
+            weekday, hour = np.divmod(weekday_hour, 24)
+            sender, msg_type = np.divmod(cell, self.n_types)
+            day = month = np.full(len(slots), -1, dtype=np.int64)
+            counts = counts[slots]
+        elif level == "day":
+            day, sender = np.divmod(np.frombuffer(self.day_keys, dtype=np.int64), self.n_senders)
+            hour = msg_type = np.full(len(day), -1, dtype=np.int64)
+            counts = np.frombuffer(self.day_counts, dtype=np.int64)
+        else:
+            hours, cell = np.divmod(np.frombuffer(self.cell_keys, dtype=np.int64), n_cells)
+            day, hour = np.divmod(hours, 24)
+            sender, msg_type = np.divmod(cell, self.n_types)
+            counts = np.frombuffer(self.cell_counts, dtype=np.int64)
+        if level != "weekday_hour":
+            weekday = (day - 1) % 7
+            month = _month_index(day)
+        return {
+            "day": day, "month": month, "weekday": weekday, "hour": hour,
+            "sender": sender, "type": msg_type, "count": counts,
+        }
+
+    def _sum(
+        self, rows: dict, group_by: tuple[str, ...], where: dict[str, set], days: tuple[int, int] | None,
+    ) -> dict[tuple, int]:
+        keep = None
+        if days is not None:
+            keep = (rows["day"] >= days[0]) & (rows["day"] <= days[1])
+        for dim, allowed in where.items():
+            mask = np.isin(rows[dim], np.fromiter(allowed, dtype=np.int64, count=len(allowed)))
+            keep = mask if keep is None else keep & mask
+        counts = rows["count"] if keep is None else rows["count"][keep]
+        if not len(counts):
+            return {}
+        if not group_by:
+            return {(): int(counts.sum())}
+        # One mixed-radix int64 key per row: the group columns, each shifted to start at 0
+        columns = [rows[dim] if keep is None else rows[dim][keep] for dim in group_by]
+        lows = [int(column.min()) for column in columns]
+        radixes = [int(column.max()) - low + 1 for column, low in zip(columns, lows)]
+        keys = np.zeros(len(counts), dtype=np.int64)
+        for column, low, radix in zip(columns, lows, radixes):
+            keys = keys * radix + (column - low)
+        keys, totals = _sum_by_key(keys, counts)
+        groups = []
+        for low, radix in zip(reversed(lows), reversed(radixes)):
+            keys, values = np.divmod(keys, radix)
+            groups.append((values + low).tolist())
+        return dict(zip(zip(*reversed(groups)), totals.tolist()))
+
+
+class VecBasicStatsAccumulator(BasicStatsAccumulator):
+    index_factories = {"day_index": VecDayIndex, "count_cube": VecCountCube}
+
+    def __init__(
+        self,
+        table: MessageTable,
+        parsed: dict,
+        day_index: DayIndex | None = None,
+        count_cube: CountCube | None = None,
+    ) -> None:
+        super().__init__(table, parsed, day_index, count_cube)
+        self._chars = np.zeros(len(self.cell_chars), dtype=np.int64)
+
+    def _add_cells(self, block: RowBlock) -> None:
+        a = _arrays(block)
+        cells = a.senders * self.n_types + a.types
+        # Per-block char sums stay far below 2**53, so float64 weights are exact
+        self._chars += np.bincount(cells, weights=a.chars, minlength=len(self._chars)).astype(np.int64)
+
+    def merge(self, other: "VecBasicStatsAccumulator") -> None:
+        self._chars += other._chars
+        super().merge(other)
+
+    def finalize(self) -> dict:
+        self.cell_chars = self._chars.tolist()
+        return super().finalize()
+
+
+class VecReplyAccumulator(ReplyAccumulator):
+    index_factories = {"session_index": VecSessionIndex}
+
+    def __init__(self, table: MessageTable, parsed: dict, session_index: SessionIndex | None = None) -> None:
+        super().__init__(table, parsed, session_index)
+        self.active_sum = np.zeros(len(table.sender_names), dtype=np.int64)
+
+    def _add_replies(self, block: RowBlock) -> None:
+        a = _arrays(block)
+        if block.prev_ts is None:
+            self.first_ts, self.first_sender = int(a.ts[0]), int(a.senders[0])
+            prev_ts, prev_snd = a.ts[:-1], a.senders[:-1]
+            cur_ts, cur_snd = a.ts[1:], a.senders[1:]
+            cur_hours = a.hours[1:]
+        else:
+            prev_ts = np.concatenate(([block.prev_ts], a.ts[:-1]))
+            prev_snd = np.concatenate(([block.prev_sender], a.senders[:-1]))
+            cur_ts, cur_snd = a.ts, a.senders
+            cur_hours = a.hours
+        self.last_ts, self.last_sender = int(a.ts[-1]), int(a.senders[-1])
+        if not len(cur_ts):
+            return
+        delta = cur_ts - prev_ts
+
+        replied = (cur_snd != prev_snd) & (delta >= 0)
+        d = delta[replied]
+        who = cur_snd[replied]
+        active = d <= REPLY_CAP_SECONDS
+        # Sums of gaps ≤ 3600s stay far below 2**53, so float64 weights are exact
+        self.active_sum += np.bincount(
+            who[active], weights=d[active], minlength=len(self.active_sum),
+        ).astype(np.int64)
+
+        # Sketch bucket counts per (sender, hour) cell: one dict update per distinct pair
+        if len(d):
+            keys = np.minimum(np.searchsorted(_BOUNDS, d, side="left"), N_KEYS - 1)
+            pairs, counts = np.unique((who * 24 + cur_hours[replied]) * N_KEYS + keys, return_counts=True)
+            reply_buckets = self.reply_buckets
+            for k, n in zip(pairs.tolist(), counts.tolist()):
+                reply_buckets[k] = reply_buckets.get(k, 0) + n
+
+
+class VecGoodnightAccumulator(GoodnightAccumulator):
+    index_factories = {"day_index": VecDayIndex, "session_index": VecSessionIndex}
+
+    def _add_greetings(self, block: RowBlock) -> None:
+        a = _arrays(block)
+        days = self.days
+        for day in _first_seen_order(a.days):
+            if day not in days:
+                days[day] = [None, None, None]
+
+        # Last message at or after 20:00 per day (last occurrence in file order)
+        night = np.flatnonzero(a.hours >= 20)
+        if len(night):
+            night_days = a.days[night]
+            uniq, from_end = np.unique(night_days[::-1], return_index=True)
+            last = night[len(night) - 1 - from_end]
+            for day, ts in zip(uniq.tolist(), a.ts[last].tolist()):
+                days[day][_NIGHT_LAST] = ts
+
+        # Greetings need the content: visit only text rows in the greeting windows
+        if self.text_code is None:
+            return
+        is_text = a.types == self.text_code
+        gn_rows = np.flatnonzero(is_text & (a.hours >= 21))
+        gm_rows = np.flatnonzero(is_text & (a.hours >= 5) & (a.hours < 12))
+        table = self.table
+        for rows, slot, pattern in ((gn_rows, _GN, GOODNIGHT_RE), (gm_rows, _GM, GOODMORNING_RE)):
+            for i, day in zip(rows.tolist(), a.days[rows].tolist()):
+                state = days[day]
+                if state[slot] is None and _is_greeting(table.content(block.start + i), pattern):
+                    state[slot] = block.senders[i]
+
+
+class VecTimePatternsAccumulator(TimePatternsAccumulator):
+    index_factories = {"day_index": VecDayIndex, "session_index": VecSessionIndex, "count_cube": VecCountCube}
+
+    def _build_parts(self, table: MessageTable, parsed: dict) -> None:
+        super()._build_parts(table, parsed)
+        self.goodnight = VecGoodnightAccumulator(table, self.day_index, self.session_index)
+
+
+class VecColdWarAccumulator(ColdWarAccumulator):
+    index_factories = {"day_index": VecDayIndex}
+
+
+class VecColdWarSweepAccumulator(VecColdWarAccumulator, ColdWarSweepAccumulator):
+    pass
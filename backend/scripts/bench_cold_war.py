@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Compare the rolling-average and CUSUM cold-war detectors.
+
+Speed: both engines run as accumulators over synthetic multi-year exports
+(see gen_line_export.py), reporting time per engine.
+
+Quality: daily-count series that mimic the generator (sessions per day,
+5% silent days) get cooling periods planted at random (7-30 days at
+10-35% of normal volume). A planted period counts as found when a detected
+cooling start falls inside it (or up to 3 days before); detections outside
+every planted period are false alarms. Stationary series without planted
+periods give the false-alarm rate per 1000 days.
+
+Usage:
+    python scripts/bench_cold_war.py [--lines 1000000] [--series 20]
+        [--days 1500] [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.change_point import CusumColdWarAccumulator, CusumDetector  # noqa: E402
+from app.services.cold_war import ColdWarAccumulator, _detect_from_daily  # noqa: E402
+from app.services.message_table import scan  # noqa: E402
+from app.services.parser import parse_line_chat  # noqa: E402
+from gen_line_export import generate_export  # noqa: E402
+
+ENGINES = {"rolling": ColdWarAccumulator, "cusum": CusumColdWarAccumulator}
+FIRST_DAY = date(2019, 1, 1).toordinal()
+
+
+def stationary_series(n_days: int, rng: random.Random) -> list[int]:
+    counts = []
+    for _ in range(n_days):
+        if rng.random() < 0.05:
+            counts.append(0)
+        else:
+            counts.append(sum(rng.randint(2, 40) for _ in range(rng.randint(1, 6))))
+    return counts
+
+
+def planted_series(n_days: int, rng: random.Random, n_periods: int = 8) -> tuple[list[int], list[tuple[int, int]]]:
+    counts = stationary_series(n_days, rng)
+    periods = []
+    for _ in range(n_periods):
+        start, length = rng.randrange(60, n_days - 60), rng.randint(7, 30)
+        factor = rng.uniform(0.1, 0.35)
+        for i in range(start, start + length):
+            counts[i] = int(counts[i] * factor)
+        periods.append((start, start + length - 1))
+    return counts, periods
+
+
+def rolling_starts(counts: list[int]) -> list[int]:
+    daily = {FIRST_DAY + i: c for i, c in enumerate(counts)}
+    return [date.fromisoformat(e["startDate"]).toordinal() - FIRST_DAY
+            for e in _detect_from_daily(daily, 0.65, 7, 30)]
+
+
+def cusum_starts(counts: list[int]) -> list[int]:
+    detector = CusumDetector()
+    for c in counts:
+        detector.update(c)
+    return [start for start, _, direction, _ in detector.shifts if direction == "cooling"]
+
+
+def score(starts: list[int], periods: list[tuple[int, int]]) -> tuple[int, int]:
+    """(planted periods found, false alarms)."""
+    inside = [any(a - 3 <= s <= b for a, b in periods) for s in starts]
+    found = sum(any(a - 3 <= s <= b for s in starts) for a, b in periods)
+    return found, inside.count(False)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    ap.add_argument("--series", type=int, default=20)
+    ap.add_argument("--days", type=int, default=1500)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    parsed = parse_line_chat(generate_export(args.lines, seed=args.seed))
+    table = parsed["messages"]
+    n_days = table.timestamps[-1] // 86400 - table.timestamps[0] // 86400 + 1
+    print(f"speed: {len(table):,} messages over {n_days:,} days")
+    for name, factory in ENGINES.items():
+        acc = factory(table, parsed)
+        t0 = time.perf_counter()
+        scan(table, [acc])
+        events = acc.finalize()
+        print(f"  {name:<8} {(time.perf_counter() - t0) * 1000:8.1f} ms  {len(events)} cold wars")
+
+    rng = random.Random(args.seed)
+    detectors = {"rolling": rolling_starts, "cusum": cusum_starts}
+    alarms = dict.fromkeys(detectors, 0)
+    for _ in range(args.series):
+        counts = stationary_series(args.days, rng)
+        for name, detect in detectors.items():
+            alarms[name] += len(detect(counts))
+    found = dict.fromkeys(detectors, 0)
+    false = dict.fromkeys(detectors, 0)
+    total = 0
+    for _ in range(args.series):
+        counts, periods = planted_series(args.days, rng)
+        total += len(periods)
+        for name, detect in detectors.items():
+            f, fa = score(detect(counts), periods)
+            found[name] += f
+            false[name] += fa
+
+    print(f"quality: {args.series} series x {args.days} days, {total} planted cooling periods")
+    print(f"  {'engine':<8} {'recall':>8} {'false':>6} {'stationary alarms/1000d':>24}")
+    for name in detectors:
+        rate = alarms[name] / (args.series * args.days) * 1000
+        print(f"  {name:<8} {found[name] / total:>8.0%} {false[name]:>6} {rate:>24.2f}")
+
+
+if __name__ == "__main__":
+    main()
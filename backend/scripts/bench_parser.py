@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark LINE export timestamp decoding and overall parser throughput.
+
+Compares the legacy per-line path (normalise + strptime + datetime.combine)
+with the precomputed TIME_TABLE lookup, then reports full parse_line_chat
+throughput on the same synthetic export.
+
+Usage:
+    python scripts/bench_parser.py [--lines 500000] [--clock zh|en|24] [--workers 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.parallel_parse import parse_line_chat_parallel  # noqa: E402
+from app.services.parser import MSG_LINE_RE, parse_line_chat  # noqa: E402
+from app.services.timestamps import decode_time  # noqa: E402
+
+
+def legacy_parse_time(time_str: str) -> datetime:
+    """The pre-table implementation, kept here as the baseline."""
+    s = time_str.strip()
+    is_pm = s.startswith("下午")
+    is_am = s.startswith("上午")
+    if is_am or is_pm:
+        s = s[2:]
+    s_upper = s.upper().strip()
+    if s_upper.endswith("PM"):
+        is_pm = True
+        s = s_upper[:-2].strip()
+    elif s_upper.endswith("AM"):
+        is_am = True
+        s = s_upper[:-2].strip()
+    h, m = map(int, s.split(":"))
+    if is_pm and h != 12:
+        h += 12
+    elif is_am and h == 12:
+        h = 0
+    return datetime.strptime(f"{h}:{m}", "%H:%M")
+
+
+def _time_token(minute: int, clock: str) -> str:
+    h, m = divmod(minute, 60)
+    if clock == "24":
+        return f"{h:02d}:{m:02d}"
+    if clock == "en":
+        return f"{h % 12 or 12}:{m:02d} {'AM' if h < 12 else 'PM'}"
+    return f"{'上午' if h < 12 else '下午'}{h % 12 or 12:02d}:{m:02d}"
+
+
+def make_export(n_lines: int, clock: str, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    lines = ["[LINE] 與小美的聊天記錄", "儲存日期：2025/02/10 14:00", ""]
+    day = date(2020, 1, 1)
+    while len(lines) < n_lines:
+        lines.append(f"{day:%Y/%m/%d}（{'一二三四五六日'[day.weekday()]}）")
+        for minute in sorted(rng.randrange(1440) for _ in range(rng.randint(20, 120))):
+            sender = rng.choice(("小美", "阿明"))
+            lines.append(f"{_time_token(minute, clock)}\t{sender}\t今天好開心 {rng.randrange(1000)}")
+        day += timedelta(days=1)
+    return "\n".join(lines[:n_lines])
+
+
+def _rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:>12,.0f} lines/s  ({seconds:.3f}s)"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--lines", type=int, default=500_000)
+    ap.add_argument("--clock", choices=["zh", "en", "24"], default="zh")
+    ap.add_argument("--workers", type=int, default=0, help="also time the process-pool parser")
+    args = ap.parse_args()
+
+    text = make_export(args.lines, args.clock)
+    tokens = [m.group(1) for m in map(MSG_LINE_RE.match, text.split("\n")) if m]
+    today = date(2024, 1, 15)
+    day_base = today.toordinal() * 86400
+    print(f"{len(tokens):,} time tokens ({args.clock} clock)")
+
+    t0 = time.perf_counter()
+    for tok in tokens:
+        datetime.combine(today, legacy_parse_time(tok).time())
+    before = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for tok in tokens:
+        day_base + decode_time(tok) * 60
+    after = time.perf_counter() - t0
+
+    print(f"timestamp decode, before (strptime):   {_rate(len(tokens), before)}")
+    print(f"timestamp decode, after  (TIME_TABLE): {_rate(len(tokens), after)}")
+    print(f"speedup: {before / after:.1f}x")
+
+    t0 = time.perf_counter()
+    parse_line_chat(text)
+    elapsed = time.perf_counter() - t0
+    print(f"parse_line_chat:                       {_rate(args.lines, elapsed)}")
+
+    if args.workers > 1:
+        parse_line_chat_parallel(text, args.workers)  # warm up the pool
+        t0 = time.perf_counter()
+        parse_line_chat_parallel(text, args.workers)
+        elapsed = time.perf_counter() - t0
+        print(f"parse_line_chat_parallel ({args.workers} workers): {_rate(args.lines, elapsed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Measure clause-level dedup for jieba segmentation and check it is exact.
+
+For every corpus, takes the text messages (URLs removed, as text analysis
+does) and reports how many distinct texts and distinct clauses
+(``segmenter.split_clauses``) jieba would have to segment, the clause hit
+rate (clause occurrences in distinct texts that repeat an earlier clause),
+and the time of ``batch_cut`` whole-text vs ``by_clause``, each with an
+empty shared cache. Every corpus is also checked word for word against
+``jieba.lcut`` of each whole text (the golden set).
+
+Corpora:
+- ``synthetic-*``: exports from gen_line_export.py (a small fixed pool of
+  lines, so most texts repeat whole);
+- ``real-shaped``: longer messages of 1-5 clauses joined by punctuation,
+  spaces, newlines or emoji. Clauses come from the generator's lines, the
+  test fixtures and new clauses built from dictionary words, drawn with
+  Zipf-like popularity, so few messages repeat whole but clauses do.
+
+Usage:
+    python scripts/bench_segmentation.py [--lines 200000] [--messages 100000] [--seed 0]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import jieba  # noqa: E402
+
+from app.services import segmenter  # noqa: E402
+from app.services.parser import parse_line_chat  # noqa: E402
+from app.services.text_analysis import _URL_RE  # noqa: E402
+from gen_line_export import ZH_TEXTS, generate_export  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+SEPARATORS = ["，", "！", "。", "？", "～", " ", "\n", "😂", "❤️", "...", "！！"]
+
+
+def _message_texts(text: str) -> list[str]:
+    parsed = parse_line_chat(text)
+    return [_URL_RE.sub("", m.content) for m in parsed["messages"] if m.msg_type == "text"]
+
+
+def _real_shaped(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    clauses = {c for t in ZH_TEXTS for c in segmenter.split_clauses(t) if len(c) > 1}
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+            for t in _message_texts(f.read()):
+                clauses.update(c for c in segmenter.split_clauses(t) if len(c) > 1)
+    words = [w for w, freq in jieba.dt.FREQ.items() if freq and len(w) > 1 and "一" <= w[0] <= "鿿"]
+    words.sort(key=jieba.dt.FREQ.get, reverse=True)
+    words = words[:20000]
+    # New clauses of 2-4 common words; the pool is ranked for Zipf-like draws
+    pool = sorted(clauses) + ["".join(rng.choices(words[:5000], k=rng.randint(2, 4))) for _ in range(20000)]
+    rng.shuffle(pool)
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    messages = []
+    for _ in range(n):
+        parts = rng.choices(pool, weights, k=rng.randint(1, 5))
+        if rng.random() < 0.3:
+            # One clause nobody said before
+            parts.append("".join(rng.choices(words, k=rng.randint(2, 5))))
+        text = parts[0]
+        for part in parts[1:]:
+            text += rng.choice(SEPARATORS) + part
+        messages.append(text + rng.choice(["", "", "！", "～", "😂"]))
+    return messages
+
+
+def _measure(name: str, texts: list[str]) -> None:
+    unique = list(dict.fromkeys(texts))
+    occurrences = [c for t in unique for c in segmenter.split_clauses(t)]
+    distinct = len(set(occurrences))
+    timings = []
+    for by_clause in (False, True):
+        segmenter.shared_cache.clear()
+        start = time.perf_counter()
+        words = segmenter.batch_cut(texts, skip_trivial=False, workers=1, by_clause=by_clause)
+        timings.append(time.perf_counter() - start)
+    segmenter.shared_cache.clear()
+    exact = words == [jieba.lcut(t) for t in texts]
+    print(
+        f"{name:<18} {len(texts):>8} {len(unique):>8} {len(occurrences):>9} {distinct:>8} "
+        f"{1 - distinct / max(len(occurrences), 1):>8.1%} "
+        f"{sum(map(len, unique)):>10} {sum(map(len, set(occurrences))):>10} "
+        f"{timings[0]:>8.2f}s {timings[1]:>8.2f}s  {'yes' if exact else 'NO'}"
+    )
+    if not exact:
+        raise SystemExit(f"{name}: clause segmentation differs from jieba.lcut")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200_000, help="lines per synthetic export")
+    parser.add_argument("--messages", type=int, default=100_000, help="messages in the real-shaped corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    segmenter._ensure_initialized()
+    corpora = {
+        "synthetic-zh": _message_texts(generate_export(args.lines, seed=args.seed)),
+        "synthetic-group": _message_texts(generate_export(args.lines, persons=12, seed=args.seed)),
+        "real-shaped": _real_shaped(args.messages, args.seed),
+    }
+    print(
+        f"{'corpus':<18} {'texts':>8} {'distinct':>8} {'clauses':>9} {'distinct':>8} {'hit rate':>8} "
+        f"{'chars':>10} {'clause ch':>10} {'whole':>9} {'clause':>9}  exact"
+    )
+    for name, texts in corpora.items():
+        _measure(name, texts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Parser throughput and peak-memory benchmark over synthetic exports.
+
+For every scenario × size, generates a deterministic export (see
+gen_line_export.py), then times ``parse_line_chat`` and, in a separate run
+under tracemalloc, records the peak memory allocated while parsing (the
+input string itself is excluded). The ``analyze`` column times
+``run_analyzers`` on the parsed result; the ``zh-group-100``/``-300``
+scenarios check that it stays linear in messages as participants grow.
+
+Usage:
+    python scripts/bench_suite.py [--sizes 10k,100k,1M,5M]
+        [--scenarios zh-2p,en-2p,zh-group] [--repeat 3] [--json out.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.engine import run_analyzers  # noqa: E402
+from app.services.parser import parse_line_chat  # noqa: E402
+from gen_line_export import generate_export  # noqa: E402
+
+# name → generator kwargs
+SCENARIOS = {
+    "zh-2p": {"lang": "zh", "persons": 2},
+    "en-2p": {"lang": "en", "persons": 2},
+    "zh-24h": {"lang": "zh", "persons": 2, "clock": "24h"},
+    "zh-group": {"lang": "zh", "persons": 8},
+    "en-group": {"lang": "en", "persons": 8},
+    "zh-group-100": {"lang": "zh", "persons": 100},
+    "zh-group-300": {"lang": "zh", "persons": 300},
+}
+DEFAULT_SCENARIOS = "zh-2p,en-2p,zh-group"
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower()
+    for suffix, mult in (("k", 1_000), ("m", 1_000_000)):
+        if s.endswith(suffix):
+            return int(float(s[:-1]) * mult)
+    return int(s)
+
+
+def bench_one(text: str, repeat: int) -> dict:
+    """Best-of-*repeat* parse and analyze times plus peak traced memory of one parse."""
+    n_lines = text.count("\n")
+    best = best_analyze = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = parse_line_chat(text)
+        t1 = time.perf_counter()
+        run_analyzers(result)
+        best = min(best, t1 - t0)
+        best_analyze = min(best_analyze, time.perf_counter() - t1)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = parse_line_chat(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n_messages = len(result["messages"])
+    del result
+
+    return {
+        "lines": n_lines,
+        "messages": n_messages,
+        "input_mb": round(len(text.encode("utf-8")) / 1e6, 2),
+        "seconds": round(best, 4),
+        "lines_per_sec": round(n_lines / best),
+        "peak_mb": round(peak / 1e6, 2),
+        "analyze_seconds": round(best_analyze, 4),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="10k,100k,1M")
+    ap.add_argument("--scenarios", default=DEFAULT_SCENARIOS,
+                    help=f"comma-separated, from: {','.join(SCENARIOS)}")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    names = args.scenarios.split(",")
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    print(f"{'scenario':<12} {'lines':>10} {'input MB':>9} {'seconds':>9} {'lines/s':>11} {'peak MB':>9} "
+          f"{'analyze':>9}")
+    results = []
+    for name in names:
+        for size in sizes:
+            text = generate_export(size, seed=args.seed, **SCENARIOS[name])
+            row = {"scenario": name, **bench_one(text, args.repeat)}
+            del text
+            results.append(row)
+            print(f"{name:<12} {row['lines']:>10,} {row['input_mb']:>9.2f} {row['seconds']:>9.3f} "
+                  f"{row['lines_per_sec']:>11,} {row['peak_mb']:>9.2f} {row['analyze_seconds']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Generate deterministic synthetic LINE chat exports for benchmarks.
+
+The same (lines, lang, persons, seed) always yields the same file. Output
+covers what the parser has to handle in real exports: Chinese and English
+headers/dates/times, 2-person and group chats, calls (3-col and missed
+2-col), LINE Pay transfers, stickers/photos/files, URLs, LINE emoji tokens,
+unsent-message system lines and tab-indented continuation lines.
+
+Usage:
+    python scripts/gen_line_export.py --lines 1000000 [--lang zh|en]
+        [--persons 2] [--clock zh12|en12|24h] [--seed 0] [-o chat.txt]
+"""
+
+import argparse
+import random
+import sys
+from collections.abc import Iterator
+from datetime import date, timedelta
+
+ZH_NAMES = ["小美", "阿明", "小華", "阿傑", "佳佳", "大雄", "小芳", "志豪", "雅婷", "家豪", "怡君", "俊宏"]
+EN_NAMES = ["Amy", "Ben", "Chloe", "David", "Emma", "Frank", "Grace", "Henry", "Ivy", "Jack", "Kelly", "Leo"]
+
+ZH_TEXTS = [
+    "早安～", "晚安", "我到家了", "你在幹嘛", "好想你喔", "哈哈哈哈", "好啊", "嗯嗯", "真的假的",
+    "今天去信義區吃拉麵好不好", "下班了！要不要一起去看電影", "我們去士林夜市吃雞排",
+    "明天要早起，先睡了", "等等我一下，快到了", "這家咖啡廳的甜點超好吃", "你今天工作順利嗎",
+    "週末要不要去淡水走走", "我剛剛在捷運上睡著了😂", "好累喔今天開了一整天的會", "記得帶傘！",
+]
+EN_TEXTS = [
+    "good morning", "good night", "I'm home", "what are you doing", "miss you", "haha", "ok",
+    "sure", "really?", "want to grab ramen tonight?", "running late, be there in 10",
+    "the dessert at that cafe was amazing", "how was work today", "don't forget the umbrella!",
+    "let's watch a movie this weekend", "so tired, meetings all day", "see you tomorrow 😊",
+]
+EMOJI_TOKENS = ["(emoji)", "(salute)", "(love)", "(toilet thumbs up)", "(sparkle)"]
+URLS = ["https://example.com/post/12345", "https://maps.app.goo.gl/AbCdEf", "www.ptt.cc/bbs/index.html"]
+MARKERS = {
+    "zh": {"sticker": "[貼圖]", "photo": "[照片]", "video": "[影片]", "file": "[檔案]"},
+    "en": {"sticker": "[Sticker]", "photo": "[Photo]", "video": "[Video]", "file": "[File]"},
+}
+WEEKDAYS = {"zh": "一二三四五六日", "en": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]}
+
+# (kind, weight) for a single message line
+KINDS = [
+    ("text", 70), ("sticker", 10), ("photo", 5), ("video", 1), ("file", 1),
+    ("url", 2), ("emoji", 2), ("text_emoji", 3), ("call", 2), ("missed", 1),
+    ("transfer", 1), ("unsent", 1), ("multiline", 1),
+]
+
+
+def _time_token(minute: int, clock: str) -> str:
+    h, m = divmod(minute, 60)
+    if clock == "24h":
+        return f"{h:02d}:{m:02d}"
+    if clock == "en12":
+        return f"{h % 12 or 12}:{m:02d} {'AM' if h < 12 else 'PM'}"
+    return f"{'上午' if h < 12 else '下午'}{h % 12 or 12:02d}:{m:02d}"
+
+
+def _date_header(day: date, lang: str) -> str:
+    wd = WEEKDAYS[lang][day.weekday()]
+    return f"{day:%Y/%m/%d}（{wd}）" if lang == "zh" else f"{day:%Y/%m/%d}, {wd}"
+
+
+def _header(lang: str, names: list[str]) -> list[str]:
+    if lang == "zh":
+        title = f"與{names[0]}的聊天記錄" if len(names) == 2 else "「好朋友群組」的聊天記錄"
+        return [f"[LINE] {title}", "儲存日期：2025/02/10 14:00", ""]
+    title = f"Chat history with {names[0]}" if len(names) == 2 else "Chat history in Best Friends"
+    return [f"[LINE] {title}", "Saved on: 2025/02/10, 14:00", ""]
+
+
+def _other(rng: random.Random, names: list[str], index: dict[str, int], sender: str) -> str:
+    """A random name other than *sender*, in O(1) even for large groups.
+
+    Draws the same random number as ``rng.choice`` over the other names, so
+    output for a given seed does not depend on how the pick is implemented.
+    """
+    i = rng.randrange(len(names) - 1)
+    return names[i + 1] if i >= index[sender] else names[i]
+
+
+def _message_lines(
+    rng: random.Random, lang: str, t: str, sender: str, names: list[str], index: dict[str, int],
+) -> list[str]:
+    kind = rng.choices([k for k, _ in KINDS], [w for _, w in KINDS])[0]
+    texts = ZH_TEXTS if lang == "zh" else EN_TEXTS
+    if kind in MARKERS[lang]:
+        return [f"{t}\t{sender}\t{MARKERS[lang][kind]}"]
+    if kind == "url":
+        return [f"{t}\t{sender}\t{rng.choice(URLS)}"]
+    if kind == "emoji":
+        return [f"{t}\t{sender}\t" + "".join(rng.choices(EMOJI_TOKENS, k=rng.randint(1, 3)))]
+    if kind == "text_emoji":
+        return [f"{t}\t{sender}\t{rng.choice(texts)}{rng.choice(EMOJI_TOKENS)}"]
+    if kind == "call":
+        m, s = rng.randint(0, 59), rng.randint(0, 59)
+        label = "通話時間" if lang == "zh" else "Duration"
+        return [f"{t}\t{sender}\t☎ {label}{m}:{s:02d}"]
+    if kind == "missed":
+        return [f"{t}\t☎ {'未接來電' if lang == 'zh' else 'Missed call'}"]
+    if kind == "transfer" and lang == "zh":
+        other = _other(rng, names, index, sender)
+        amount = f"{rng.randint(1, 3000):,}"
+        return [f"{t}\t{sender}\t" + rng.choice([
+            f"已將NT$ {amount}轉帳給{other}。",
+            f"您已收到NT$ {amount}。（來自：{other}）",
+            f"收到NT${amount}的轉帳。",
+        ])]
+    if kind == "unsent":
+        return [f"{t}\t{sender}已收回訊息" if lang == "zh" else f"{t}\t{sender} unsent a message."]
+    if kind == "multiline":
+        return [f"{t}\t{sender}\t{rng.choice(texts)}"] + [
+            f"\t{rng.choice(texts)}" for _ in range(rng.randint(1, 3))
+        ]
+    return [f"{t}\t{sender}\t{rng.choice(texts)}"]
+
+
+def iter_export_lines(
+    n_lines: int, lang: str = "zh", persons: int = 2, clock: str | None = None, seed: int = 0,
+) -> Iterator[str]:
+    """Yield exactly *n_lines* lines of a synthetic LINE export."""
+    rng = random.Random(seed)
+    clock = clock or ("zh12" if lang == "zh" else "en12")
+    pool = ZH_NAMES if lang == "zh" else EN_NAMES
+    names = pool[:persons] if persons <= len(pool) else [f"{pool[i % len(pool)]}{i}" for i in range(persons)]
+    index = {name: i for i, name in enumerate(names)}
+    emitted = 0
+
+    def take(lines: list[str]) -> Iterator[str]:
+        nonlocal emitted
+        for line in lines:
+            if emitted == n_lines:
+                return
+            emitted += 1
+            yield line
+
+    yield from take(_header(lang, names))
+    day = date(2019, 1, 1)
+    while emitted < n_lines:
+        day += timedelta(days=1)
+        if rng.random() < 0.05:
+            continue  # quiet day, no header
+        yield from take([_date_header(day, lang)])
+        # Sessions of back-and-forth messages at random times of day
+        minute = 0
+        for start in sorted(rng.randrange(1440) for _ in range(rng.randint(1, 6))):
+            minute = max(minute, start)  # keep timestamps non-decreasing
+            sender = rng.choice(names)
+            for _ in range(rng.randint(2, 40)):
+                if emitted >= n_lines:
+                    return
+                if rng.random() < 0.6:
+                    sender = _other(rng, names, index, sender)
+                yield from take(_message_lines(rng, lang, _time_token(minute, clock), sender, names, index))
+                minute = min(minute + rng.choice((0, 0, 1, 1, 2, 5, 15)), 1439)
+
+
+def generate_export(
+    n_lines: int, lang: str = "zh", persons: int = 2, clock: str | None = None, seed: int = 0,
+) -> str:
+    """The whole synthetic export as one string."""
+    return "\n".join(iter_export_lines(n_lines, lang, persons, clock, seed)) + "\n"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--lines", type=int, default=100_000)
+    ap.add_argument("--lang", choices=["zh", "en"], default="zh")
+    ap.add_argument("--persons", type=int, default=2)
+    ap.add_argument("--clock", choices=["zh12", "en12", "24h"], default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    args = ap.parse_args()
+    if args.persons < 2:
+        ap.error("--persons must be at least 2")
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for line in iter_export_lines(args.lines, args.lang, args.persons, args.clock, args.seed):
+            out.write(line + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
 import pytest
 from httpx import ASGITransport, AsyncClient
 from app.main import app
+from app.routers.analyze import _rate_store
+from app.services import segmenter
+
+
+@pytest.fixture(autouse=True)
+def _empty_token_cache():
+    # Tests that count jieba calls must not see texts cached by earlier tests
+    segmenter.shared_cache.clear()
 
 
 @pytest.fixture
 async def client():
+    # Each test starts with a fresh rate limit window
+    _rate_store.clear()
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as c:
         yield c
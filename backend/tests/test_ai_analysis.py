@@ -1,4 +1,5 @@
-from app.services.ai_analysis import sample_messages, build_prompt, _is_meaningful, _sentiment_intensity
+import pytest
+from app.services.ai_analysis import sample_messages, build_prompt, _format_stats_block, _is_meaningful, _sentiment_intensity
 from app.services.parser import Message
 from datetime import datetime
 
@@ -50,6 +51,14 @@ def test_is_meaningful():
     assert _is_meaningful("我好想你喔")
 
 
+def test_is_meaningful_reads_given_words(monkeypatch):
+    from app.services import segmenter
+
+    monkeypatch.setattr(segmenter, "cut", lambda text: pytest.fail("segmented again"))
+    assert _is_meaningful("OK 拉麵", ["OK", " ", "拉麵"])
+    assert not _is_meaningful("OK 喔", ["OK", " ", "喔"])
+
+
 def test_build_prompt_contains_messages():
     msgs = _make_messages()[:5]
     prompt = build_prompt(msgs, ["小美", "阿明"])
@@ -90,3 +99,22 @@ def test_sample_prioritizes_emotional_messages():
     # At least one of the emotional messages should be kept
     emotional = {"我真的好討厭這件事情", "超級開心今天收到禮物"}
     assert len(contents & emotional) >= 1
+
+
+def test_build_prompt_group_members_not_attributed_to_second_person():
+    base = datetime(2024, 1, 15, 10, 0)
+    msgs = [
+        Message(timestamp=base.replace(minute=i), sender=s, content=c, msg_type="text")
+        for i, (s, c) in enumerate([("小美", "要不要去看電影"), ("阿明", "好啊我想看"), ("小華", "我也要一起去")])
+    ]
+    prompt = build_prompt(msgs, ["小美", "阿明", "小華"])
+    assert prompt.count("我也要一起去") == 1
+
+
+def test_stats_block_caps_persons():
+    counts = {f"成員{i}": 100 - i for i in range(50)}
+    stats = {"basicStats": {"messageCount": {**counts, "total": sum(counts.values())}},
+             "replyBehavior": {"leftOnRead": {p: 1 for p in counts}}}
+    block = _format_stats_block(stats)
+    assert "成員0：" in block and "成員9：" in block
+    assert "成員10" not in block
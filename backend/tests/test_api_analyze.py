@@ -1,6 +1,9 @@
 from pathlib import Path
 
+import pytest
+
 FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat.txt"
+COLDWAR_FIXTURE = FIXTURE.with_name("sample_chat_coldwar.txt")
 
 
 async def test_analyze_returns_200(client):
@@ -26,6 +29,28 @@ async def test_analyze_returns_all_sections(client):
     assert "persons" in data
 
 
+async def test_analyze_work_runs_off_the_event_loop(client, monkeypatch):
+    import threading
+
+    from app.routers import analyze
+
+    threads = []
+
+    def run_analyzers(*args):
+        threads.append(threading.current_thread())
+        return real_run_analyzers(*args)
+
+    real_run_analyzers = analyze.run_analyzers
+    monkeypatch.setattr(analyze, "run_analyzers", run_analyzers)
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 200
+    assert threads and threading.main_thread() not in threads
+
+
 async def test_analyze_invalid_file_returns_400(client):
     resp = await client.post(
         "/api/analyze",
@@ -35,6 +60,26 @@ async def test_analyze_invalid_file_returns_400(client):
     assert resp.status_code == 400
 
 
+@pytest.mark.parametrize("content", [b"", b"  \n\t\r\n  "])
+async def test_analyze_empty_file_returns_no_messages(client, content):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", content, "text/plain")},
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "No messages found in file"
+
+
+async def test_analyze_invalid_encoding_returns_400(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", b"\xff\xfe\x00bad", "text/plain")},
+    )
+    assert resp.status_code == 400
+
+
 async def test_analyze_oversized_file_returns_413(client):
     big = b"x" * (21 * 1024 * 1024)
     resp = await client.post(
@@ -43,3 +88,169 @@ async def test_analyze_oversized_file_returns_413(client):
         files={"file": ("chat.txt", big, "text/plain")},
     )
     assert resp.status_code == 413
+
+
+async def test_analyze_cusum_engine_returns_regime_shifts(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true", "cold_war_engine": "cusum"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 200
+    assert "regimeShifts" in resp.json()
+
+
+async def test_analyze_cold_war_sweep_is_opt_in(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", COLDWAR_FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert "coldWarSweep" not in resp.json()
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true", "cold_war_sweep": "true"},
+        files={"file": ("chat.txt", COLDWAR_FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert len(resp.json()["coldWarSweep"]) == 75
+
+
+async def test_analyze_unknown_cold_war_engine_returns_400(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true", "cold_war_engine": "nope"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 400
+
+
+async def test_cube_query_slices_the_analysis(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    data = resp.json()
+    cube_id = data["cubeId"]
+
+    resp = await client.get(f"/api/cube/{cube_id}", params={"by": ["weekday", "hour"]})
+    assert resp.status_code == 200
+    heatmap = data["timePatterns"]["heatmap"]
+    assert {(r["weekday"], r["hour"]): r["messages"] for r in resp.json()["rows"]} == {
+        (d, h): n for d, row in enumerate(heatmap) for h, n in enumerate(row) if n
+    }
+
+    resp = await client.get(f"/api/cube/{cube_id}", params={"measure": "calls"})
+    assert resp.json()["rows"] == [{"calls": data["basicStats"]["callStats"]["totalCalls"]}]
+
+
+async def test_cube_query_errors(client):
+    resp = await client.get("/api/cube/missing")
+    assert resp.status_code == 404
+
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    resp = await client.get(f"/api/cube/{resp.json()['cubeId']}", params={"measure": "words"})
+    assert resp.status_code == 400
+
+
+async def test_analyze_date_window(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true", "start": "2024-01-16", "end": "2024-01-16"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 200
+    date_range = resp.json()["basicStats"]["dateRange"]
+    assert (date_range["start"], date_range["end"]) == ("2024-01-16", "2024-01-16")
+
+
+async def test_analyze_bad_or_empty_date_window_returns_400(client):
+    for dates in ({"start": "2024-02-30"}, {"start": "2024-02-02", "end": "2024-02-01"}, {"end": "2020-01-01"}):
+        resp = await client.post(
+            "/api/analyze",
+            data={"skip_ai": "true", **dates},
+            files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+        )
+        assert resp.status_code == 400
+
+
+async def test_compare_two_periods(client):
+    resp = await client.post(
+        "/api/compare",
+        data={"first_end": "2024-01-15", "second_start": "2024-01-16"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [p["basicStats"]["dateRange"]["start"] for p in data["periods"]] == ["2024-01-15", "2024-01-16"]
+    assert "messageCount" in data["delta"]["basicStats"]
+
+    resp = await client.post(
+        "/api/compare",
+        data={"first_end": "2020-01-01"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 400
+
+
+async def test_analyze_downsamples_trend(client):
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true", "trend_points": "3"},
+        files={"file": ("chat.txt", COLDWAR_FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 200
+    trend = resp.json()["timePatterns"]["trend"]
+    assert len(trend["day"]["periods"]) == 3
+    assert all(len(counts) == 3 for counts in trend["day"]["counts"].values())
+
+    resp = await client.post(
+        "/api/analyze",
+        data={"skip_ai": "true", "trend_points": "2"},
+        files={"file": ("chat.txt", COLDWAR_FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 400
+
+
+def _sse_events(body: str) -> list[dict]:
+    import json
+
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+
+async def test_analyze_stream_reports_parsing_first(client):
+    resp = await client.post(
+        "/api/analyze-stream",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", FIXTURE.read_bytes(), "text/plain")},
+    )
+    assert resp.status_code == 200
+    events = _sse_events(resp.text)
+    assert events[0] == {"progress": 5, "stage": "解析對話記錄中..."}
+    assert "basicStats" in events[-1]["result"]
+
+
+async def test_analyze_stream_parse_errors_are_events(client):
+    resp = await client.post(
+        "/api/analyze-stream",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", b"\xff\xfe\x00bad", "text/plain")},
+    )
+    assert resp.status_code == 200
+    events = _sse_events(resp.text)
+    assert events[0]["progress"] == 5
+    assert events[-1] == {"error": "Invalid file encoding"}
+
+
+@pytest.mark.parametrize("content", [b"", b"  \n\t\r\n  "])
+async def test_analyze_stream_empty_file_reports_no_messages(client, content):
+    resp = await client.post(
+        "/api/analyze-stream",
+        data={"skip_ai": "true"},
+        files={"file": ("chat.txt", content, "text/plain")},
+    )
+    assert _sse_events(resp.text)[-1] == {"error": "找不到任何訊息"}
@@ -0,0 +1,81 @@
+import json
+import random
+from datetime import date
+
+import pytest
+
+from app.services.change_point import CusumDetector, detect_regime_shifts
+from app.services.engine import SECTIONS, run_analyzers, sections_for
+from app.services.message_table import MessageTable
+
+FIRST_DAY = 738000
+
+
+def _daily_counts(n_days: int, seed: int, drop: tuple[int, int] | None = None) -> list[int]:
+    rng = random.Random(seed)
+    counts = [rng.randint(30, 60) for _ in range(n_days)]
+    if drop:
+        for i in range(*drop):
+            counts[i] = rng.randint(2, 6)
+    return counts
+
+
+def _parsed(counts: list[int]) -> dict:
+    table = MessageTable()
+    for i, count in enumerate(counts):
+        for k in range(count):
+            table.append((FIRST_DAY + i) * 86400 + 9 * 3600 + k * 60, ["小美", "阿明"][k % 2], "text", "嗨")
+    return {"messages": table, "persons": ["小美", "阿明"], "calls": [], "transfers": []}
+
+
+def test_planted_drop_is_cooling_then_warming():
+    shifts = detect_regime_shifts(_parsed(_daily_counts(200, seed=1, drop=(100, 130))))
+    assert [s["direction"] for s in shifts] == ["cooling", "warming"]
+    cooling = shifts[0]
+    drop_start = str(date.fromordinal(FIRST_DAY + 100))
+    assert cooling["startDate"] == drop_start
+    assert drop_start <= cooling["detectedDate"] <= str(date.fromordinal(FIRST_DAY + 105))
+    assert cooling["confidence"] > 0.99
+    assert cooling["changePercent"] < -70
+
+
+def test_stationary_series_has_no_shifts():
+    detector = CusumDetector()
+    for count in _daily_counts(1000, seed=2):
+        detector.update(count)
+    assert detector.shifts == []
+
+
+def test_silent_days_are_fed_as_zeros():
+    counts = _daily_counts(120, seed=3)
+    counts[60:80] = [0] * 20
+    shifts = detect_regime_shifts(_parsed(counts))
+    assert shifts[0]["direction"] == "cooling"
+    assert shifts[0]["avgAfter"] < shifts[0]["avgBefore"]
+
+
+def test_empty_input():
+    assert detect_regime_shifts(_parsed([])) == []
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 37, 500])
+def test_chunked_merge_matches_single_scan(chunk_rows):
+    parsed = _parsed(_daily_counts(150, seed=4, drop=(70, 90)))
+    sections = {"regimeShifts": sections_for("cusum")["regimeShifts"]}
+    expected = run_analyzers(parsed, sections)
+    assert expected["regimeShifts"]
+    assert json.dumps(run_analyzers(parsed, sections, chunk_rows=chunk_rows)) == json.dumps(expected)
+
+
+def test_cusum_engine_replaces_cold_wars():
+    parsed = _parsed(_daily_counts(200, seed=1, drop=(100, 130)))
+    result = run_analyzers(parsed, sections_for("cusum"))
+    assert result["coldWars"][0]["startDate"] == result["regimeShifts"][0]["startDate"]
+    assert result["coldWars"][0]["messageDrop"] > 70
+    assert "regimeShifts" not in run_analyzers(parsed, sections_for("rolling"))
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        sections_for("bocpd")
+    assert set(SECTIONS) <= set(sections_for("cusum"))
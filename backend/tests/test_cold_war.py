@@ -1,6 +1,6 @@
 from pathlib import Path
 from app.services.parser import parse_line_chat
-from app.services.cold_war import detect_cold_wars
+from app.services.cold_war import detect_cold_wars, sweep_cold_wars
 
 FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat_coldwar.txt"
 
@@ -46,3 +46,22 @@ def test_cold_war_fewer_than_5_days_returns_empty():
 def test_cold_war_empty_messages():
     result = detect_cold_wars({"messages": [], "persons": [], "calls": []})
     assert result == []
+
+
+def test_sweep_matches_individual_runs():
+    parsed = _parsed()
+    sweep = sweep_cold_wars(parsed, drop_thresholds=(0.5, 0.65), min_days=(2, 7), baseline_windows=(7, 30))
+    assert len(sweep) == 8
+    for entry in sweep:
+        assert entry["events"] == detect_cold_wars(
+            parsed,
+            drop_threshold=entry["dropThreshold"],
+            min_days=entry["minDays"],
+            baseline_window=entry["baselineWindow"],
+        )
+    assert any(entry["events"] for entry in sweep)
+
+
+def test_sweep_empty_messages():
+    sweep = sweep_cold_wars({"messages": [], "persons": [], "calls": []})
+    assert sweep and all(entry["events"] == [] for entry in sweep)
@@ -0,0 +1,80 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.services import segmenter
+from app.services.compare import COMPARE_SECTIONS, compare_periods
+from app.services.date_range import select_dates
+from app.services.engine import SECTIONS, VECTOR_SECTIONS, run_analyzers
+from app.services.parser import parse_line_chat
+from app.services.text_analysis import compute_text_analysis
+
+FIXTURES = Path(__file__).parent / "fixtures"
+FIRST = (None, date(2024, 2, 25))
+SECOND = (date(2024, 2, 20), None)
+
+
+def _parsed(name: str = "sample_chat_coldwar.txt") -> dict:
+    return parse_line_chat((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("sections", [SECTIONS, VECTOR_SECTIONS])
+def test_periods_match_separate_analyses(sections):
+    if sections is VECTOR_SECTIONS:
+        pytest.importorskip("numpy")
+    parsed = _parsed()
+    result = compare_periods(parsed, FIRST, SECOND, sections)
+    for period, (start, end) in zip(result["periods"], (FIRST, SECOND)):
+        window = select_dates(parsed, start, end)
+        expected = run_analyzers(window, {name: sections[name] for name in COMPARE_SECTIONS})
+        assert {name: period[name] for name in COMPARE_SECTIONS} == expected
+        assert period["textAnalysis"]["wordCloud"] == compute_text_analysis(window)[0]["wordCloud"]
+    assert (result["periods"][1]["start"], result["periods"][1]["end"]) == ("2024-02-20", None)
+
+
+def test_shared_types_and_persons():
+    """Both periods report every type and person present in either."""
+    result = compare_periods(_parsed("sample_chat.txt"), (None, date(2024, 1, 15)), (date(2024, 1, 16), None))
+    first, second = (period["basicStats"] for period in result["periods"])
+    assert first["typeBreakdown"].keys() == second["typeBreakdown"].keys()
+    assert second["typeBreakdown"]["sticker"] == 0
+    assert result["delta"]["basicStats"]["typeBreakdown"]["transfer"] == 2
+
+
+def test_delta_is_second_minus_first():
+    result = compare_periods(_parsed(), FIRST, SECOND)
+    first, second = result["periods"]
+    delta = result["delta"]
+    for person in result["persons"] + ["total"]:
+        assert delta["basicStats"]["messageCount"][person] == (
+            second["basicStats"]["messageCount"][person] - first["basicStats"]["messageCount"][person]
+        )
+    heatmap = [[b - a for a, b in zip(r1, r2)] for r1, r2 in zip(
+        first["timePatterns"]["heatmap"], second["timePatterns"]["heatmap"],
+    )]
+    assert delta["timePatterns"]["heatmap"] == heatmap
+    assert "dateRange" in delta["basicStats"] and "start" not in delta["basicStats"]["dateRange"]
+    for person, words in delta["textAnalysis"]["wordCloud"].items():
+        before = {e["word"] for e in first["textAnalysis"]["wordCloud"][person]}
+        assert not set(words["gained"]) & before
+        assert set(words["lost"]) <= before
+
+
+def test_empty_period_rejected():
+    with pytest.raises(ValueError):
+        compare_periods(_parsed(), FIRST, (date(2030, 1, 1), None))
+
+
+def test_token_cache_segments_each_text_once(monkeypatch):
+    parsed = _parsed()
+    cache: dict[str, list[str]] = {}
+    expected, _ = compute_text_analysis(parsed)
+    assert compute_text_analysis(parsed, cache)[0] == expected
+    assert cache
+
+    def fail(text):
+        raise AssertionError(f"segmented again: {text}")
+
+    monkeypatch.setattr(segmenter.jieba, "lcut", fail)
+    assert compute_text_analysis(parsed, cache)[0] == expected
@@ -0,0 +1,160 @@
+from collections import Counter
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.services.count_cube import CallCube, CountCube, build_cubes, query_cube
+from app.services.engine import SECTIONS, _build
+from app.services.message_table import SECONDS_PER_DAY, MessageTable, scan
+from app.services.parser import parse_line_chat
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _parsed(name: str = "sample_chat_coldwar.txt") -> dict:
+    return parse_line_chat((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+def _cube(table: MessageTable, factory=CountCube, **scan_args) -> CountCube:
+    cube = factory(table)
+    scan(table, [cube], **scan_args)
+    return cube.finalize()
+
+
+def _rows(table: MessageTable) -> list[tuple]:
+    """(day, weekday, hour, sender, type) per message."""
+    return [
+        (ts // SECONDS_PER_DAY, (ts // SECONDS_PER_DAY - 1) % 7, ts % SECONDS_PER_DAY // 3600, s, t)
+        for ts, s, t in zip(table.timestamps, table.senders, table.types)
+    ]
+
+
+def test_cells_and_rollups_match_rows():
+    table = _parsed()["messages"]
+    cube = _cube(table, block_rows=7)
+    rows = _rows(table)
+    assert cube.totals(("day", "hour", "sender", "type")) == Counter(
+        (day, hour, s, t) for day, _, hour, s, t in rows
+    )
+    assert cube.totals(("weekday", "hour", "sender")) == Counter((w, hour, s) for _, w, hour, s, _ in rows)
+    assert cube.totals(("day", "sender")) == Counter((day, s) for day, _, _, s, _ in rows)
+    assert cube.totals() == {(): len(table)}
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 13, 100])
+def test_merged_chunks_match_single_scan(chunk_rows):
+    table = _parsed()["messages"]
+    expected = _cube(table)
+    merged = CountCube(table)
+    for start in range(0, len(table), chunk_rows):
+        part = CountCube(table)
+        scan(table, [part], start=start, stop=start + chunk_rows)
+        merged.merge(part)
+    merged.finalize()
+    assert dict(zip(merged.cell_keys, merged.cell_counts)) == dict(zip(expected.cell_keys, expected.cell_counts))
+    assert merged.weekday_hour == expected.weekday_hour
+
+
+def test_vectorized_cube_is_identical():
+    pytest.importorskip("numpy")
+    from app.services.vectorized import VecCountCube
+
+    table = _parsed("sample_chat.txt")["messages"]
+    expected = _cube(table)
+    vec = _cube(table, VecCountCube, block_rows=4)
+    assert dict(zip(vec.cell_keys, vec.cell_counts)) == dict(zip(expected.cell_keys, expected.cell_counts))
+    assert dict(zip(vec.day_keys, vec.day_counts)) == dict(zip(expected.day_keys, expected.day_counts))
+    assert vec.weekday_hour == expected.weekday_hour
+
+
+@pytest.mark.parametrize("group_by, where, days", [
+    ((), {}, None),
+    (("weekday", "hour"), {"sender": {0}}, None),
+    (("month", "type"), {}, None),
+    (("day",), {"weekday": {5, 6}}, None),
+    (("sender",), {}, (738930, 738950)),
+    (("day", "hour"), {"type": {0, 1}}, (738930, 738950)),
+    (("hour",), {"sender": {99}}, None),
+])
+def test_vectorized_slices_are_identical(group_by, where, days):
+    pytest.importorskip("numpy")
+    from app.services.vectorized import VecCountCube
+
+    table = _parsed()["messages"]
+    expected = _cube(table).totals(group_by, where, days)
+    vec = _cube(table, VecCountCube)
+    assert vec.totals(group_by, where, days) == expected
+    assert vec.totals(group_by, where, days) == expected  # from the decoded columns
+
+
+def test_empty_table():
+    cube = _cube(MessageTable())
+    assert cube.totals() == {}
+    assert cube.totals(("day", "hour")) == {}
+
+
+def test_call_cube_matches_calls():
+    calls = _parsed("sample_chat.txt")["calls"]
+    cube = CallCube(calls)
+    assert cube.totals("calls") == {(): 3}
+    assert cube.totals("completedCalls") == {(): 2}
+    assert cube.totals("callSeconds") == {(): 332 + 5025}
+    assert cube.totals("longestCallSeconds") == {(): 5025}
+    by_caller = cube.totals("calls", ("sender",))
+    assert {cube.callers[code]: n for (code,), n in by_caller.items()} == {"小美": 1, "阿明": 2}
+    with pytest.raises(ValueError):
+        cube.totals("calls", ("type",))
+
+
+def test_query_labels_and_filters():
+    parsed = _parsed()
+    cubes = build_cubes(parsed)
+    rows = _rows(parsed["messages"])
+    first_day = min(day for day, *_ in rows)
+    weekend = query_cube(cubes, group_by=["day"], where={"weekday": [5, 6], "sender": ["小美"]})
+    code = parsed["messages"].sender_code("小美")
+    expected = Counter(day for day, w, _, s, _ in rows if w >= 5 and s == code)
+    assert [(r["day"], r["messages"]) for r in weekend] == [
+        (str(date.fromordinal(day)), n) for day, n in sorted(expected.items())
+    ]
+    months = query_cube(cubes, group_by=["month"])
+    assert sum(r["messages"] for r in months) == len(rows)
+    assert all(len(r["month"]) == 7 for r in months)
+    start = str(date.fromordinal(first_day + 10))
+    assert query_cube(cubes, where={"start": start}) == [
+        {"messages": sum(day >= first_day + 10 for day, *_ in rows)}
+    ]
+    assert query_cube(cubes, where={"sender": ["nobody"]}) == [{"messages": 0}]
+
+
+def test_query_calls_by_hour():
+    cubes = build_cubes(_parsed("sample_chat.txt"))
+    rows = query_cube(cubes, "calls", ["sender"])
+    assert rows == [{"sender": "小美", "calls": 1}, {"sender": "阿明", "calls": 2}]
+    assert sum(r["callSeconds"] for r in query_cube(cubes, "callSeconds", ["hour"])) == 332 + 5025
+
+
+@pytest.mark.parametrize("args", [
+    {"measure": "words"},
+    {"group_by": ["year"]},
+    {"where": {"minute": [1]}},
+    {"where": {"start": "yesterday"}},
+    {"measure": "calls", "group_by": ["type"]},
+])
+def test_query_rejects_unknown_arguments(args):
+    cubes = build_cubes(_parsed("sample_chat.txt"))
+    with pytest.raises(ValueError):
+        query_cube(cubes, **args)
+
+
+def test_engine_shares_one_cube():
+    parsed = _parsed()
+    accumulators = _build(parsed["messages"], parsed, SECTIONS)
+    time_patterns = accumulators["timePatterns"]
+    cubes = {
+        id(accumulators["basicStats"].count_cube),
+        id(time_patterns.heatmap.count_cube),
+        id(time_patterns.trend.count_cube),
+    }
+    assert cubes == {id(accumulators["_count_cube"])}
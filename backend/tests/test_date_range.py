@@ -0,0 +1,84 @@
+import re
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.services.date_range import parse_date_range, row_range, select_dates
+from app.services.engine import SECTIONS, run_analyzers
+from app.services.message_table import MessageTable
+from app.services.parser import ChatStreamParser, collect_records, parse_line_chat, sniff_format
+
+FIXTURES = Path(__file__).parent / "fixtures"
+DATE_HEADER = re.compile(r"^(\d{4})/(\d{2})/(\d{2})（", re.M)
+
+
+def _trimmed(text: str, start: date | None, end: date | None) -> str:
+    """The export with only the day blocks from *start* to *end*."""
+    headers = list(DATE_HEADER.finditer(text))
+    parts = [text[:headers[0].start()]]
+    for header, following in zip(headers, headers[1:] + [None]):
+        day = date(*map(int, header.groups()))
+        if (start is None or day >= start) and (end is None or day <= end):
+            parts.append(text[header.start():following.start() if following else len(text)])
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("name, start, end", [
+    ("sample_chat.txt", date(2024, 1, 16), None),
+    ("sample_chat.txt", None, date(2024, 1, 15)),
+    ("sample_chat_coldwar.txt", date(2024, 2, 19), date(2024, 3, 18)),
+    ("sample_chat_coldwar.txt", date(2024, 2, 11), date(2024, 2, 11)),
+])
+def test_window_matches_trimmed_export(name, start, end):
+    text = (FIXTURES / name).read_text(encoding="utf-8")
+    window = select_dates(parse_line_chat(text), start, end)
+    expected = parse_line_chat(_trimmed(text, start, end))
+    assert window == expected
+    assert run_analyzers(window, SECTIONS) == run_analyzers(expected, SECTIONS)
+
+
+@pytest.mark.parametrize("start", [None, date(2024, 2, 12)])
+def test_parser_skips_before_since_and_stops_after_until(start):
+    text = (FIXTURES / "sample_chat_coldwar.txt").read_text(encoding="utf-8")
+    end = date(2024, 2, 19)
+    table = MessageTable()
+    # A known format skips sniffing, which would buffer this whole small file
+    parser = ChatStreamParser(
+        table, sniff_format(text), since=start.toordinal() if start else None, until=end.toordinal(),
+    )
+    data = text.encode("utf-8")
+    records, fed = [], 0
+    while not parser.done and fed < len(data):
+        records.extend(parser.feed(data[fed:fed + 1024]))
+        fed += 1024
+    records.extend(parser.close())
+    assert fed < len(data)
+    assert collect_records(records, parser.persons, table) == parse_line_chat(_trimmed(text, start, end))
+
+
+def test_row_range_bisects_day_bounds():
+    table = parse_line_chat((FIXTURES / "sample_chat.txt").read_text(encoding="utf-8"))["messages"]
+    lo, hi = row_range(table, date(2024, 1, 16), date(2024, 1, 16))
+    days = [ts // 86400 for ts in table.timestamps]
+    assert days[lo:hi] == [date(2024, 1, 16).toordinal()] * (hi - lo)
+    assert hi - lo == days.count(date(2024, 1, 16).toordinal())
+    assert row_range(table, date(2030, 1, 1), None) == (len(table), len(table))
+
+
+def test_empty_window_keeps_no_persons():
+    parsed = parse_line_chat((FIXTURES / "sample_chat.txt").read_text(encoding="utf-8"))
+    window = select_dates(parsed, date(2023, 1, 1), date(2023, 12, 31))
+    assert len(window["messages"]) == 0
+    assert window["persons"] == window["calls"] == window["transfers"] == []
+
+
+@pytest.mark.parametrize("start, end", [("2024-13-01", None), ("yesterday", None), ("2024-02-02", "2024-02-01")])
+def test_parse_date_range_rejects(start, end):
+    with pytest.raises(ValueError):
+        parse_date_range(start, end)
+
+
+def test_parse_date_range_open_sides():
+    assert parse_date_range(None, "2024-02-01") == (None, date(2024, 2, 1))
+    assert parse_date_range("", None) == (None, None)
@@ -0,0 +1,78 @@
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from app.services.day_index import DayIndex
+from app.services.engine import SECTIONS, _build
+from app.services.message_table import SECONDS_PER_DAY, MessageTable, scan
+from app.services.parser import parse_line_chat
+
+FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat_coldwar.txt"
+
+
+def _table() -> MessageTable:
+    return parse_line_chat(FIXTURE.read_text(encoding="utf-8"))["messages"]
+
+
+def _index(table: MessageTable, factory=DayIndex, **scan_args) -> DayIndex:
+    index = factory(table)
+    scan(table, [index], **scan_args)
+    return index
+
+
+def test_counts_match_rows():
+    table = _table()
+    index = _index(table, block_rows=50)
+    days = [ts // SECONDS_PER_DAY for ts in table.timestamps]
+    assert index.totals == Counter(days)
+    assert index.days() == sorted(set(days))
+    assert (index.first_day, index.last_day) == (min(days), max(days))
+    for day in index.days():
+        start, stop = index.rows[day]
+        assert set(days[start:stop]) == {day}
+        assert index.totals[day] == stop - start
+    assert len(index.dense_totals()) == index.last_day - index.first_day + 1
+
+
+def test_rows_out_of_day_order():
+    table = MessageTable()
+    for day in (10, 10, 12, 10, 11):
+        table.append(day * SECONDS_PER_DAY, "小美", "text", "嗨")
+    index = _index(table)
+    assert index.totals == {10: 3, 12: 1, 11: 1}
+    assert index.rows[10] == [0, 4]
+    assert index.days() == [10, 11, 12]
+    assert (index.first_day, index.last_day) == (10, 12)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 13, 100])
+def test_merged_chunks_match_single_scan(chunk_rows):
+    table = _table()
+    expected = _index(table)
+    merged = DayIndex(table)
+    for start in range(0, len(table), chunk_rows):
+        merged.merge(_index(table, start=start, stop=start + chunk_rows))
+    assert merged.totals == expected.totals
+    assert merged.rows == expected.rows
+    assert (merged.first_day, merged.last_day) == (expected.first_day, expected.last_day)
+
+
+def test_vectorized_index_is_identical():
+    pytest.importorskip("numpy")
+    from app.services.vectorized import VecDayIndex
+
+    table = _table()
+    expected = _index(table, block_rows=50)
+    vec = _index(table, VecDayIndex, block_rows=50)
+    assert vec.totals == expected.totals
+    assert vec.rows == expected.rows
+
+
+def test_engine_shares_one_index():
+    parsed = parse_line_chat(FIXTURE.read_text(encoding="utf-8"))
+    accumulators = _build(parsed["messages"], parsed, SECTIONS)
+    indexes = {id(acc.day_index) for acc in accumulators.values() if hasattr(acc, "day_index")}
+    indexes.add(id(accumulators["timePatterns"].goodnight.day_index))
+    assert len(indexes) == 1
+    assert accumulators["coldWars"].owned_indexes == []
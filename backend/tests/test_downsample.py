@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from app.services.downsample import downsample_trend, lttb_indices
+
+
+def test_keeps_ends_and_peaks():
+    rng = random.Random(7)
+    ys = [rng.randint(5, 10) for _ in range(500)]
+    ys[123], ys[321] = 200, -150
+    kept = lttb_indices(list(range(500)), ys, 40)
+    assert len(kept) == 40
+    assert kept == sorted(set(kept))
+    assert kept[0] == 0 and kept[-1] == 499
+    assert {123, 321} <= set(kept)
+
+
+def test_short_series_unchanged():
+    assert lttb_indices([1, 2, 3], [4, 5, 6], 10) == [0, 1, 2]
+    with pytest.raises(ValueError):
+        lttb_indices(list(range(10)), list(range(10)), 2)
+
+
+def test_trend_columns_stay_aligned():
+    periods = [f"2024-{m:02d}-{d:02d}" for m in (1, 2, 3) for d in range(1, 29)]
+    trend = {
+        "day": {"periods": periods, "counts": {"a": list(range(84)), "b": [0] * 40 + [90] + [0] * 43}},
+        "month": {"periods": ["2024-01", "2024-02", "2024-03"], "counts": {"a": [1, 2, 3], "b": [0, 0, 0]}},
+    }
+    result = downsample_trend(trend, 10)
+    day = result["day"]
+    assert len(day["periods"]) == 10
+    assert "2024-02-13" in day["periods"]  # the spike in b
+    index = {p: i for i, p in enumerate(periods)}
+    for person, counts in day["counts"].items():
+        assert counts == [trend["day"]["counts"][person][index[p]] for p in day["periods"]]
+    assert result["month"] == trend["month"]
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.cold_war import detect_cold_wars, sweep_cold_wars
+from app.services.engine import SECTIONS, run_analyzers, sections_for
+from app.services.first_conversation import extract_first_conversation
+from app.services.message_table import scan
+from app.services.parser import parse_line_chat
+from app.services.reply_analysis import compute_reply_behavior
+from app.services.sessions import compute_sessions
+from app.services.stats import compute_basic_stats
+from app.services.time_patterns import compute_time_patterns
+from app.services.transfer_analysis import compute_transfer_analysis
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _parsed(name: str) -> dict:
+    return parse_line_chat((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("name", ["sample_chat.txt", "sample_chat_coldwar.txt"])
+def test_engine_matches_individual_analyzers(name):
+    parsed = _parsed(name)
+    assert run_analyzers(parsed) == {
+        "basicStats": compute_basic_stats(parsed),
+        "replyBehavior": compute_reply_behavior(parsed),
+        "timePatterns": compute_time_patterns(parsed),
+        "coldWars": detect_cold_wars(parsed),
+        "transferAnalysis": compute_transfer_analysis(parsed),
+        "firstConversation": extract_first_conversation(parsed),
+        "sessions": compute_sessions(parsed),
+    }
+
+
+def test_cold_war_sweep_is_opt_in():
+    parsed = _parsed("sample_chat_coldwar.txt")
+    assert "coldWarSweep" not in sections_for()
+    result = run_analyzers(parsed, sections_for(cold_war_sweep=True))
+    assert result["coldWarSweep"] == sweep_cold_wars(parsed)
+    assert "regimeShifts" in sections_for("cusum", cold_war_sweep=True)
+
+
+@pytest.mark.parametrize("block_rows", [1, 2, 7])
+def test_results_do_not_depend_on_block_size(block_rows):
+    parsed = _parsed("sample_chat_coldwar.txt")
+    expected = run_analyzers(parsed)
+    table = parsed["messages"]
+    accumulators = {name: factory(table, parsed) for name, factory in SECTIONS.items()}
+    scan(table, accumulators.values(), block_rows=block_rows)
+    assert {name: acc.finalize() for name, acc in accumulators.items()} == expected
+
+
+def test_engine_accepts_custom_sections():
+    class CountAccumulator:
+        def __init__(self, table, parsed):
+            self.n = 0
+
+        def add(self, block):
+            self.n += len(block.timestamps)
+
+        def finalize(self):
+            return self.n
+
+    parsed = _parsed("sample_chat.txt")
+    result = run_analyzers(parsed, {"count": CountAccumulator})
+    assert result == {"count": len(parsed["messages"])}
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 5, 13])
+@pytest.mark.parametrize("name", ["sample_chat.txt", "sample_chat_coldwar.txt"])
+def test_chunked_states_merge_to_single_scan_result(name, chunk_rows):
+    parsed = _parsed(name)
+    assert run_analyzers(parsed, SECTIONS, chunk_rows=chunk_rows) == run_analyzers(parsed, SECTIONS)
+
+
+@pytest.mark.parametrize("name", ["sample_chat.txt", "sample_chat_coldwar.txt"])
+def test_recall_lines_do_not_change_results(name):
+    # Recall lines are system lines, not messages: the results must equal
+    # those of the same export without them, including between a message
+    # and its continuation line
+    lines = (FIXTURES / name).read_text(encoding="utf-8").split("\n")
+    with_recalls = []
+    for i, line in enumerate(lines):
+        with_recalls.append(line)
+        parts = line.split("\t")
+        if len(parts) == 3 and parts[1] and i % 3 == 0:
+            who = parts[1] if i % 2 else "您"
+            with_recalls.append(f"{parts[0]}\t{who}已收回訊息")
+            with_recalls.append(f"{parts[0]}\t{who} unsent a message.")
+    parsed = parse_line_chat("\n".join(with_recalls))
+    expected = _parsed(name)
+    assert parsed["persons"] == expected["persons"]
+    assert run_analyzers(parsed) == run_analyzers(expected)
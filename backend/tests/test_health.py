@@ -1,4 +1,19 @@
+import threading
+
+
 async def test_health(client):
     resp = await client.get("/api/health")
     assert resp.status_code == 200
     assert resp.json() == {"status": "ok"}
+
+
+async def test_ready_after_warm_up(client, monkeypatch):
+    from app.services import segmenter
+
+    monkeypatch.setattr(segmenter, "_ready", threading.Event())
+    resp = await client.get("/api/ready")
+    assert resp.status_code == 503
+    segmenter.warm_up(workers=1)
+    resp = await client.get("/api/ready")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ready"}
@@ -0,0 +1,80 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.services.message_table import MessageTable, as_table, scan, scan_ranges
+from app.services.parser import Message, parse_line_chat
+
+FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat.txt"
+
+
+def _messages():
+    return [
+        Message(timestamp=datetime(2024, 1, 15, 9, 15), sender="小美", content="早安～", msg_type="text"),
+        Message(timestamp=datetime(2024, 1, 15, 9, 16, 30), sender="阿明", content="[貼圖]", msg_type="sticker"),
+        Message(timestamp=datetime(2024, 1, 16, 23, 59), sender="小美", content="對呀！\n走走😊", msg_type="text"),
+    ]
+
+
+def test_round_trip_from_messages():
+    msgs = _messages()
+    table = MessageTable.from_messages(msgs)
+    assert len(table) == 3
+    assert list(table) == msgs
+    assert table[-1] == msgs[-1]
+    assert table[1:] == msgs[1:]
+
+
+def test_columns_use_small_codes():
+    table = MessageTable.from_messages(_messages())
+    assert table.sender_names == ["小美", "阿明"]
+    assert list(table.senders) == [0, 1, 0]
+    assert table.type_names == ["text", "sticker"]
+    assert list(table.types) == [0, 1, 0]
+    assert list(table.char_counts) == [3, 4, 7]
+    assert table.timestamps[0] // 86400 == datetime(2024, 1, 15).toordinal()
+
+
+def test_content_handles_multibyte():
+    table = MessageTable.from_messages(_messages())
+    assert table.content(2) == "對呀！\n走走😊"
+
+
+def test_parser_builds_table():
+    parsed = parse_line_chat(FIXTURE.read_text(encoding="utf-8"))
+    assert isinstance(parsed["messages"], MessageTable)
+    assert as_table(parsed) is parsed["messages"]
+
+
+def test_as_table_converts_lists():
+    table = as_table({"messages": _messages()})
+    assert isinstance(table, MessageTable)
+    assert table == _messages()
+
+
+class _Rows:
+    """Records the rows and previous-row links an accumulator is shown."""
+
+    def __init__(self):
+        self.rows = []
+        self.links = []
+
+    def add(self, block):
+        self.rows.extend(range(block.start, block.start + len(block.timestamps)))
+        self.links.append((block.start, block.prev_ts))
+
+
+@pytest.mark.parametrize("block_rows", [1, 4, 100])
+def test_scan_ranges_matches_separate_scans(block_rows):
+    table = parse_line_chat(FIXTURE.read_text(encoding="utf-8"))["messages"]
+    ranges = [(0, 5), (3, 9), (11, 15), (14, 14)]
+    together = [_Rows() for _ in ranges]
+    scan_ranges(table, [(start, stop, [acc]) for (start, stop), acc in zip(ranges, together)], block_rows)
+    for (start, stop), acc in zip(ranges, together):
+        alone = _Rows()
+        scan(table, [alone], start=start, stop=stop)
+        assert acc.rows == alone.rows == list(range(start, min(stop, len(table))))
+        # Only the range's first block lacks a previous row
+        assert [prev is None for _, prev in acc.links] == [i == 0 for i in range(len(acc.links))]
+        assert all(prev == table.timestamps[first - 1] for first, prev in acc.links[1:])
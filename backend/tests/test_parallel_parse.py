@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from app.services.parallel_parse import parse_line_chat_parallel, split_at_date_headers
+from app.services.parser import parse_line_chat
+
+FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat_coldwar.txt"
+
+
+def test_split_aligns_to_date_headers():
+    text = FIXTURE.read_text(encoding="utf-8")
+    ranges = split_at_date_headers(text, 4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(text)
+    for start, _ in ranges[1:]:
+        assert text[start:start + 4].isdigit() and text[start + 4] == "/"
+
+
+def test_parallel_matches_serial():
+    text = FIXTURE.read_text(encoding="utf-8")
+    serial = parse_line_chat(text)
+    parallel = parse_line_chat_parallel(text, workers=3, min_chars=1)
+    assert parallel == serial
+
+
+def test_cross_chunk_fixups():
+    """Leading continuations and short-transfer payers are resolved across chunks."""
+    text = (
+        "2024/01/15（一）\n09:00\tA\thi\n" + "09:01\tA\tx\n" * 50
+        + "2024/01/16（二）\n\t接續\n09:00\tB\t收到NT$300的轉帳。\n" + "09:05\tB\ty\n" * 50
+    )
+    serial = parse_line_chat(text)
+    parallel = parse_line_chat_parallel(text, workers=2, min_chars=1)
+    assert parallel == serial
+    assert parallel["messages"][50].content == "x\n接續"
+    assert parallel["transfers"][0].sender == "A"
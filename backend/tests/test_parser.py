@@ -1,5 +1,10 @@
 from pathlib import Path
-from app.services.parser import parse_line_chat, Message, CallRecord, TransferRecord
+import pytest
+
+from app.services.parser import (
+    parse_line_chat, parse_line_chat_stream, iter_line_chat,
+    Message, CallRecord, TransferRecord,
+)
 
 FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat.txt"
 
@@ -99,3 +104,126 @@ def test_transfer_messages_excluded_from_text():
     for m in text_msgs:
         assert "轉帳給" not in m.content
         assert "您已收到NT$" not in m.content
+
+
+def _chunks(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize("size", [1, 5, 64, 1 << 20])
+def test_stream_parse_matches_text_parse(size):
+    """Chunk boundaries (even mid-character) must not change the result."""
+    data = FIXTURE.read_bytes()
+    assert parse_line_chat_stream(_chunks(data, size)) == parse_line_chat(data.decode("utf-8"))
+
+
+def test_iter_line_chat_yields_multiline_message_complete():
+    data = FIXTURE.read_bytes()
+    msgs = [r for r in iter_line_chat(_chunks(data, 16)) if isinstance(r, Message)]
+    assert msgs[2].content == "對呀！\n要不要出去走走"
+
+
+def test_stream_parse_rejects_invalid_utf8():
+    with pytest.raises(UnicodeDecodeError):
+        parse_line_chat_stream([b"2024/01/15\xef\xbc", b"\xff"])
+
+
+def _parse_regex_only(text: str) -> dict:
+    """Parse with the generic regex classifier only (no fast path)."""
+    from app.services.message_table import MessageTable
+    from app.services.parser import ChatStreamParser, collect_records
+
+    table = MessageTable()
+    parser = ChatStreamParser(table)
+    parser._feed_line = parser._feed_line_regex
+    records = parser.feed_text(text) + parser.close()
+    return collect_records(records, parser.persons, table)
+
+
+def test_fast_classifier_matches_regex_on_edge_lines():
+    text = "\n".join([
+        "2024/01/15（一）",
+        "09:00\t小美\t一般訊息",
+        "09:01\t\t阿明\t空白寄件者",
+        "09:02\t阿明\t內容\t還有 tab",
+        "09:03\t小美\t[貼圖]\t☎ 不是通話",
+        "09:04\t系統訊息沒有第二欄",
+        "09:04\t小美已收回訊息",
+        "上午10:50 PM\t阿明\t混合格式",
+        "10:50  pm\t小美\t兩個空白",
+        "\t接續行",
+        "2024/01/16, Tue",
+        "09:05\t阿明\t☎ 通話時間1:02",
+        "9:06\t小美\t結尾",
+    ])
+    assert parse_line_chat(text) == _parse_regex_only(text)
+
+
+def test_sniff_detects_formats():
+    from app.services.parser import sniff_format
+
+    fmt = sniff_format(FIXTURE.read_text(encoding="utf-8"))
+    assert fmt.has_header
+    assert fmt.date_style == "zh"
+    assert fmt.time_style == "24h"
+
+    fmt = sniff_format("2026/01/31, Sat\n10:50 PM\tA\thi\n")
+    assert not fmt.has_header
+    assert fmt.date_style == "en"
+    assert fmt.time_style == "en12"
+
+
+def test_non_line_file_rejected():
+    from app.services.parser import NotLineChatError
+
+    with pytest.raises(NotLineChatError):
+        parse_line_chat("just some random text\n" * 1000)
+
+
+@pytest.mark.parametrize("text", ["", "\n\n", "  \t \r\n", "\ufeff"])
+def test_empty_export_is_not_rejected(text):
+    result = parse_line_chat(text)
+    assert len(result["messages"]) == 0
+    assert result["persons"] == []
+
+
+def test_special_message_types():
+    text = "\n".join([
+        "2024/01/15（一）",
+        "09:00\t小美\t早安",
+        "09:01\t小美\t已收回訊息",
+        "09:02\t阿明已收回訊息",
+        "09:03\t您已收回訊息",
+        "09:04\t阿明\t[相簿] 台南旅行",
+        "09:05\t小美\t[記事本] 清單",
+        "09:06\t阿明\t我不想收回訊息",
+    ])
+    from app.services.parser import ChatStreamParser
+
+    result = parse_line_chat(text)
+    assert [(m.sender, m.msg_type) for m in result["messages"]] == [
+        ("小美", "text"), ("小美", "unsent"),
+        ("阿明", "album"), ("小美", "note"), ("阿明", "text"),
+    ]
+    assert result["persons"] == ["小美", "阿明"]
+
+    # Two-column system lines are events, not messages
+    parser = ChatStreamParser()
+    parser.feed_text(text)
+    parser.close()
+    assert [(person, msg_type) for _, person, msg_type in parser.system_events] == [("阿明", "unsent")]
+
+
+@pytest.mark.parametrize("content", [
+    "看 https://example.com 這個", "WWW.Example.com", "HTTP://X.Y", "(emoji)(salute)",
+    "好(哈哈)喔", "w.x 不是網址", "純文字", "Www.a.b (toilet thumbs up)",
+])
+def test_clean_content_prefilter_matches_regexes(content):
+    from app.services.parser import _LINE_EMOJI_RE, _URL_RE, _clean_content
+
+    cleaned = _LINE_EMOJI_RE.sub("", _URL_RE.sub("", content)).strip()
+    if cleaned:
+        expected = (cleaned, "text")
+    else:
+        expected = (content, "link" if _URL_RE.search(content) else "emoji")
+    assert _clean_content(content, "text") == expected
@@ -0,0 +1,58 @@
+import random
+
+from app.services.quantile_sketch import (
+    BUCKET_BOUNDS,
+    PINNED_BOUNDS,
+    RELATIVE_ACCURACY,
+    QuantileSketch,
+)
+
+
+def _sketch(values):
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    return sketch
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(3)
+    values = sorted(int(rng.lognormvariate(5, 2)) for _ in range(20000))
+    sketch = _sketch(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * exact
+
+
+def test_small_values_are_exact():
+    sketch = _sketch([0, 3, 3, 7, 42])
+    assert sketch.quantile(0) == 0
+    assert sketch.quantile(0.5) == 3
+    assert sketch.quantile(1) == 42
+
+
+def test_empty_sketch():
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_merge_matches_single_sketch():
+    rng = random.Random(5)
+    values = [rng.randrange(10 ** 6) for _ in range(5000)]
+    merged = _sketch(values[:1234])
+    merged.merge(_sketch(values[1234:]))
+    single = _sketch(values)
+    assert merged.counts == single.counts
+    assert merged.n == single.n
+
+
+def test_memory_is_bounded():
+    sketch = _sketch(range(0, 10 ** 9, 9973))
+    assert len(sketch.counts) <= len(BUCKET_BOUNDS) < 1000
+
+
+def test_count_at_most_is_exact_at_pinned_bounds():
+    rng = random.Random(7)
+    values = [rng.randrange(10000) for _ in range(5000)]
+    sketch = _sketch(values)
+    for edge in PINNED_BOUNDS:
+        assert sketch.count_at_most(edge) == sum(v <= edge for v in values)
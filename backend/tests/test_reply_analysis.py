@@ -68,3 +68,14 @@ def test_empty_messages_returns_empty_result():
     parsed = {"messages": [], "persons": ["A", "B"], "calls": []}
     result = compute_reply_behavior(parsed)
     assert result["instantReplyRate"]["A"] == 0
+
+
+def test_reply_time_percentiles():
+    result = compute_reply_behavior(_parsed())
+    for person in _parsed()["persons"]:
+        pct = result["replyTimePercentiles"][person]
+        assert 0 <= pct["p50"] <= pct["p90"] <= pct["p99"]
+    by_hour = result["replyTimePercentilesByHour"]
+    assert [h["hour"] for h in by_hour] == list(range(24))
+    # Fixture replies at 09:16 and 09:17 are one minute apart
+    assert by_hour[9]["p50"] == 60
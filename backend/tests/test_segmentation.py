@@ -1,3 +1,9 @@
+import marshal
+import sys
+from pathlib import Path
+
+import pytest
+
 from app.services.segmenter import cut, batch_cut
 
 
@@ -48,3 +54,181 @@ class TestBatchCut:
         texts = ["今天天氣好"] * 300
         results = batch_cut(texts)
         assert len(results) == 300
+
+    def test_keep_trivial(self):
+        results = batch_cut(["哈哈好笑", "哈哈好笑", "你好嗎"], skip_trivial=False)
+        assert results[0] is results[1]
+        assert results[0] == cut("哈哈好笑")
+        assert results[2] == cut("你好嗎")
+
+    # Earlier tests leave threads behind; the server forks at startup instead
+    @pytest.mark.filterwarnings("ignore:This process .* is multi-threaded")
+    def test_worker_processes_match_serial(self, monkeypatch):
+        from app.services import segmenter
+
+        monkeypatch.setattr(segmenter, "PARALLEL_MIN_TEXTS", 2)
+        texts = [f"我們第{i}次去信義區吃拉麵好不好" for i in range(40)] + ["今天天氣好"] * 3
+        cache = {}
+        results = batch_cut(texts, cache=cache, workers=2)
+        assert results == batch_cut(texts, workers=1)
+        assert set(cache) == set(texts)
+        # Never re-forked after the first use, whatever count is asked for
+        pool = segmenter._get_pool(2)
+        assert batch_cut(texts, workers=3) == results
+        assert segmenter._get_pool(3) is pool
+
+
+    @pytest.mark.filterwarnings("ignore:This process .* is multi-threaded")
+    def test_dead_worker_falls_back_to_serial(self, monkeypatch):
+        import os
+        import signal
+
+        from app.services import segmenter
+
+        monkeypatch.setattr(segmenter, "PARALLEL_MIN_TEXTS", 2)
+        texts = [f"我們第{i}次去信義區吃拉麵好不好" for i in range(40)]
+        expected = batch_cut(texts, workers=1)
+        segmenter.shared_cache.clear()
+        pool = segmenter._get_pool(2)
+        pool.submit(int).result()
+        for process in list(pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        assert batch_cut(texts, workers=2) == expected
+        assert segmenter._pool is not pool
+        # The next call gets a working pool again
+        assert batch_cut(texts, cache={}, workers=2) == expected
+
+
+class TestTokenCache:
+    """The process-wide LRU behind batch_cut."""
+
+    def test_second_batch_served_from_cache(self, monkeypatch):
+        from app.services import segmenter
+
+        monkeypatch.setattr(segmenter, "shared_cache", segmenter.TokenCache(100, 1 << 20))
+        texts = ["我到家了", "你在幹嘛", "好想你喔"]
+        first = batch_cut(texts, skip_trivial=False)
+        monkeypatch.setattr(segmenter.jieba, "lcut", lambda text: pytest.fail("segmented again"))
+        assert batch_cut(texts, skip_trivial=False) == first
+        assert segmenter.shared_cache.stats()["hits"] >= 3
+
+    def test_evicts_least_recently_used(self):
+        from app.services.segmenter import TokenCache
+
+        cache = TokenCache(max_entries=2, max_bytes=1 << 20)
+        cache.put_many(["a", "b"], [["a"], ["b"]])
+        cache.get_many(["a"])
+        cache.put_many(["c"], [["c"]])
+        assert cache.get_many(["a", "b", "c"]) == {"a": ("a",), "c": ("c",)}
+        stats = cache.stats()
+        assert (stats["entries"], stats["evictions"], stats["misses"]) == (2, 1, 1)
+
+    def test_byte_bound_and_long_texts(self):
+        from app.services.segmenter import TokenCache
+
+        entry = sys.getsizeof("你好") + sys.getsizeof(("你好",)) + sys.getsizeof("你好")
+        cache = TokenCache(max_entries=100, max_bytes=2 * entry, max_chars=5)
+        cache.put_many(["你好", "早安", "晚安", "太長的一句話了"], [["你好"], ["早安"], ["晚安"], ["太長"]])
+        # Two entries fit (text, words tuple and word objects); the long one is never stored
+        assert set(cache.get_many(["你好", "早安", "晚安", "太長的一句話了"])) == {"早安", "晚安"}
+        assert cache.stats()["bytes"] == 2 * entry
+
+    def test_no_retention(self):
+        from app.services.segmenter import TokenCache
+
+        cache = TokenCache(max_entries=0, max_bytes=1 << 20)
+        cache.put_many(["我到家了"], [["我", "到家", "了"]])
+        assert cache.get_many(["我到家了"]) == {}
+        assert cache.stats()["entries"] == 0
+
+
+# Punctuation, whitespace, emoji, Latin, digits and URLs around Chinese text
+GOLDEN = [
+    "好啊，那我們明天見！",
+    "好啊，那我們明天見！好啊～好啊",
+    "今天去信義區吃拉麵好不好\n下班了！要不要一起去看電影",
+    "我剛剛在捷運上睡著了😂😂 真的好累",
+    "OK啦 7點在101門口 等你",
+    "iPhone15的相機A+，價格NT$29,900太貴了吧？？",
+    "網址https://example.com/post/12345看一下",
+    "  前後有空白  ",
+    "換行\r\n再換行\n\n結束",
+    "❤️❤️❤️",
+    "哈哈哈哈哈哈",
+    "",
+]
+
+
+def test_clause_segmentation_matches_whole_text():
+    import jieba
+
+    from app.services.segmenter import split_clauses
+
+    texts = GOLDEN + [
+        line.split("\t", 2)[-1]
+        for line in (Path(__file__).parent / "fixtures" / "sample_chat.txt").read_text(encoding="utf-8").splitlines()
+    ]
+    cut("預熱")
+    assert batch_cut(texts, skip_trivial=False, by_clause=True) == [jieba.lcut(t) for t in texts]
+    assert split_clauses("好啊，那我們明天見！") == ["好啊", "，", "那我們明天見", "！"]
+
+
+def test_prefix_cache_round_trip(tmp_path):
+    import json
+    import subprocess
+    import sys
+
+    import jieba
+
+    from app.services import segmenter
+
+    backend = Path(__file__).parent.parent
+    path = tmp_path / "prefix.cache"
+    subprocess.run([sys.executable, "-m", "app.services.segmenter", str(path)], cwd=backend, check=True)
+    # A fresh process loads the cache instead of the dictionary files
+    loaded = subprocess.run([sys.executable, "-c", f"""
+import json
+from app.services import segmenter
+segmenter.PREFIX_CACHE = {str(path)!r}
+segmenter._load_dictionaries = None
+segmenter.warm_up()
+print(json.dumps([segmenter.jieba.dt.total, len(segmenter.jieba.dt.FREQ), [segmenter.jieba.lcut(t) for t in {GOLDEN!r}]]))
+"""], cwd=backend, check=True, capture_output=True, text=True)
+    segmenter.warm_up()
+    expected = [jieba.dt.total, len(jieba.dt.FREQ), [jieba.lcut(t) for t in GOLDEN]]
+    assert json.loads(loaded.stdout.splitlines()[-1]) == expected
+
+
+@pytest.mark.parametrize("payload", [
+    b"not marshal data",
+    b"",
+    marshal.dumps([1, 2, 3]),
+    marshal.dumps({"fingerprint": [], "freq": {}}),
+    marshal.dumps({"fingerprint": "x", "freq": [], "total": "0", "tags": {}, "force_split": []}),
+])
+def test_bad_prefix_cache_is_rejected(tmp_path, monkeypatch, payload):
+    from app.services import segmenter
+
+    path = tmp_path / "prefix.cache"
+    path.write_bytes(payload)
+    monkeypatch.setattr(segmenter, "PREFIX_CACHE", str(path))
+    assert segmenter._load_prefix_cache() is False
+
+
+def test_bad_prefix_cache_is_rebuilt(tmp_path):
+    import subprocess
+
+    backend = Path(__file__).parent.parent
+    path = tmp_path / "prefix.cache"
+    path.write_bytes(marshal.dumps([1, 2, 3]))
+    subprocess.run([sys.executable, "-c", f"""
+from app.services import segmenter
+segmenter.PREFIX_CACHE = {str(path)!r}
+segmenter.warm_up()
+assert segmenter.jieba.lcut("好啊，那我們明天見！")
+"""], cwd=backend, check=True)
+    from app.services import segmenter
+
+    # Replaced by a cache built from the dictionary files
+    assert marshal.loads(path.read_bytes())["fingerprint"] == segmenter._dictionary_fingerprint()
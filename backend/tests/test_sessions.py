@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.engine import SECTIONS, run_analyzers
+from app.services.message_table import MessageTable, scan
+from app.services.parser import parse_line_chat
+from app.services.sessions import SESSION_GAPS, SessionIndex, compute_sessions
+
+FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat.txt"
+BASE = 738000 * 86400
+
+
+def _parsed(rows: list[tuple[int, str]]) -> dict:
+    table = MessageTable()
+    for offset, sender in rows:
+        table.append(BASE + offset, sender, "text", "嗨")
+    return {"messages": table, "persons": ["小美", "阿明"], "calls": [], "transfers": []}
+
+
+def _index(table: MessageTable, **scan_args) -> SessionIndex:
+    index = SessionIndex(table)
+    scan(table, [index], **scan_args)
+    return index
+
+
+def test_boundaries_per_threshold():
+    # Gaps: 60, 400, 1000, 4000, 20000 and a negative one
+    offsets = [0, 60, 460, 1460, 5460, 25460, 25400]
+    table = _parsed([(o, "小美") for o in offsets])["messages"]
+    index = _index(table, block_rows=3)
+    assert list(index.starts[300]) == [0, 2, 3, 4, 5]
+    assert list(index.starts[600]) == [0, 3, 4, 5]
+    assert list(index.starts[3600]) == [0, 4, 5]
+    assert list(index.starts[14400]) == [0, 5]
+    assert index.lengths(14400) == [5, 2]
+    assert index.session_start(600, 2) == 0
+    assert index.session_start(600, 6) == 5
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 5])
+def test_merged_chunks_match_single_scan(chunk_rows):
+    table = parse_line_chat(FIXTURE.read_text(encoding="utf-8"))["messages"]
+    expected = _index(table)
+    merged = SessionIndex(table)
+    parts = [_index(table, start=start, stop=start + chunk_rows) for start in range(0, len(table), chunk_rows)]
+    for part in parts:
+        merged.merge(part)
+    assert merged.starts == expected.starts
+    # Merging copies the boundaries: the first part is left as it was
+    assert all(merged.starts[gap] is not parts[0].starts[gap] for gap in SESSION_GAPS)
+    assert parts[0].stop == min(chunk_rows, len(table))
+    assert merged.stop == expected.stop == len(table)
+
+
+def test_vectorized_index_is_identical():
+    pytest.importorskip("numpy")
+    from app.services.vectorized import VecSessionIndex
+
+    table = parse_line_chat(FIXTURE.read_text(encoding="utf-8"))["messages"]
+    vec = VecSessionIndex(table)
+    scan(table, [vec], block_rows=4)
+    assert vec.starts == _index(table).starts
+
+
+def test_initiators_and_length_distribution():
+    # Three 4-hour sessions: 小美 starts two (3 and 1 messages), 阿明 one (7 messages)
+    rows = [(0, "小美"), (30, "阿明"), (60, "小美"), (20000, "小美")]
+    rows += [(40000 + i * 60, "阿明" if i % 2 == 0 else "小美") for i in range(7)]
+    hours4 = {entry["gapMinutes"]: entry for entry in compute_sessions(_parsed(rows))}[240]
+    assert hours4["count"] == 3
+    assert hours4["initiators"] == {"小美": 2, "阿明": 1}
+    assert hours4["lengthDistribution"] == {"1": 1, "2-5": 1, "6-20": 1, "21-100": 0, ">100": 0}
+    assert hours4["avgMessages"] == round(11 / 3, 1)
+
+
+def test_one_entry_per_threshold():
+    result = run_analyzers(parse_line_chat(FIXTURE.read_text(encoding="utf-8")), SECTIONS)["sessions"]
+    assert [entry["gapMinutes"] for entry in result] == [gap // 60 for gap in SESSION_GAPS]
+    assert all(sum(entry["lengthDistribution"].values()) == entry["count"] for entry in result)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from app.services.message_table import MessageTable
 from app.services.parser import parse_line_chat
 from app.services.stats import compute_basic_stats
 
@@ -65,3 +66,14 @@ def test_empty_messages():
     result = compute_basic_stats(parsed)
     assert result["messageCount"]["total"] == 0
     assert result["dateRange"]["totalDays"] == 0
+
+
+def test_message_count_in_group_chat():
+    table = MessageTable()
+    persons = [f"成員{i}" for i in range(300)]
+    for i in range(3000):
+        table.append(738000 * 86400 + i * 60, persons[i % 300], "text", "好")
+    result = compute_basic_stats({"messages": table, "persons": persons, "calls": [], "transfers": []})
+    counts = result["messageCount"]
+    assert counts["total"] == 3000
+    assert all(counts[p] == 10 for p in persons)
@@ -31,3 +31,38 @@ def test_unique_phrases():
     result, _ = compute_text_analysis(_parsed())
     up = result["uniquePhrases"]
     assert isinstance(up, list)
+
+
+GROUP_CHAT = """[LINE] 「好朋友群組」的聊天記錄
+儲存日期：2025/02/10 14:00
+
+2024/01/15（一）
+09:15	小美	今天天氣真好
+09:16	阿明	我們去夜市吃雞排
+09:17	小華	夜市雞排好啊
+09:18	小美	晚點見
+"""
+
+
+def test_unique_phrases_in_group_chat():
+    # Words shared by any two members count, not just the first two persons
+    result, _ = compute_text_analysis(parse_line_chat(GROUP_CHAT))
+    words = {p["phrase"] for p in result["uniquePhrases"]}
+    assert "雞排" in words
+
+
+def test_each_distinct_clause_is_segmented_once(monkeypatch):
+    from app.services import segmenter
+
+    parsed = _parsed()
+    segmenter.cut("預熱")
+    seen = []
+    lcut = segmenter.jieba.lcut
+    monkeypatch.setattr(segmenter.jieba, "lcut", lambda text: seen.append(text) or lcut(text))
+    result, _ = compute_text_analysis(parsed)
+    texts = [m.content for m in parsed["messages"] if m.msg_type == "text"]
+    assert sorted(seen) == sorted({c for t in texts for c in segmenter.split_clauses(t)})
+    # One word list per message, empty for stickers, photos and calls
+    msg_words = result["_msg_words"]
+    assert len(msg_words) == len(parsed["messages"])
+    assert all(words == [] for m, words in zip(parsed["messages"], msg_words) if m.msg_type != "text")
@@ -23,14 +23,17 @@ def test_heatmap_has_values():
     assert total > 0
 
 
-def test_monthly_trend():
-    result = compute_time_patterns(_parsed())
-    trend = result["trend"]
-    assert len(trend) > 0
-    first = trend[0]
-    assert "period" in first
-    for person in _parsed()["persons"]:
-        assert person in first
+def test_trend_resolutions():
+    parsed = _parsed()
+    trend = compute_time_patterns(parsed)["trend"]
+    assert trend["day"]["periods"] == ["2024-01-15", "2024-01-16"]
+    # 2024-01-15 is a Monday, so both days fall in one week
+    assert trend["week"]["periods"] == ["2024-01-15"]
+    assert trend["month"]["periods"] == ["2024-01"]
+    for series in trend.values():
+        assert set(series["counts"]) == set(parsed["persons"])
+        assert all(len(counts) == len(series["periods"]) for counts in series["counts"].values())
+        assert sum(map(sum, series["counts"].values())) == len(parsed["messages"])
 
 
 def test_goodnight_analysis():
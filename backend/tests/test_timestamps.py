@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+from app.services.timestamps import TIME_TABLE, date_ordinal, decode_time, parse_time_minutes
+
+
+@pytest.mark.parametrize("token,expected", [
+    ("09:15", 9 * 60 + 15),
+    ("9:15", 9 * 60 + 15),
+    ("上午09:15", 9 * 60 + 15),
+    ("上午12:05", 5),
+    ("下午02:07", 14 * 60 + 7),
+    ("下午12:30", 12 * 60 + 30),
+    ("10:50 PM", 22 * 60 + 50),
+    ("6:05 AM", 6 * 60 + 5),
+    ("12:00 AM", 0),
+    ("11:59pm", 23 * 60 + 59),
+])
+def test_decode_time(token, expected):
+    assert decode_time(token) == expected
+
+
+def test_table_matches_slow_path():
+    for token, minutes in TIME_TABLE.items():
+        assert parse_time_minutes(token) == minutes, token
+
+
+def test_unlisted_variant_falls_back():
+    assert "10:50  Pm" not in TIME_TABLE
+    assert decode_time("10:50  Pm") == 22 * 60 + 50
+
+
+def test_invalid_time_raises():
+    with pytest.raises(ValueError):
+        decode_time("下午13:00")
+    with pytest.raises(ValueError):
+        decode_time("09:75")
+
+
+def test_date_ordinal():
+    assert date_ordinal("2024/1/5") == date(2024, 1, 5).toordinal()
+    with pytest.raises(ValueError):
+        date_ordinal("2024/02/30")
@@ -0,0 +1,63 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.services.cold_war import ColdWarSweepAccumulator  # noqa: E402
+from app.services.engine import SECTIONS, VECTOR_SECTIONS, run_analyzers  # noqa: E402
+from app.services.message_table import MessageTable, scan  # noqa: E402
+from app.services.parser import parse_line_chat  # noqa: E402
+from app.services.vectorized import VecColdWarSweepAccumulator  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _random_parsed(n: int = 3000, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    persons = ["小美", "阿明", "小華"]
+    table = MessageTable()
+    ts = 738000 * 86400
+    for _ in range(n):
+        # Mostly short gaps, some long ones and the odd multi-day silence
+        ts += rng.choice([0, 5, 30, 90, 400, 2000, 4000, 6 * 3600, 3 * 86400])
+        msg_type = rng.choice(["text", "text", "text", "sticker", "photo"])
+        content = rng.choice(["晚安", "早安～", "好啊", "good night", "想睡了"]) if msg_type == "text" else "[貼圖]"
+        table.append(ts, rng.choice(persons), msg_type, content)
+    return {"messages": table, "persons": persons, "calls": [], "transfers": []}
+
+
+def _dump(result: dict) -> str:
+    return json.dumps(result, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("name", ["sample_chat.txt", "sample_chat_coldwar.txt"])
+def test_vectorized_output_is_identical_on_fixtures(name):
+    parsed = parse_line_chat((FIXTURES / name).read_text(encoding="utf-8"))
+    assert _dump(run_analyzers(parsed, VECTOR_SECTIONS)) == _dump(run_analyzers(parsed, SECTIONS))
+
+
+def test_vectorized_cold_war_sweep_is_identical():
+    parsed = parse_line_chat((FIXTURES / "sample_chat_coldwar.txt").read_text(encoding="utf-8"))
+    expected = run_analyzers(parsed, {"coldWarSweep": ColdWarSweepAccumulator})
+    assert _dump(run_analyzers(parsed, {"coldWarSweep": VecColdWarSweepAccumulator})) == _dump(expected)
+
+
+@pytest.mark.parametrize("block_rows", [1, 7, 1000, 65536])
+def test_vectorized_output_is_identical_across_blocks(block_rows):
+    parsed = _random_parsed()
+    expected = _dump(run_analyzers(parsed, SECTIONS))
+    table = parsed["messages"]
+    accumulators = {name: factory(table, parsed) for name, factory in VECTOR_SECTIONS.items()}
+    scan(table, accumulators.values(), block_rows=block_rows)
+    assert _dump({name: acc.finalize() for name, acc in accumulators.items()}) == expected
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 50, 997])
+@pytest.mark.parametrize("sections", [SECTIONS, VECTOR_SECTIONS], ids=["python", "numpy"])
+def test_chunked_merge_is_identical(sections, chunk_rows):
+    parsed = _random_parsed()
+    expected = _dump(run_analyzers(parsed, SECTIONS))
+    assert _dump(run_analyzers(parsed, sections, chunk_rows=chunk_rows)) == expected
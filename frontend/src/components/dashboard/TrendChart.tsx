@@ -1,5 +1,5 @@
 import { useState, useMemo, useRef, useEffect, useCallback } from "react";
-import type { AnalysisResult } from "../../types/analysis";
+import type { AnalysisResult, TrendSeries } from "../../types/analysis";
 
 interface Props {
   result: AnalysisResult;
@@ -14,14 +14,15 @@ interface BarGroup {
   him: number;
 }
 
-function buildDailyGroups(
-  trend: Array<Record<string, string | number>>,
-  p1: string,
-  p2: string,
-): BarGroup[] {
+function column(series: TrendSeries, person: string): number[] {
+  return series.counts[person] ?? [];
+}
+
+function buildDailyGroups(series: TrendSeries, p1: string, p2: string): BarGroup[] {
+  const her = column(series, p1);
+  const him = column(series, p2);
   let lastMonth = "";
-  return trend.map((entry) => {
-    const period = String(entry.period ?? "");
+  return series.periods.map((period, i) => {
     const day = period.slice(8, 10).replace(/^0/, "");
     const month = period.slice(5, 7).replace(/^0/, "");
     const showMonth = month !== lastMonth;
@@ -29,79 +30,48 @@ function buildDailyGroups(
     return {
       label: `${month}/${day}`,
       sublabel: showMonth ? `${period.slice(0, 4)}` : undefined,
-      her: Number(entry[p1] ?? 0),
-      him: Number(entry[p2] ?? 0),
+      her: her[i] ?? 0,
+      him: him[i] ?? 0,
     };
   });
 }
 
-function buildWeeklyGroups(
-  trend: Array<Record<string, string | number>>,
-  p1: string,
-  p2: string,
-): BarGroup[] {
-  const groups: BarGroup[] = [];
-  let weekHer = 0;
-  let weekHim = 0;
-  let weekStartPeriod = "";
+function buildWeeklyGroups(series: TrendSeries, p1: string, p2: string): BarGroup[] {
+  const her = column(series, p1);
+  const him = column(series, p2);
   let lastMonth = "";
-
-  for (let i = 0; i < trend.length; i++) {
-    const entry = trend[i];
-    const period = String(entry.period ?? "");
-    if (!weekStartPeriod) weekStartPeriod = period;
-    weekHer += Number(entry[p1] ?? 0);
-    weekHim += Number(entry[p2] ?? 0);
-
-    if ((i + 1) % 7 === 0 || i === trend.length - 1) {
-      const sm = weekStartPeriod.slice(5, 7).replace(/^0/, "");
-      const sd = weekStartPeriod.slice(8, 10).replace(/^0/, "");
-      const ed = period.slice(8, 10).replace(/^0/, "");
-      const showMonth = sm !== lastMonth;
-      lastMonth = sm;
-      groups.push({
-        label: `${sd}-${ed}`,
-        sublabel: showMonth ? `${sm}月` : undefined,
-        her: weekHer,
-        him: weekHim,
-      });
-      weekHer = 0;
-      weekHim = 0;
-      weekStartPeriod = "";
-    }
-  }
-  return groups;
+  return series.periods.map((period, i) => {
+    // Weeks are labelled by their Monday
+    const start = new Date(`${period}T00:00:00`);
+    const end = new Date(start);
+    end.setDate(start.getDate() + 6);
+    const sm = String(start.getMonth() + 1);
+    const showMonth = sm !== lastMonth;
+    lastMonth = sm;
+    return {
+      label: `${start.getDate()}-${end.getDate()}`,
+      sublabel: showMonth ? `${sm}月` : undefined,
+      her: her[i] ?? 0,
+      him: him[i] ?? 0,
+    };
+  });
 }
 
-function buildMonthlyGroups(
-  trend: Array<Record<string, string | number>>,
-  p1: string,
-  p2: string,
-): BarGroup[] {
-  const monthMap = new Map<string, { her: number; him: number }>();
-  for (const entry of trend) {
-    const period = String(entry.period ?? "");
-    const monthKey = period.slice(0, 7);
-    const existing = monthMap.get(monthKey) ?? { her: 0, him: 0 };
-    existing.her += Number(entry[p1] ?? 0);
-    existing.him += Number(entry[p2] ?? 0);
-    monthMap.set(monthKey, existing);
-  }
-
-  const groups: BarGroup[] = [];
+function buildMonthlyGroups(series: TrendSeries, p1: string, p2: string): BarGroup[] {
+  const her = column(series, p1);
+  const him = column(series, p2);
   let lastYear = "";
-  for (const [monthKey, counts] of monthMap) {
-    const [year, m] = monthKey.split("-");
+  return series.periods.map((period, i) => {
+    const [year, m] = period.split("-");
     const showYear = year !== lastYear;
     lastYear = year;
-    groups.push({
+    return {
       label: `${parseInt(m)}月`,
       sublabel: showYear ? year : undefined,
-      her: counts.her,
-      him: counts.him,
-    });
-  }
-  return groups;
+      her: her[i] ?? 0,
+      him: him[i] ?? 0,
+    };
+  });
 }
 
 const TABS: { key: ViewMode; label: string }[] = [
@@ -121,9 +91,9 @@ export function TrendChart({ result }: Props) {
   const [slotWidth, setSlotWidth] = useState(60);
 
   const allGroups = useMemo(() =>
-    view === "month" ? buildMonthlyGroups(trend, p1, p2)
-      : view === "week" ? buildWeeklyGroups(trend, p1, p2)
-        : buildDailyGroups(trend, p1, p2),
+    view === "month" ? buildMonthlyGroups(trend.month, p1, p2)
+      : view === "week" ? buildWeeklyGroups(trend.week, p1, p2)
+        : buildDailyGroups(trend.day, p1, p2),
     [view, trend, p1, p2],
   );
 
@@ -1,5 +1,5 @@
 // Development preview mock data — remove before production
-import type { AnalysisResult } from "../types/analysis";
+import type { AnalysisResult, TrendSeries } from "../types/analysis";
 
 export const mockResult: AnalysisResult = {
   persons: ["小美", "阿明"],
@@ -39,6 +39,16 @@ export const mockResult: AnalysisResult = {
     speedDistribution: { "<1m": 42, "1-5m": 26, "5-30m": 19, "30m-1h": 8, ">1h": 5 },
     longestStreak: { count: 47, date: "2024-08-15" },
     leftOnRead: { "小美": 12, "阿明": 18 },
+    replyTimePercentiles: {
+      "小美": { p50: 45, p90: 1380, p99: 9240 },
+      "阿明": { p50: 90, p90: 2100, p99: 12600 },
+    },
+    replyTimePercentilesByHour: Array.from({ length: 24 }, (_, hour) => ({
+      hour,
+      p50: hour < 8 ? 600 : 60,
+      p90: hour < 8 ? 7200 : 1800,
+      p99: hour < 8 ? 25200 : 10800,
+    })),
   },
   timePatterns: {
     heatmap: [
@@ -51,21 +61,37 @@ export const mockResult: AnalysisResult = {
       [6, 4, 2, 0, 0, 0, 2, 5, 7, 8, 6, 8, 10, 12, 8, 6, 12, 16, 24, 30, 35, 32, 22, 8],
     ],
     trend: (() => {
-      // Generate 90 days of mock daily data
-      const data: Array<Record<string, string | number>> = [];
-      const start = new Date("2024-11-01");
+      // Generate 90 days of mock daily data, summed into weeks and months
+      const persons = ["小美", "阿明"];
+      const empty = (): TrendSeries => ({ periods: [], counts: { "小美": [], "阿明": [] } });
+      const [day, week, month] = [empty(), empty(), empty()];
+      const add = (series: TrendSeries, period: string, values: number[]) => {
+        if (series.periods[series.periods.length - 1] !== period) {
+          series.periods.push(period);
+          persons.forEach((p) => series.counts[p].push(0));
+        }
+        persons.forEach((p, j) => {
+          const column = series.counts[p];
+          column[column.length - 1] += values[j];
+        });
+      };
+      const start = new Date("2024-11-01T00:00:00Z");
       for (let i = 0; i < 90; i++) {
         const d = new Date(start);
-        d.setDate(d.getDate() + i);
+        d.setUTCDate(d.getUTCDate() + i);
         const period = d.toISOString().slice(0, 10);
+        const monday = new Date(d);
+        monday.setUTCDate(d.getUTCDate() - ((d.getUTCDay() + 6) % 7));
         const base = 10 + Math.sin(i * 0.15) * 8 + (i > 45 ? 5 : 0);
-        data.push({
-          period,
-          "小美": Math.round(base + Math.random() * 6),
-          "阿明": Math.round(base * 0.85 + Math.random() * 5),
-        });
+        const values = [
+          Math.round(base + Math.random() * 6),
+          Math.round(base * 0.85 + Math.random() * 5),
+        ];
+        add(day, period, values);
+        add(week, monday.toISOString().slice(0, 10), values);
+        add(month, period.slice(0, 7), values);
       }
-      return data;
+      return { day, week, month };
     })(),
     goodnightAnalysis: {
       whoSaysGoodnightFirst: { "小美": 78, "阿明": 22 },
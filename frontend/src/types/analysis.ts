@@ -17,9 +17,15 @@ export interface AnalysisResult {
   replyBehavior: ReplyBehavior;
   timePatterns: TimePatterns;
   coldWars: ColdWarEvent[];
+  // Only when uploaded with cold_war_sweep=true
+  coldWarSweep?: ColdWarSweepEntry[];
+  regimeShifts?: RegimeShift[];
+  sessions?: SessionStats[];
   textAnalysis: TextAnalysis;
   transferAnalysis?: TransferAnalysis;
   firstConversation?: FirstConversation;
+  // Id for GET /api/cube/{cubeId} slice queries (kept for 30 minutes)
+  cubeId?: string;
   aiAnalysis?: AIAnalysis;
 }
 
@@ -45,11 +51,33 @@ export interface ReplyBehavior {
   speedDistribution: Record<string, number>;
   longestStreak: { count: number; date: string };
   leftOnRead: Record<string, number>;
+  replyTimePercentiles: Record<string, ReplyPercentiles>;
+  replyTimePercentilesByHour: Array<ReplyPercentiles & { hour: number }>;
+}
+
+// Reply-time quantiles in seconds
+export interface ReplyPercentiles {
+  p50: number;
+  p90: number;
+  p99: number;
+}
+
+// One row of periods and, per person, a message count for each
+export interface TrendSeries {
+  periods: string[];
+  counts: Record<string, number[]>;
+}
+
+// Days as YYYY-MM-DD, weeks by their Monday, months as YYYY-MM
+export interface Trend {
+  day: TrendSeries;
+  week: TrendSeries;
+  month: TrendSeries;
 }
 
 export interface TimePatterns {
   heatmap: number[][];
-  trend: Array<Record<string, string | number>>;
+  trend: Trend;
   goodnightAnalysis: {
     whoSaysGoodnightFirst: Record<string, number>;
     whoSaysGoodmorningFirst: Record<string, number>;
@@ -63,6 +91,70 @@ export interface ColdWarEvent {
   startDate: string;
   endDate: string;
   messageDrop: number;
+  confidence?: number;
+}
+
+// coldWars recomputed for one detector setting (for a sensitivity control)
+export interface ColdWarSweepEntry {
+  dropThreshold: number;
+  minDays: number;
+  baselineWindow: number;
+  events: ColdWarEvent[];
+}
+
+// Volume phase found by the CUSUM engine (cold_war_engine=cusum)
+export interface RegimeShift {
+  startDate: string;
+  endDate: string;
+  direction: 'cooling' | 'warming';
+  detectedDate: string;
+  confidence: number;
+  avgBefore: number;
+  avgAfter: number;
+  changePercent: number;
+}
+
+// Conversations split wherever the gap between messages exceeds gapMinutes
+export interface SessionStats {
+  gapMinutes: number;
+  count: number;
+  avgMessages: number;
+  initiators: Record<string, number>;
+  lengthDistribution: Record<string, number>;
+}
+
+// GET /api/cube/{cubeId}: one row per non-empty group, e.g. { weekday: 5, hour: 22, messages: 41 }
+export type CubeMeasure = 'messages' | 'calls' | 'completedCalls' | 'callSeconds' | 'longestCallSeconds';
+export type CubeDimension = 'day' | 'month' | 'weekday' | 'hour' | 'sender' | 'type';
+
+export interface CubeQueryResult {
+  measure: CubeMeasure;
+  groupBy: CubeDimension[];
+  rows: Array<Record<string, string | number>>;
+}
+
+// POST /api/compare: the same sections for two date ranges, plus second minus first
+export interface ComparePeriod {
+  start: string | null;
+  end: string | null;
+  basicStats: BasicStats;
+  replyBehavior: ReplyBehavior;
+  timePatterns: TimePatterns;
+  textAnalysis: TextAnalysis;
+}
+
+export interface CompareResult {
+  persons: string[];
+  periods: [ComparePeriod, ComparePeriod];
+  // Numbers only, in the shape of each section (e.g. heatmap cell changes)
+  delta: {
+    basicStats?: Record<string, unknown>;
+    replyBehavior?: Record<string, unknown>;
+    timePatterns?: Record<string, unknown>;
+    textAnalysis: {
+      wordCloud: Record<string, { gained: string[]; lost: string[] }>;
+    };
+  };
 }
 
 export interface TextAnalysis {